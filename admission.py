@@ -0,0 +1,241 @@
+import math
+import time
+import asyncio
+import threading
+from collections import deque
+from contextlib import contextmanager, asynccontextmanager
+from typing import Dict, Optional
+from utils import (
+    logger, ADMISSION_MAX_IN_FLIGHT, ADMISSION_QUEUE_SIZE, ADMISSION_QUEUE_TIMEOUT,
+    CLIENT_RATE_PER_MINUTE, CLIENT_BURST, ADMISSION_CLIENT_HEADER
+)
+
+class AdmissionRejected(Exception):
+    """Raised when a request is turned away; `retry_after` is a hint in whole seconds"""
+    def __init__(self, reason: str, retry_after: int, message: str):
+        super().__init__(message)
+        self.reason = reason
+        self.retry_after = retry_after
+
+class TokenBucket:
+    """Allows `burst` requests at once, refilled at `rate` tokens per second"""
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, now: float) -> float:
+        """Take a token; returns 0 on success, otherwise the seconds until one is available"""
+        self.refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+class _Waiter:
+    """A queued request, woken by a thread event or, on the event loop, a future"""
+    def __init__(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.loop = loop
+        self.granted = False
+        self.enqueued = time.monotonic()
+        self.event = None if loop else threading.Event()
+        self.future = loop.create_future() if loop else None
+
+    def wake(self):
+        if self.loop:
+            self.loop.call_soon_threadsafe(lambda: self.future.done() or self.future.set_result(True))
+        else:
+            self.event.set()
+
+class AdmissionController:
+    """Bounded concurrency for expensive routes, with per-client rate limits.
+
+    A request first takes a token from its client's bucket, then one of
+    `max_in_flight` slots. When all slots are busy it waits in a FIFO queue
+    of at most `queue_size` requests for up to `queue_timeout` seconds; a
+    finishing request hands its slot straight to the head of the queue.
+    Anything beyond that is rejected at once with a retry hint, so latency
+    stays bounded instead of queues growing. Limits apply per worker process.
+    """
+    def __init__(self, max_in_flight: int = ADMISSION_MAX_IN_FLIGHT, queue_size: int = ADMISSION_QUEUE_SIZE,
+                 queue_timeout: float = ADMISSION_QUEUE_TIMEOUT, rate_per_minute: float = CLIENT_RATE_PER_MINUTE,
+                 burst: int = CLIENT_BURST, max_clients: int = 10000):
+        self.max_in_flight = max_in_flight
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.rate = rate_per_minute / 60.0
+        self.burst = max(1, burst)
+        self.max_clients = max_clients
+        self._lock = threading.Lock()
+        self._queue: "deque[_Waiter]" = deque()
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._in_flight = 0
+        self._service_seconds = None
+        self._counters = {"admitted": 0, "rate_limited": 0, "queue_full": 0, "queue_timeout": 0}
+        self._wait_seconds = 0.0
+        self._waited = 0
+
+    def _take_token(self, client: str, now: float) -> float:
+        if self.rate <= 0:
+            return 0.0
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            if len(self._buckets) >= self.max_clients:
+                self._prune(now)
+            bucket = self._buckets[client] = TokenBucket(self.rate, self.burst, now)
+        return bucket.take(now)
+
+    def _refund(self, client: str):
+        bucket = self._buckets.get(client)
+        if bucket:
+            bucket.tokens = min(bucket.burst, bucket.tokens + 1)
+
+    def _prune(self, now: float):
+        """Forget clients whose buckets have refilled, which are the same as new ones"""
+        for client, bucket in list(self._buckets.items()):
+            bucket.refill(now)
+            if bucket.tokens >= bucket.burst:
+                del self._buckets[client]
+
+    def _retry_after(self) -> int:
+        """Time for the queue ahead to drain, from the average request duration"""
+        service = self._service_seconds or 1.0
+        return max(1, math.ceil(service * (len(self._queue) + 1) / max(1, self.max_in_flight)))
+
+    def _enter(self, client: str, loop: Optional[asyncio.AbstractEventLoop] = None) -> Optional[_Waiter]:
+        """Admit a request or queue it; returns its waiter when it has to wait"""
+        with self._lock:
+            wait = self._take_token(client, time.monotonic())
+            if wait:
+                self._counters["rate_limited"] += 1
+                raise AdmissionRejected("rate_limited", max(1, math.ceil(wait)),
+                                        "Too many requests from this client, please retry later")
+            if self.max_in_flight <= 0 or (self._in_flight < self.max_in_flight and not self._queue):
+                self._in_flight += 1
+                self._counters["admitted"] += 1
+                return None
+            if len(self._queue) >= self.queue_size:
+                self._refund(client)
+                self._counters["queue_full"] += 1
+                raise AdmissionRejected("queue_full", self._retry_after(), "Server is busy, please retry later")
+            waiter = _Waiter(loop)
+            self._queue.append(waiter)
+            return waiter
+
+    def _give_up(self, waiter: _Waiter, client: str, timed_out: bool = True) -> bool:
+        """Leave the queue; returns True if a slot was granted meanwhile"""
+        with self._lock:
+            if waiter.granted:
+                return True
+            self._queue.remove(waiter)
+            self._refund(client)
+            if timed_out:
+                self._counters["queue_timeout"] += 1
+            return False
+
+    def _timed_out(self) -> AdmissionRejected:
+        with self._lock:
+            retry_after = self._retry_after()
+        return AdmissionRejected("queue_timeout", retry_after, "Server is busy, please retry later")
+
+    def _release(self, started: Optional[float]):
+        with self._lock:
+            if started is not None:
+                elapsed = time.monotonic() - started
+                self._service_seconds = elapsed if self._service_seconds is None \
+                    else 0.8 * self._service_seconds + 0.2 * elapsed
+            if self._queue:
+                # The slot passes to the oldest waiter, so in_flight is unchanged
+                waiter = self._queue.popleft()
+                waiter.granted = True
+                self._counters["admitted"] += 1
+                self._wait_seconds += time.monotonic() - waiter.enqueued
+                self._waited += 1
+                waiter.wake()
+            else:
+                self._in_flight -= 1
+
+    @contextmanager
+    def admit(self, client: str):
+        """Hold a slot for the duration of the block; raises AdmissionRejected"""
+        waiter = self._enter(client)
+        if waiter and not waiter.event.wait(self.queue_timeout) and not self._give_up(waiter, client):
+            raise self._timed_out()
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(started)
+
+    @asynccontextmanager
+    async def aadmit(self, client: str):
+        """Like `admit`, waiting on the event loop instead of blocking a thread"""
+        waiter = self._enter(client, asyncio.get_running_loop())
+        if waiter:
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter.future), self.queue_timeout)
+            except asyncio.TimeoutError:
+                if not self._give_up(waiter, client):
+                    raise self._timed_out()
+            except asyncio.CancelledError:
+                # The client went away; give back a slot that was already granted
+                if self._give_up(waiter, client, timed_out=False):
+                    self._release(None)
+                raise
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(started)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "in_flight": self._in_flight,
+                "queue_depth": len(self._queue),
+                "max_in_flight": self.max_in_flight,
+                "queue_size": self.queue_size,
+                "clients": len(self._buckets),
+                "admitted": self._counters["admitted"],
+                "rejected": {reason: count for reason, count in self._counters.items() if reason != "admitted"},
+                "queue_wait_seconds": round(self._wait_seconds, 4),
+                "queued": self._waited,
+                "average_request_seconds": round(self._service_seconds or 0.0, 4)
+            }
+
+    def prometheus(self) -> str:
+        """Render the stats in the Prometheus text exposition format"""
+        stats = self.stats()
+        lines = []
+
+        def metric(name: str, kind: str, help_text: str, samples):
+            lines.extend([f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"])
+            lines.extend(f"{name}{labels} {value}" for labels, value in samples)
+
+        metric("admission_in_flight", "gauge", "Requests holding a slot", [("", stats["in_flight"])])
+        metric("admission_queue_depth", "gauge", "Requests waiting for a slot", [("", stats["queue_depth"])])
+        metric("admission_max_in_flight", "gauge", "Slot limit (0 is unlimited)", [("", stats["max_in_flight"])])
+        metric("admission_queue_size", "gauge", "Wait queue capacity", [("", stats["queue_size"])])
+        metric("admission_clients", "gauge", "Clients with a tracked rate limit bucket", [("", stats["clients"])])
+        metric("admission_admitted_total", "counter", "Admitted requests", [("", stats["admitted"])])
+        metric("admission_rejected_total", "counter", "Rejected requests by reason",
+               [(f'{{reason="{reason}"}}', count) for reason, count in stats["rejected"].items()])
+        metric("admission_queue_wait_seconds", "summary", "Time queued requests waited for a slot",
+               [("_sum", stats["queue_wait_seconds"]), ("_count", stats["queued"])])
+        return "\n".join(lines) + "\n"
+
+def client_key(headers, remote_addr: Optional[str], header: Optional[str] = ADMISSION_CLIENT_HEADER) -> str:
+    """Identify the client by `header` (e.g. X-Forwarded-For behind a proxy) or its address"""
+    if header and headers.get(header):
+        return headers.get(header).split(",")[0].strip()
+    return remote_addr or "unknown"
+
+admission_controller = AdmissionController()
+if ADMISSION_MAX_IN_FLIGHT > 0 or CLIENT_RATE_PER_MINUTE > 0:
+    logger.info(f"Admission control: {ADMISSION_MAX_IN_FLIGHT} in flight, queue of {ADMISSION_QUEUE_SIZE}, "
+                f"{CLIENT_RATE_PER_MINUTE} requests per minute per client")
@@ -2,14 +2,25 @@ from typing import Dict, List, Optional
 import os
 from crewai import Agent
 from utils import (
-    parse_pdf,
-    chunk_text,
+    parse_pdf_pages,
+    join_pages,
+    prepare_chunks,
+    save_ingestion_report,
     generate_embedding,
+    generate_embeddings,
+    file_sha256,
     get_llm_response,
-    company_chroma_client,
+    company_store,
+    company_compact_store,
+    company_lexical_index,
+    LEXICAL_WEIGHT,
+    document_catalog,
+    EMBEDDING_MODEL,
     llm,
     logger
 )
+from lexical_index import HybridRetriever
+from question_answering import answer_questions
 
 class CompanyDataAgent(Agent):
     def __init__(self):
@@ -48,13 +59,26 @@ class CompanyDataAgent(Agent):
 
     @property
     def collection(self):
-        """Get a fresh reference to the collection"""
-        return company_chroma_client.get_or_create_collection(
-            name="company_documents",
-            metadata={"description": "Company document embeddings"}
-        )
+        """Get the configured vector store for company documents"""
+        return company_store
+
+    @property
+    def compact_store(self):
+        """Get the quantized sidecar store for company embeddings, if enabled"""
+        return company_compact_store
+
+    @property
+    def lexical_index(self):
+        """Get the BM25 keyword index for company documents"""
+        return company_lexical_index
 
-    def process_company_data(self, file_path: str) -> Dict:
+    @property
+    def retriever(self):
+        """Get a retriever fusing keyword and vector search over company documents"""
+        return HybridRetriever(self.collection, self.lexical_index, LEXICAL_WEIGHT)
+
+    def process_company_data(self, file_path: str, doc_hash: Optional[str] = None,
+                             filename: Optional[str] = None) -> Dict:
         """Process a company data document and store its embeddings"""
         logger.info(f"Processing company document: {file_path}")
         try:
@@ -64,35 +88,66 @@ class CompanyDataAgent(Agent):
             if not file_path.lower().endswith('.pdf'):
                 raise ValueError("Only PDF files are supported")
 
+            # Identical content is indexed once no matter what name it was uploaded under
+            doc_hash = doc_hash or file_sha256(file_path)
+            existing = self.collection.get(where={"doc_hash": doc_hash}, limit=1)
+            if existing["ids"]:
+                logger.info(f"Document {doc_hash} is already indexed, skipping ingestion")
+                if not self.lexical_index.has(doc_hash):
+                    self.lexical_index.add_from_store(doc_hash, self.collection)
+                if not document_catalog.has("company", doc_hash):
+                    document_catalog.record("company", doc_hash, existing["metadatas"][0]["source"],
+                                            existing["metadatas"][0]["total_chunks"], filename=filename)
+                return {
+                    "status": "success",
+                    "file": file_path,
+                    "filename": filename or os.path.basename(file_path),
+                    "doc_hash": doc_hash,
+                    "chunks_processed": existing["metadatas"][0]["total_chunks"]
+                }
+
             # Extract text
-            text = parse_pdf(file_path)
-            if not text:
+            pages = parse_pdf_pages(file_path, doc_hash)
+            if not join_pages(pages):
                 raise ValueError("No text could be extracted from the PDF")
             
-            # Create chunks
-            chunks = chunk_text(text, chunk_size=500, overlap=50)
-            logger.info(f"Created {len(chunks)} text chunks")
-
-            # Process chunks and store embeddings
-            for i, chunk in enumerate(chunks):
-                embedding = generate_embedding(chunk)
-                if embedding:
-                    self.collection.add(
-                        embeddings=[embedding],
-                        documents=[chunk],
-                        metadatas=[{
-                            "source": file_path,
-                            "chunk_index": i,
-                            "total_chunks": len(chunks)
-                        }],
-                        ids=[f"company_{os.path.basename(file_path)}_{i}"]
-                    )
+            # Create chunks, leaving out running headers/footers and repeated passages
+            chunks, dropped = prepare_chunks(pages, chunk_size=500, overlap=50)
+            save_ingestion_report("company", doc_hash, dropped)
+            if not chunks:
+                raise ValueError("No content left after removing boilerplate")
+            logger.info(f"Created {len(chunks)} text chunks "
+                        f"({len(dropped['boilerplate_lines'])} boilerplate lines, "
+                        f"{len(dropped['duplicate_pages'])} duplicate pages and "
+                        f"{len(dropped['duplicate_chunks'])} duplicate chunks removed)")
+
+            # Embed all chunks in a single model call
+            embeddings = generate_embeddings(chunks, as_numpy=True)
+            if embeddings is None:
+                raise ValueError("Failed to generate embeddings for the company data chunks")
+
+            ids = [f"company_{doc_hash}_{i}" for i in range(len(chunks))]
+            metadatas = [{
+                "source": file_path,
+                "doc_hash": doc_hash,
+                "chunk_index": i,
+                "total_chunks": len(chunks)
+            } for i in range(len(chunks))]
+            self.collection.add(ids=ids, embeddings=embeddings, documents=chunks, metadatas=metadatas)
+            if self.compact_store:
+                self.compact_store.save(doc_hash, ids, embeddings)
+            self.lexical_index.add(doc_hash, ids, chunks, metadatas)
+            document_catalog.record("company", doc_hash, file_path, len(chunks), len(pages), EMBEDDING_MODEL,
+                                    filename=filename)
 
             logger.info("Successfully processed and stored company data embeddings")
             return {
                 "status": "success",
                 "file": file_path,
-                "chunks_processed": len(chunks)
+                "filename": filename or os.path.basename(file_path),
+                "doc_hash": doc_hash,
+                "chunks_processed": len(chunks),
+                "duplicate_chunks_dropped": len(dropped["duplicate_chunks"])
             }
 
         except Exception as e:
@@ -103,15 +158,23 @@ class CompanyDataAgent(Agent):
                 "error": str(e)
             }
 
+    def list_documents(self, limit: int = 50, offset: int = 0) -> Dict:
+        """List catalogued company documents, newest first, with totals"""
+        return {
+            "documents": document_catalog.list("company", limit=limit, offset=offset),
+            "totals": document_catalog.stats("company"),
+            "limit": limit,
+            "offset": offset
+        }
+
     def answer_question(self, question: str, top_k: int = 3) -> str:
         """Answer a question about the company using stored embeddings and LLM"""
         try:
-            # Generate embedding for the question
-            question_embedding = generate_embedding(question)
-            
-            # Search for relevant chunks
-            results = self.collection.query(
-                query_embeddings=[question_embedding],
+            # Search for relevant chunks by keywords and, unless disabled, by embedding
+            retriever = self.retriever
+            results = retriever.query(
+                query_texts=[question],
+                query_embeddings=[generate_embedding(question)] if retriever.uses_vectors else None,
                 n_results=top_k
             )
             
@@ -139,14 +202,21 @@ class CompanyDataAgent(Agent):
             logger.error(f"Error answering question: {str(e)}")
             return f"Sorry, I encountered an error while trying to answer your question: {str(e)}"
 
-    def get_company_stats(self) -> Dict:
+    def answer_questions(self, questions: List[str], doc_hash: str, session: Optional[Dict] = None) -> List[Dict]:
+        """Answer several questions about one company document with batched retrieval and LLM calls"""
+        return answer_questions(self.retriever, questions, doc_hash, "company", session)
+
+    def get_company_stats(self, limit: int = 50, offset: int = 0) -> Dict:
         """Get statistics about processed company data"""
         try:
+            # Totals come from the catalog instead of loading the whole collection
+            totals = document_catalog.stats("company")
             return {
-                "total_documents": len(self.collection.get()["ids"]),
-                "document_sources": list(set([
-                    meta["source"] for meta in self.collection.get()["metadatas"]
-                ]))
+                "total_documents": totals["documents"],
+                "total_chunks": totals["chunks"],
+                "document_sources": [
+                    document["filename"] for document in document_catalog.list("company", limit=limit, offset=offset)
+                ]
             }
         except Exception as e:
             logger.error(f"Error getting company stats: {str(e)}")
@@ -169,18 +239,21 @@ class CompanyDataAgent(Agent):
                 
                 # Define capability categories to analyze
                 categories = {
-                    "technical": generate_embedding("technical skills expertise competencies technologies tools"),
-                    "experience": generate_embedding("experience past projects track record history achievements"),
-                    "certifications": generate_embedding("certifications licenses accreditations compliance standards"),
-                    "team": generate_embedding("team personnel staff resources capacity expertise"),
-                    "infrastructure": generate_embedding("infrastructure facilities equipment capabilities systems")
+                    "technical": "technical skills expertise competencies technologies tools",
+                    "experience": "experience past projects track record history achievements",
+                    "certifications": "certifications licenses accreditations compliance standards",
+                    "team": "team personnel staff resources capacity expertise",
+                    "infrastructure": "infrastructure facilities equipment capabilities systems"
                 }
                 
+                retriever = self.retriever
                 capabilities = {}
-                for category, query_embedding in categories.items():
-                    results = self.collection.query(
-                        query_embeddings=[query_embedding],
-                        n_results=5
+                for category, query in categories.items():
+                    results = retriever.query(
+                        query_texts=[query],
+                        query_embeddings=[generate_embedding(query)] if retriever.uses_vectors else None,
+                        n_results=5,
+                        where={"doc_hash": process_result["doc_hash"]}
                     )
                     capabilities[category] = results["documents"][0] if results["documents"] else []
                 
@@ -1,15 +1,29 @@
 import os
+import asyncio
 from typing import Dict, List, Optional
 from crewai import Agent
 from utils import (
-    get_llm_response, rfp_collection, company_collection, 
-    generate_embedding, llm, logger,
-    result_tracker
+    get_llm_response, get_llm_response_async, generate_embeddings, llm, logger, file_sha256,
+    result_tracker, scope_cache, RETRIEVAL_MODE, CONTEXT_CANDIDATES, LEXICAL_WEIGHT,
+    CONTEXT_SECTION_TOKENS, MMR_LAMBDA, EMBEDDING_MODEL, llm_router,
+    EVALUATION_MODE, EVALUATION_MODES
 )
 from .rfp_extractor_agent import RFPAgent
 from .company_data_agent import CompanyDataAgent
+from indexing import indexing_manager
+from context_assembly import context_assembler
+from lexical_index import HybridRetriever
+from task_graph import TaskGraph
+from compliance_screen import prepare_screen, finish_screen
 from pydantic import Field
 
+# Retrieval probes for core compliance, submission documents and preferred qualifications
+PROBES = [
+    "company registration US state business entity legal incorporation authorized license",
+    "submission document executive summary letter transmittal proposal attachments forms",
+    "preferred optional good-to-have nice-to-have desirable qualifications experience"
+]
+
 class EligibilityEvaluatorAgent(Agent):
     rfp_agent: RFPAgent = Field(default_factory=RFPAgent)
     company_agent: CompanyDataAgent = Field(default_factory=CompanyDataAgent)
@@ -24,54 +38,222 @@ class EligibilityEvaluatorAgent(Agent):
             llm=llm
         )
 
-    def evaluate_eligibility(self, rfp_path: str, company_path: str) -> Dict:
+    def evaluate_eligibility(self, rfp_path: str, company_path: str,
+                             rfp_hash: Optional[str] = None, company_hash: Optional[str] = None,
+                             mode: str = EVALUATION_MODE, rfp_name: Optional[str] = None,
+                             company_name: Optional[str] = None) -> Dict:
         """
-        Evaluate company compliance with RFP requirements
+        Evaluate company compliance with RFP requirements.
+
+        `mode` is "full" for the complete report, "screen" for the fast
+        registration verdict only, or "auto" to screen first and write the
+        full report unless the company is found ineligible. The names the
+        documents were uploaded under are catalogued if they get indexed here.
         """
         try:
-            # Process RFP and company data
-            rfp_result = self.rfp_agent.process_rfp(rfp_path)
-            company_result = self.company_agent.process_company_data(company_path)
-
-            if rfp_result["status"] == "error" or company_result["status"] == "error":
-                raise ValueError("Error processing input documents")
-
-            # Generate query embeddings for different requirement types
-            core_compliance_embedding = generate_embedding("company registration US state business entity legal incorporation authorized license")
-            submission_embedding = generate_embedding("submission document executive summary letter transmittal proposal attachments forms")
-            additional_embedding = generate_embedding("preferred optional good-to-have nice-to-have desirable qualifications experience")
-
-            # Get relevant sections from both documents
-            core_requirements = self.rfp_agent.collection.query(
-                query_embeddings=[core_compliance_embedding],
-                n_results=5
-            )
-            
-            submission_requirements = self.rfp_agent.collection.query(
-                query_embeddings=[submission_embedding],
-                n_results=5
-            )
-            
-            additional_requirements = self.rfp_agent.collection.query(
-                query_embeddings=[additional_embedding],
-                n_results=5
-            )
-            
-            company_info = self.company_agent.collection.query(
-                query_embeddings=[core_compliance_embedding],
-                n_results=5
-            )
-
-            # Prepare context for LLM evaluation
-            context = {
-                "core_requirements": core_requirements["documents"][0] if core_requirements["documents"] else [],
-                "submission_requirements": submission_requirements["documents"][0] if submission_requirements["documents"] else [],
-                "additional_requirements": additional_requirements["documents"][0] if additional_requirements["documents"] else [],
-                "company_info": company_info["documents"][0] if company_info["documents"] else []
+            if mode not in EVALUATION_MODES:
+                raise ValueError(f"Unknown evaluation mode: {mode}")
+            graph = self._evaluation_graph(rfp_path, company_path, rfp_hash, company_hash, rfp_name, company_name)
+
+            screen = None
+            if mode != "full":
+                outputs = graph.run(["screen", "rfp_index", "company_index"])
+                screen = outputs["screen"]
+                if mode == "screen" or screen["verdict"] == "NOT ELIGIBLE":
+                    return self._build_screen_result(screen, outputs["rfp_index"], outputs["company_index"],
+                                                     graph.timings)
+
+            outputs = graph.run(["evaluation", "rfp_index", "company_index"])
+            return self._build_result(outputs["evaluation"], outputs["rfp_index"], outputs["company_index"],
+                                      graph.timings, screen)
+
+        except Exception as e:
+            logger.error(f"Error in compliance evaluation: {str(e)}")
+            return {
+                "status": "error",
+                "message": str(e)
             }
 
-            # Generate evaluation using updated prompt
-            evaluation_prompt = f"""You are an expert RFP compliance evaluator. Your primary task is to determine if a company meets the basic eligibility requirements to submit a proposal.
+    async def aevaluate_eligibility(self, rfp_path: str, company_path: str,
+                                    rfp_hash: Optional[str] = None, company_hash: Optional[str] = None,
+                                    mode: str = EVALUATION_MODE, rfp_name: Optional[str] = None,
+                                    company_name: Optional[str] = None) -> Dict:
+        """
+        Evaluate company compliance without blocking the event loop.
+
+        Hashing, retrieval and embedding run on worker threads, indexing
+        jobs are awaited as futures and the LLM is called asynchronously.
+        """
+        try:
+            if mode not in EVALUATION_MODES:
+                raise ValueError(f"Unknown evaluation mode: {mode}")
+            loop = asyncio.get_running_loop()
+            rfp_hash = rfp_hash or await loop.run_in_executor(None, file_sha256, rfp_path)
+            company_hash = company_hash or await loop.run_in_executor(None, file_sha256, company_path)
+            graph = self._evaluation_graph(rfp_path, company_path, rfp_hash, company_hash, rfp_name, company_name)
+
+            screen = None
+            if mode != "full":
+                outputs = await graph.arun(["screen", "rfp_index", "company_index"])
+                screen = outputs["screen"]
+                if mode == "screen" or screen["verdict"] == "NOT ELIGIBLE":
+                    return self._build_screen_result(screen, outputs["rfp_index"], outputs["company_index"],
+                                                     graph.timings)
+
+            outputs = await graph.arun(["evaluation", "rfp_index", "company_index"])
+            return self._build_result(outputs["evaluation"], outputs["rfp_index"], outputs["company_index"],
+                                      graph.timings, screen)
+
+        except Exception as e:
+            logger.error(f"Error in compliance evaluation: {str(e)}")
+            return {
+                "status": "error",
+                "message": str(e)
+            }
+
+    def _evaluation_graph(self, rfp_path: str, company_path: str,
+                          rfp_hash: Optional[str], company_hash: Optional[str],
+                          rfp_name: Optional[str] = None, company_name: Optional[str] = None) -> TaskGraph:
+        """Wire the evaluation steps as a task graph.
+
+        Indexing of both documents and the probe embeddings run in parallel,
+        then each document's lookups, then context assembly and the LLM call.
+        Outputs are memoized by document content hash and settings, so e.g.
+        one RFP checked against several companies is only searched once.
+        """
+        rfp_hash = rfp_hash or file_sha256(rfp_path)
+        company_hash = company_hash or file_sha256(company_path)
+        retrieval = {
+            "mode": RETRIEVAL_MODE,
+            "lexical_weight": LEXICAL_WEIGHT,
+            "candidates": CONTEXT_CANDIDATES,
+            "embedding_model": EMBEDDING_MODEL
+        }
+
+        graph = TaskGraph("evaluation")
+        # Indexing is tracked by the indexing manager, which already reuses finished jobs
+        graph.add("rfp_index", lambda: self._ensure_indexed("rfp", rfp_path, rfp_hash, rfp_name),
+                  inputs={"doc_hash": rfp_hash}, cache=False,
+                  afunc=lambda: self._aensure_indexed("rfp", rfp_path, rfp_hash, rfp_name))
+        graph.add("company_index", lambda: self._ensure_indexed("company", company_path, company_hash, company_name),
+                  inputs={"doc_hash": company_hash}, cache=False,
+                  afunc=lambda: self._aensure_indexed("company", company_path, company_hash, company_name))
+        graph.add("probe_embeddings", self._embed_probes, inputs={"probes": PROBES, **retrieval},
+                  cache_if=lambda embeddings: all(embedding is not None for embedding in embeddings))
+        graph.add("rfp_matches", self._rfp_matches, deps=["rfp_index", "probe_embeddings"],
+                  inputs=retrieval)
+        graph.add("company_matches", self._company_matches, deps=["company_index", "probe_embeddings"],
+                  inputs=retrieval)
+        graph.add("context", self._assemble_context, deps=["rfp_matches", "company_matches", "probe_embeddings"],
+                  inputs={"section_tokens": CONTEXT_SECTION_TOKENS, "mmr_lambda": MMR_LAMBDA})
+        graph.add("evaluation", lambda context: get_llm_response(self._build_prompt(context), route="evaluation"),
+                  deps=["context"], inputs={"llm": llm_router.signature("evaluation")},
+                  cache=llm_router.deterministic("evaluation"),
+                  cache_if=lambda response: not response.startswith("Error:"),
+                  afunc=lambda context: get_llm_response_async(self._build_prompt(context), route="evaluation"))
+        # Fast tier: registration facts extracted from the same lookups, judged by a short LLM call
+        graph.add("screen", self._screen, deps=["rfp_matches", "company_matches"],
+                  inputs={"llm": llm_router.signature("screen")},
+                  cache=llm_router.deterministic("screen"),
+                  cache_if=lambda screen: screen["method"] != "rules (LLM unavailable)",
+                  afunc=self._ascreen)
+        return graph
+
+    def _screen_inputs(self, rfp_matches: Dict, company_matches: Dict) -> Dict:
+        # The first probe targets registration, so its matches hold the relevant chunks
+        return prepare_screen(
+            rfp_matches["documents"][0] if rfp_matches["documents"] else [],
+            company_matches["documents"][0] if company_matches["documents"] else []
+        )
+
+    def _screen(self, rfp_matches: Dict, company_matches: Dict) -> Dict:
+        """Core registration verdict without writing the full report"""
+        prepared = self._screen_inputs(rfp_matches, company_matches)
+        response = get_llm_response(prepared["prompt"], route="screen") if prepared["prompt"] else None
+        return finish_screen(prepared, response)
+
+    async def _ascreen(self, rfp_matches: Dict, company_matches: Dict) -> Dict:
+        prepared = self._screen_inputs(rfp_matches, company_matches)
+        response = await get_llm_response_async(prepared["prompt"], route="screen") \
+            if prepared["prompt"] else None
+        return finish_screen(prepared, response)
+
+    def _ensure_indexed(self, kind: str, file_path: str, doc_hash: str, filename: Optional[str] = None) -> Dict:
+        """Reuse the background index built at upload time, or wait for the in-flight job"""
+        result = indexing_manager.ensure_indexed(kind, file_path, doc_hash, filename=filename)
+        if result["status"] == "error":
+            raise ValueError("Error processing input documents")
+        return result
+
+    async def _aensure_indexed(self, kind: str, file_path: str, doc_hash: str,
+                               filename: Optional[str] = None) -> Dict:
+        """Await the indexing job as a future instead of holding a worker thread"""
+        job = indexing_manager.submit(kind, file_path, doc_hash, filename)
+        result = await asyncio.wrap_future(job["future"])
+        if result["status"] == "error":
+            raise ValueError("Error processing input documents")
+        return result
+
+    def _index(self, agent, doc_hash: str):
+        # Search only the documents in play; exact mode keeps them in memory as a normalized matrix
+        if RETRIEVAL_MODE == "exact":
+            return scope_cache.get(agent.collection, doc_hash, agent.compact_store)
+        return agent.collection
+
+    def _embed_probes(self) -> List:
+        """Embed the requirement probes in one batch, unless retrieval is keyword-only"""
+        if LEXICAL_WEIGHT >= 1.0:
+            return [None] * len(PROBES)
+        return list(generate_embeddings(PROBES))
+
+    def _rfp_matches(self, rfp_index: Dict, probe_embeddings: List) -> Dict:
+        """Answer all RFP probes with a single multi-query lookup"""
+        # Fuse keyword matches (registration states, license numbers, named forms) with vector search
+        retriever = HybridRetriever(self._index(self.rfp_agent, rfp_index["doc_hash"]),
+                                    self.rfp_agent.lexical_index, LEXICAL_WEIGHT)
+        return retriever.query(
+            query_texts=PROBES,
+            query_embeddings=probe_embeddings if retriever.uses_vectors else None,
+            n_results=CONTEXT_CANDIDATES,
+            where={"doc_hash": rfp_index["doc_hash"]},
+            include=["documents", "metadatas", "distances"] + (["embeddings"] if retriever.uses_vectors else [])
+        )
+
+    def _company_matches(self, company_index: Dict, probe_embeddings: List) -> Dict:
+        """Find the company's registration and eligibility details"""
+        retriever = HybridRetriever(self._index(self.company_agent, company_index["doc_hash"]),
+                                    self.company_agent.lexical_index, LEXICAL_WEIGHT)
+        return retriever.query(
+            query_texts=PROBES[:1],
+            query_embeddings=probe_embeddings[:1] if retriever.uses_vectors else None,
+            n_results=CONTEXT_CANDIDATES,
+            where={"doc_hash": company_index["doc_hash"]},
+            include=["documents", "metadatas", "distances"] + (["embeddings"] if retriever.uses_vectors else [])
+        )
+
+    def _assemble_context(self, rfp_matches: Dict, company_matches: Dict, probe_embeddings: List) -> Dict:
+        """Dedupe chunks across probes, diversify them and pack each section into its token budget"""
+        core_compliance_embedding, submission_embedding, additional_embedding = probe_embeddings
+
+        def section(matches, position, query_embedding):
+            return {
+                "query_embedding": query_embedding,
+                "ids": matches["ids"][position] if matches["ids"] else [],
+                "documents": matches["documents"][position] if matches["documents"] else [],
+                "embeddings": matches["embeddings"][position] if matches.get("embeddings") is not None else None,
+                "distances": matches["distances"][position] if matches.get("distances") else None
+            }
+
+        return context_assembler.assemble({
+            "core_requirements": section(rfp_matches, 0, core_compliance_embedding),
+            "submission_requirements": section(rfp_matches, 1, submission_embedding),
+            "additional_requirements": section(rfp_matches, 2, additional_embedding),
+            "company_info": section(company_matches, 0, core_compliance_embedding)
+        })
+
+    def _build_prompt(self, context: Dict) -> str:
+        """Build the evaluation prompt from the retrieved context"""
+        evaluation_prompt = f"""You are an expert RFP compliance evaluator. Your primary task is to determine if a company meets the basic eligibility requirements to submit a proposal.
 
 FOCUS ON THESE POINTS FOR CORE COMPLIANCE:
 1. Is the company legally registered to do business in the United States?
@@ -135,22 +317,36 @@ Remember:
 3. Be explicit about what makes the company eligible or not eligible
 4. Separate required documents from compliance requirements"""
 
-            evaluation_result = get_llm_response(evaluation_prompt)
+        return evaluation_prompt
 
-            return {
-                "status": "success",
-                "evaluation": evaluation_result,
-                "rfp_analysis": rfp_result,
-                "company_analysis": company_result,
-                "is_compliant": self._check_compliance(evaluation_result)
-            }
+    def _build_result(self, evaluation_result: str, rfp_result: Dict, company_result: Dict,
+                      timings: Optional[Dict] = None, screen: Optional[Dict] = None) -> Dict:
+        """Package the LLM evaluation with the document analyses"""
+        result = {
+            "status": "success",
+            "mode": "full",
+            "evaluation": evaluation_result,
+            "rfp_analysis": rfp_result,
+            "company_analysis": company_result,
+            "is_compliant": self._check_compliance(evaluation_result),
+            "timings": timings or {}
+        }
+        if screen:
+            result["screen"] = screen
+        return result
 
-        except Exception as e:
-            logger.error(f"Error in compliance evaluation: {str(e)}")
-            return {
-                "status": "error",
-                "message": str(e)
-            }
+    def _build_screen_result(self, screen: Dict, rfp_result: Dict, company_result: Dict,
+                             timings: Optional[Dict] = None) -> Dict:
+        """Package a screening verdict; the full report can be requested later and reuses the lookups"""
+        return {
+            "status": "success",
+            "mode": "screen",
+            "screen": screen,
+            "rfp_analysis": rfp_result,
+            "company_analysis": company_result,
+            "is_compliant": screen["verdict"] == "ELIGIBLE",
+            "timings": timings or {}
+        }
 
     def execute_task(self, task, context=None, tools=None):
         """Execute compliance evaluation task"""
@@ -1,15 +1,84 @@
 from typing import Dict, List, Optional
 import os
+import re
+import json
 from crewai import Agent
 from utils import (
-    parse_pdf,
-    chunk_text,
+    parse_pdf_pages,
+    join_pages,
+    prepare_chunks,
+    save_ingestion_report,
     generate_embedding,
+    generate_embeddings,
+    file_sha256,
     get_llm_response,
-    rfp_chroma_client,
+    rfp_store,
+    rfp_compact_store,
+    rfp_lexical_index,
+    LEXICAL_WEIGHT,
+    document_catalog,
+    EMBEDDING_MODEL,
     llm,
     logger
 )
+from lexical_index import HybridRetriever
+from question_answering import answer_questions
+
+# Requirement keywords, matched on word boundaries so that e.g. "can" does not
+# match "scanned" and "plus" does not match "surplus"
+MUST_HAVE_KEYWORDS = [
+    "must", "shall", "required", "mandatory", "essential",
+    "necessary", "requirements?", "minimum", "needs? to"
+]
+GOOD_TO_HAVE_KEYWORDS = [
+    "preferred", "optional", "desirable", "nice to have",
+    "good to have", "plus", "advantages?", "beneficial",
+    "ideally", "preferably", "should", r"may(?!\s+\d)", "can"  # "May 5" is a date, not a modal
+]
+
+def _keyword_alternation(keywords: List[str]) -> str:
+    # Multi-word keywords tolerate any whitespace, including line breaks from PDF extraction
+    return "|".join(keyword.replace(" ", r"\s+") for keyword in keywords)
+
+REQUIREMENT_PATTERN = re.compile(
+    rf"\b(?:(?P<must_have>{_keyword_alternation(MUST_HAVE_KEYWORDS)})"
+    rf"|(?P<good_to_have>{_keyword_alternation(GOOD_TO_HAVE_KEYWORDS)}))\b",
+    re.IGNORECASE
+)
+# Sentences end at terminal punctuation, blank lines or the start of a list item
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?;])\s+|\n\s*\n|\n(?=\s*(?:[-\u2022*]|\d+[.)]|[a-zA-Z][.)])\s)")
+
+def classify_sentence(sentence: str) -> str:
+    """Label a sentence as must_have, good_to_have or none"""
+    labels = {match.lastgroup for match in REQUIREMENT_PATTERN.finditer(sentence)}
+    if "must_have" in labels:
+        return "must_have"
+    if "good_to_have" in labels:
+        return "good_to_have"
+    return "none"
+
+def classify_chunks(chunks: List[str]) -> List[Dict]:
+    """Classify each chunk from the labels of its sentences"""
+    classifications = []
+    for chunk in chunks:
+        sentence_labels = [
+            classify_sentence(sentence) for sentence in SENTENCE_BOUNDARY.split(chunk) if sentence.strip()
+        ]
+        must_have = sentence_labels.count("must_have")
+        good_to_have = sentence_labels.count("good_to_have")
+        
+        # Default to must-have if neither is detected (conservative approach)
+        requirement_type = "must_have"
+        if good_to_have and not must_have:
+            requirement_type = "good_to_have"
+
+        classifications.append({
+            "requirement_type": requirement_type,
+            "must_have_sentences": must_have,
+            "good_to_have_sentences": good_to_have,
+            "sentence_labels": sentence_labels
+        })
+    return classifications
 
 class RFPAgent(Agent):
     def __init__(self):
@@ -48,13 +117,26 @@ class RFPAgent(Agent):
 
     @property
     def collection(self):
-        """Get a fresh reference to the collection"""
-        return rfp_chroma_client.get_or_create_collection(
-            name="rfp_documents",
-            metadata={"description": "RFP document embeddings"}
-        )
+        """Get the configured vector store for RFP documents"""
+        return rfp_store
+
+    @property
+    def compact_store(self):
+        """Get the quantized sidecar store for RFP embeddings, if enabled"""
+        return rfp_compact_store
+
+    @property
+    def lexical_index(self):
+        """Get the BM25 keyword index for RFP documents"""
+        return rfp_lexical_index
 
-    def process_rfp(self, file_path: str) -> Dict:
+    @property
+    def retriever(self):
+        """Get a retriever fusing keyword and vector search over RFP documents"""
+        return HybridRetriever(self.collection, self.lexical_index, LEXICAL_WEIGHT)
+
+    def process_rfp(self, file_path: str, doc_hash: Optional[str] = None,
+                    filename: Optional[str] = None) -> Dict:
         """Process an RFP document and store its embeddings with requirement classification"""
         logger.info(f"Processing RFP document: {file_path}")
         try:
@@ -64,56 +146,74 @@ class RFPAgent(Agent):
             if not file_path.lower().endswith('.pdf'):
                 raise ValueError("Only PDF files are supported")
 
+            # Identical content is indexed once no matter what name it was uploaded under
+            doc_hash = doc_hash or file_sha256(file_path)
+            existing = self.collection.get(where={"doc_hash": doc_hash}, limit=1)
+            if existing["ids"]:
+                logger.info(f"Document {doc_hash} is already indexed, skipping ingestion")
+                if not self.lexical_index.has(doc_hash):
+                    self.lexical_index.add_from_store(doc_hash, self.collection)
+                if not document_catalog.has("rfp", doc_hash):
+                    document_catalog.record("rfp", doc_hash, existing["metadatas"][0]["source"],
+                                            existing["metadatas"][0]["total_chunks"], filename=filename)
+                return {
+                    "status": "success",
+                    "file": file_path,
+                    "filename": filename or os.path.basename(file_path),
+                    "doc_hash": doc_hash,
+                    "chunks_processed": existing["metadatas"][0]["total_chunks"]
+                }
+
             # Extract text
-            text = parse_pdf(file_path)
-            if not text:
+            pages = parse_pdf_pages(file_path, doc_hash)
+            if not join_pages(pages):
                 raise ValueError("No text could be extracted from the PDF")
             
-            # Create chunks
-            chunks = chunk_text(text, chunk_size=500, overlap=50)
-            logger.info(f"Created {len(chunks)} text chunks")
-
-            # Keywords for classification
-            must_have_keywords = [
-                "must", "shall", "required", "mandatory", "essential",
-                "necessary", "requirement", "minimum", "need to", "needs to"
-            ]
-            good_to_have_keywords = [
-                "preferred", "optional", "desirable", "nice to have",
-                "good to have", "plus", "advantage", "beneficial",
-                "ideally", "preferably", "should", "may", "can"
-            ]
-
-            # Process chunks and store embeddings with classification
-            for i, chunk in enumerate(chunks):
-                # Classify the chunk based on keyword presence
-                is_must_have = any(keyword in chunk.lower() for keyword in must_have_keywords)
-                is_good_to_have = any(keyword in chunk.lower() for keyword in good_to_have_keywords)
-                
-                # Default to must-have if neither is detected (conservative approach)
-                requirement_type = "must_have"
-                if is_good_to_have and not is_must_have:
-                    requirement_type = "good_to_have"
-
-                embedding = generate_embedding(chunk)
-                if embedding:
-                    self.collection.add(
-                        embeddings=[embedding],
-                        documents=[chunk],
-                        metadatas=[{
-                            "source": file_path,
-                            "chunk_index": i,
-                            "total_chunks": len(chunks),
-                            "requirement_type": requirement_type
-                        }],
-                        ids=[f"rfp_{os.path.basename(file_path)}_{i}"]
-                    )
+            # Create chunks, leaving out running headers/footers and repeated passages
+            chunks, dropped = prepare_chunks(pages, chunk_size=500, overlap=50)
+            save_ingestion_report("rfp", doc_hash, dropped)
+            if not chunks:
+                raise ValueError("No content left after removing boilerplate")
+            logger.info(f"Created {len(chunks)} text chunks "
+                        f"({len(dropped['boilerplate_lines'])} boilerplate lines, "
+                        f"{len(dropped['duplicate_pages'])} duplicate pages and "
+                        f"{len(dropped['duplicate_chunks'])} duplicate chunks removed)")
+
+            # Classify every sentence of every chunk in one pass over the document
+            metadatas = []
+            for i, classification in enumerate(classify_chunks(chunks)):
+                metadatas.append({
+                    "source": file_path,
+                    "doc_hash": doc_hash,
+                    "chunk_index": i,
+                    "total_chunks": len(chunks),
+                    "requirement_type": classification["requirement_type"],
+                    "must_have_sentences": classification["must_have_sentences"],
+                    "good_to_have_sentences": classification["good_to_have_sentences"],
+                    # Metadata values must be scalars, so per-sentence labels are stored as JSON
+                    "sentence_labels": json.dumps(classification["sentence_labels"])
+                })
+
+            embeddings = generate_embeddings(chunks, as_numpy=True)
+            if embeddings is None:
+                raise ValueError("Failed to generate embeddings for the RFP chunks")
+
+            ids = [f"rfp_{doc_hash}_{i}" for i in range(len(chunks))]
+            self.collection.add(ids=ids, embeddings=embeddings, documents=chunks, metadatas=metadatas)
+            if self.compact_store:
+                self.compact_store.save(doc_hash, ids, embeddings)
+            self.lexical_index.add(doc_hash, ids, chunks, metadatas)
+            document_catalog.record("rfp", doc_hash, file_path, len(chunks), len(pages), EMBEDDING_MODEL,
+                                    filename=filename)
 
             logger.info("Successfully processed and stored RFP embeddings")
             return {
                 "status": "success",
                 "file": file_path,
-                "chunks_processed": len(chunks)
+                "filename": filename or os.path.basename(file_path),
+                "doc_hash": doc_hash,
+                "chunks_processed": len(chunks),
+                "duplicate_chunks_dropped": len(dropped["duplicate_chunks"])
             }
 
         except Exception as e:
@@ -124,15 +224,23 @@ class RFPAgent(Agent):
                 "error": str(e)
             }
 
+    def list_documents(self, limit: int = 50, offset: int = 0) -> Dict:
+        """List catalogued RFP documents, newest first, with totals"""
+        return {
+            "documents": document_catalog.list("rfp", limit=limit, offset=offset),
+            "totals": document_catalog.stats("rfp"),
+            "limit": limit,
+            "offset": offset
+        }
+
     def answer_question(self, question: str, top_k: int = 3) -> str:
         """Answer a question about the RFP using stored embeddings and LLM"""
         try:
-            # Generate embedding for the question
-            question_embedding = generate_embedding(question)
-            
-            # Search for relevant chunks
-            results = self.collection.query(
-                query_embeddings=[question_embedding],
+            # Search for relevant chunks by keywords and, unless disabled, by embedding
+            retriever = self.retriever
+            results = retriever.query(
+                query_texts=[question],
+                query_embeddings=[generate_embedding(question)] if retriever.uses_vectors else None,
                 n_results=top_k
             )
             
@@ -160,6 +268,10 @@ class RFPAgent(Agent):
             logger.error(f"Error answering question: {str(e)}")
             return f"Sorry, I encountered an error while trying to answer your question: {str(e)}"
 
+    def answer_questions(self, questions: List[str], doc_hash: str, session: Optional[Dict] = None) -> List[Dict]:
+        """Answer several questions about one RFP with batched retrieval and LLM calls"""
+        return answer_questions(self.retriever, questions, doc_hash, "RFP", session)
+
     def execute_task(self, task, context=None, tools=None):
         """Execute RFP analysis task"""
         logger.info(f"Executing task: {task.name}")
@@ -176,16 +288,29 @@ class RFPAgent(Agent):
                     return process_result
                 
                 # Query for different requirement types
-                must_have_results = self.collection.query(
-                    query_embeddings=[generate_embedding("essential mandatory required must-have needs")],
+                retriever = self.retriever
+                must_have_query = "essential mandatory required must-have needs"
+                good_to_have_query = "preferred optional good-to-have desirable advantage"
+                must_have_results = retriever.query(
+                    query_texts=[must_have_query],
+                    query_embeddings=[generate_embedding(must_have_query)] if retriever.uses_vectors else None,
                     n_results=10,
-                    where={"requirement_type": "must_have"}
+                    where={"$and": [
+                        {"requirement_type": "must_have"},
+                        # Skip chunks that are only must-have by default and state no requirement
+                        {"must_have_sentences": {"$gt": 0}},
+                        {"doc_hash": process_result["doc_hash"]}
+                    ]}
                 )
                 
-                good_to_have_results = self.collection.query(
-                    query_embeddings=[generate_embedding("preferred optional good-to-have desirable advantage")],
+                good_to_have_results = retriever.query(
+                    query_texts=[good_to_have_query],
+                    query_embeddings=[generate_embedding(good_to_have_query)] if retriever.uses_vectors else None,
                     n_results=10,
-                    where={"requirement_type": "good_to_have"}
+                    where={"$and": [
+                        {"requirement_type": "good_to_have"},
+                        {"doc_hash": process_result["doc_hash"]}
+                    ]}
                 )
                 
                 # Return structured analysis
@@ -1,14 +1,27 @@
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, Response, request, jsonify, render_template, send_file
 import os
+import uuid
+from functools import wraps
 from werkzeug.utils import secure_filename
 from crewai import Crew, Task
 from agents.rfp_extractor_agent import RFPAgent
 from agents.company_data_agent import CompanyDataAgent
 from agents.master_agent import EligibilityEvaluatorAgent
-from utils import logger, feedback_analyzer, DIRS, result_tracker, reset_collections
+from utils import (
+    logger, feedback_analyzer, DIRS, result_tracker, reset_collections,
+    file_sha256, rfp_blob_store, company_blob_store, readiness, warm_up,
+    CHUNKED_UPLOAD_CHUNK_SIZE, QA_MAX_QUESTIONS, document_catalog, REPORT_CACHE_MAX_AGE,
+    EVALUATION_MODE, EVALUATION_MODES
+)
+from indexing import indexing_manager
+from chunked_uploads import chunked_upload_manager, UploadError
+from question_answering import qa_session_store
+from profiling import SamplingProfiler, profile_store, profiling_requested, is_admin
+from report_export import report_cache
+from admission import admission_controller, AdmissionRejected, client_key
 
 # Reset collections on startup to use new model
-logger.info("Resetting ChromaDB collections for new model...")
+logger.info("Resetting vector store collections for new model...")
 reset_collections()
 
 app = Flask(__name__)
@@ -17,6 +30,12 @@ app = Flask(__name__)
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 ALLOWED_EXTENSIONS = {'pdf'}
 
+# Map upload route names to document kinds, their blob stores and legacy directories
+UPLOAD_KINDS = {
+    'rfp': ('rfp', rfp_blob_store, DIRS['data']['rfps']),
+    'company-data': ('company', company_blob_store, DIRS['data']['company_data'])
+}
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
@@ -30,6 +49,100 @@ def validate_file_type(file):
     
     return True, None
 
+def resolve_upload(kind, filename):
+    """Find the stored document for an uploaded filename, including files saved before hashing"""
+    _, blob_store, legacy_dir = UPLOAD_KINDS[kind]
+    filename = secure_filename(filename)
+    
+    stored = blob_store.resolve(filename)
+    if stored:
+        return stored
+    
+    legacy_path = os.path.join(legacy_dir, filename)
+    if os.path.exists(legacy_path):
+        return {"filename": filename, "hash": file_sha256(legacy_path), "path": legacy_path}
+    return None
+
+def build_evaluation_response(result):
+    """Save a successful evaluation and split it into the sections shown in the UI"""
+    evaluation_id = result_tracker.save_result(result)
+    
+    # A screening verdict has no report sections
+    if result.get("mode") == "screen":
+        return {
+            "status": "success",
+            "evaluation_id": evaluation_id,
+            "mode": "screen",
+            "screen": result["screen"],
+            "is_compliant": result["is_compliant"],
+            "timings": result.get("timings", {})
+        }
+    
+    # Structure the response to match test evaluation format
+    return {
+        "status": "success",
+        "evaluation_id": evaluation_id,
+        "evaluation": result["evaluation"],  # Send the full evaluation text
+        "sections": {
+            "core_compliance": result["evaluation"].split("Core Compliance Status:")[1].split("Required Submission Documents:")[0].strip(),
+            "submission_requirements": result["evaluation"].split("Required Submission Documents:")[1].split("Additional Desired Qualifications:")[0].strip(),
+            "additional_qualifications": result["evaluation"].split("Additional Desired Qualifications:")[1].split("Overall Compliance Assessment:")[0].strip(),
+            "compliance_assessment": result["evaluation"].split("Overall Compliance Assessment:")[1].split("Required Actions:")[0].strip(),
+            "required_actions": result["evaluation"].split("Required Actions:")[1].strip()
+        },
+        "is_compliant": result.get("is_compliant", False),
+        "mode": result.get("mode", "full"),
+        "screen": result.get("screen"),
+        "timings": result.get("timings", {})
+    }
+
+def profiled(view):
+    """Run a route under the sampling profiler when profiling is requested.
+
+    The profile is stored under the evaluation id of the response (or a
+    request id if there is none) and its id returned in X-Profile-Id.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not profiling_requested(request.headers):
+            return view(*args, **kwargs)
+        
+        profiler = SamplingProfiler()
+        profiler.start()
+        try:
+            response = view(*args, **kwargs)
+        finally:
+            profiler.stop()
+        
+        response = app.make_response(response)
+        try:
+            body = response.get_json(silent=True) or {}
+            profile_id = body.get("evaluation_id") or f"request-{uuid.uuid4().hex}"
+            profile_store.save(profile_id, profiler.speedscope(f"{request.method} {request.path}"), profiler.duration)
+            response.headers["X-Profile-Id"] = profile_id
+        except Exception as e:
+            logger.error(f"Error saving request profile: {str(e)}")
+        return response
+    return wrapper
+
+def admitted(view):
+    """Run a route only once admission control grants it a slot.
+
+    Rejected requests get 429 with a Retry-After header right away instead
+    of queuing behind the work already in flight.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        try:
+            with admission_controller.admit(client_key(request.headers, request.remote_addr)):
+                return view(*args, **kwargs)
+        except AdmissionRejected as e:
+            logger.warning(f"Rejected {request.method} {request.path} ({e.reason})")
+            response = jsonify({"status": "error", "message": str(e), "reason": e.reason})
+            response.headers["Retry-After"] = str(e.retry_after)
+            return response, 429
+    return wrapper
+
 def create_crew():
     """Create and return a CrewAI crew with all agents and their coordinated workflow"""
     logger.info("Initializing agent workflow")
@@ -109,14 +222,18 @@ def upload_rfp():
             return jsonify({"status": "error", "error": error_message}), 400
         
         filename = secure_filename(file.filename)
-        file_path = os.path.join(DIRS['data']['rfps'], filename)
-        logger.info(f"Saving file to: {file_path}")
-        file.save(file_path)
+        stored = rfp_blob_store.save_stream(file.stream, filename)
+        logger.info(f"Stored {filename} as {stored['hash']} (duplicate: {stored['duplicate']})")
+        
+        # Start ingestion right away so /evaluate can reuse the finished index
+        job = indexing_manager.submit("rfp", stored["path"], stored["hash"], filename)
         
         return jsonify({
             "status": "success",
             "message": "RFP file uploaded successfully",
-            "filename": filename
+            "filename": filename,
+            "file_hash": stored["hash"],
+            "indexing_status": job["status"]
         }), 200
         
     except Exception as e:
@@ -143,21 +260,123 @@ def upload_company_data():
             return jsonify({"status": "error", "error": error_message}), 400
         
         filename = secure_filename(file.filename)
-        file_path = os.path.join(DIRS['data']['company_data'], filename)
-        logger.info(f"Saving file to: {file_path}")
-        file.save(file_path)
+        stored = company_blob_store.save_stream(file.stream, filename)
+        logger.info(f"Stored {filename} as {stored['hash']} (duplicate: {stored['duplicate']})")
+        
+        # Start ingestion right away so /evaluate can reuse the finished index
+        job = indexing_manager.submit("company", stored["path"], stored["hash"], filename)
         
         return jsonify({
             "status": "success",
             "message": "Company data file uploaded successfully",
-            "filename": filename
+            "filename": filename,
+            "file_hash": stored["hash"],
+            "indexing_status": job["status"]
         }), 200
     
     except Exception as e:
         logger.error(f"Error uploading company data file: {str(e)}")
         return jsonify({"status": "error", "error": str(e)}), 500
 
+@app.route('/upload/<kind>/status/<filename>', methods=['GET'])
+def upload_status(kind, filename):
+    """Report the background indexing status of an uploaded document"""
+    if kind not in UPLOAD_KINDS:
+        return jsonify({"status": "error", "error": f"Unknown upload type: {kind}"}), 404
+    
+    stored = resolve_upload(kind, filename)
+    if not stored:
+        return jsonify({"status": "error", "error": "File not found"}), 404
+    
+    status = indexing_manager.status(UPLOAD_KINDS[kind][0], stored["hash"])
+    status["file"] = stored["filename"]
+    return jsonify(status), 200
+
+@app.route('/upload/<kind>/chunked', methods=['POST'])
+def init_chunked_upload(kind):
+    """Start a resumable upload; the file is then sent with PUT requests in sequential chunks"""
+    try:
+        if kind not in UPLOAD_KINDS:
+            return jsonify({"status": "error", "error": f"Unknown upload type: {kind}"}), 404
+        
+        data = request.get_json()
+        if not data or 'filename' not in data or 'size' not in data:
+            return jsonify({"status": "error", "error": "Filename and size are required"}), 400
+        
+        filename = secure_filename(data['filename'])
+        if not filename.lower().endswith('.pdf'):
+            return jsonify({"status": "error", "error": "Only PDF files are allowed"}), 400
+        
+        state = chunked_upload_manager.init(kind, filename, int(data['size']), data.get('sha256'))
+        state["chunk_size"] = CHUNKED_UPLOAD_CHUNK_SIZE
+        return jsonify(state), 201
+    
+    except UploadError as e:
+        return jsonify({"status": "error", "error": str(e)}), e.status_code
+    except Exception as e:
+        logger.error(f"Error starting chunked upload: {str(e)}")
+        return jsonify({"status": "error", "error": str(e)}), 500
+
+@app.route('/upload/chunked/<upload_id>', methods=['GET'])
+def chunked_upload_status(upload_id):
+    """Report how many bytes of an upload have been received, i.e. where to resume"""
+    try:
+        return jsonify(chunked_upload_manager.get(upload_id)), 200
+    except UploadError as e:
+        return jsonify({"status": "error", "error": str(e)}), e.status_code
+
+@app.route('/upload/chunked/<upload_id>', methods=['PUT'])
+def put_upload_chunk(upload_id):
+    """Append a chunk at ?offset=N; an optional X-Chunk-SHA256 header is verified"""
+    try:
+        offset = request.args.get('offset', type=int)
+        if offset is None:
+            return jsonify({"status": "error", "error": "Chunk offset is required"}), 400
+        
+        state = chunked_upload_manager.put_chunk(
+            upload_id, offset, request.stream, request.headers.get('X-Chunk-SHA256')
+        )
+        return jsonify(state), 200
+    
+    except UploadError as e:
+        body = {"status": "error", "error": str(e)}
+        if e.state:
+            body["received"] = e.state["received"]
+        return jsonify(body), e.status_code
+    except Exception as e:
+        logger.error(f"Error storing upload chunk: {str(e)}")
+        return jsonify({"status": "error", "error": str(e)}), 500
+
+@app.route('/upload/chunked/<upload_id>/complete', methods=['POST'])
+def complete_chunked_upload(upload_id):
+    """Verify a finished upload, store it and start indexing it"""
+    try:
+        state = chunked_upload_manager.get(upload_id)
+        doc_kind, blob_store, _ = UPLOAD_KINDS[state["kind"]]
+        state = chunked_upload_manager.complete(upload_id, blob_store)
+        
+        job = indexing_manager.submit(doc_kind, state["path"], state["hash"], state["filename"])
+        
+        return jsonify({
+            "status": "success",
+            "message": "File uploaded successfully",
+            "filename": state["filename"],
+            "file_hash": state["hash"],
+            "indexing_status": job["status"]
+        }), 200
+    
+    except UploadError as e:
+        body = {"status": "error", "error": str(e)}
+        if e.state:
+            body["received"] = e.state["received"]
+        return jsonify(body), e.status_code
+    except Exception as e:
+        logger.error(f"Error completing chunked upload: {str(e)}")
+        return jsonify({"status": "error", "error": str(e)}), 500
+
 @app.route('/evaluate', methods=['POST'])
+@admitted
+@profiled
 def evaluate_eligibility():
     """Evaluate RFP eligibility using the CrewAI workflow"""
     try:
@@ -165,17 +384,25 @@ def evaluate_eligibility():
         if not data or 'rfp_file' not in data or 'company_file' not in data:
             return jsonify({"error": "Both RFP and company file names are required"}), 400
         
-        rfp_path = os.path.join(DIRS['data']['rfps'], secure_filename(data['rfp_file']))
-        company_path = os.path.join(DIRS['data']['company_data'], secure_filename(data['company_file']))
+        rfp_doc = resolve_upload('rfp', data['rfp_file'])
+        company_doc = resolve_upload('company-data', data['company_file'])
         
-        if not (os.path.exists(rfp_path) and os.path.exists(company_path)):
+        if not (rfp_doc and company_doc):
             return jsonify({"error": "RFP or company file not found. Please upload files first."}), 404
+        
+        mode = data.get('mode', EVALUATION_MODE)
+        if mode not in EVALUATION_MODES:
+            return jsonify({"error": f"mode must be one of: {', '.join(EVALUATION_MODES)}"}), 400
 
         # Initialize evaluator agent
         evaluator = EligibilityEvaluatorAgent()
         
         # Execute evaluation
-        result = evaluator.evaluate_eligibility(rfp_path, company_path)
+        result = evaluator.evaluate_eligibility(
+            rfp_doc["path"], company_doc["path"],
+            rfp_hash=rfp_doc["hash"], company_hash=company_doc["hash"], mode=mode,
+            rfp_name=rfp_doc["filename"], company_name=company_doc["filename"]
+        )
         
         if result["status"] == "error":
             return jsonify({
@@ -183,25 +410,7 @@ def evaluate_eligibility():
                 "message": result["message"]
             }), 500
 
-        # Save evaluation result
-        evaluation_id = result_tracker.save_result(result)
-        
-        # Structure the response to match test evaluation format
-        response = {
-            "status": "success",
-            "evaluation_id": evaluation_id,
-            "evaluation": result["evaluation"],  # Send the full evaluation text
-            "sections": {
-                "core_compliance": result["evaluation"].split("Core Compliance Status:")[1].split("Required Submission Documents:")[0].strip(),
-                "submission_requirements": result["evaluation"].split("Required Submission Documents:")[1].split("Additional Desired Qualifications:")[0].strip(),
-                "additional_qualifications": result["evaluation"].split("Additional Desired Qualifications:")[1].split("Overall Compliance Assessment:")[0].strip(),
-                "compliance_assessment": result["evaluation"].split("Overall Compliance Assessment:")[1].split("Required Actions:")[0].strip(),
-                "required_actions": result["evaluation"].split("Required Actions:")[1].strip()
-            },
-            "is_compliant": result.get("is_compliant", False)
-        }
-        
-        return jsonify(response), 200
+        return jsonify(build_evaluation_response(result)), 200
             
     except Exception as e:
         logger.error(f"Error during eligibility evaluation: {str(e)}")
@@ -210,6 +419,105 @@ def evaluate_eligibility():
             "message": str(e)
         }), 500
 
+@app.route('/ask/<kind>', methods=['POST'])
+@admitted
+def ask_questions(kind):
+    """Answer a batch of questions about an uploaded RFP or company document"""
+    try:
+        if kind not in UPLOAD_KINDS:
+            return jsonify({"error": "Resource not found"}), 404
+        
+        data = request.get_json()
+        if not data or 'file' not in data or not data.get('questions'):
+            return jsonify({"error": "A file name and at least one question are required"}), 400
+        
+        questions = data['questions']
+        if isinstance(questions, str):
+            questions = [questions]
+        questions = [question.strip() for question in questions if isinstance(question, str) and question.strip()]
+        if not questions:
+            return jsonify({"error": "A file name and at least one question are required"}), 400
+        if len(questions) > QA_MAX_QUESTIONS:
+            return jsonify({"error": f"At most {QA_MAX_QUESTIONS} questions can be asked at once"}), 400
+        
+        doc = resolve_upload(kind, data['file'])
+        if not doc:
+            return jsonify({"error": "File not found. Please upload it first."}), 404
+        
+        # Follow-up questions reuse the session's earlier answers and retrieved chunks
+        index_kind = UPLOAD_KINDS[kind][0]
+        session = None
+        if data.get('session_id'):
+            session = qa_session_store.get(data['session_id'])
+            if not session:
+                return jsonify({"error": "Session not found or expired"}), 404
+            if (session["kind"], session["doc_hash"]) != (index_kind, doc["hash"]):
+                return jsonify({"error": "Session belongs to a different document"}), 400
+        
+        indexed = indexing_manager.ensure_indexed(index_kind, doc["path"], doc["hash"], filename=doc["filename"])
+        if indexed["status"] == "error":
+            return jsonify({"status": "error", "message": indexed["error"]}), 500
+        
+        # A new session is only kept once its first questions are answered, since a
+        # failed request never returns its id to the client
+        new_session = session is None
+        if new_session:
+            session = qa_session_store.create(index_kind, doc["hash"])
+        agent = RFPAgent() if index_kind == 'rfp' else CompanyDataAgent()
+        try:
+            answers = agent.answer_questions(questions, doc["hash"], session)
+        except Exception:
+            if new_session:
+                qa_session_store.discard(session["session_id"])
+            raise
+        
+        return jsonify({
+            "status": "success",
+            "session_id": session["session_id"],
+            "file_hash": doc["hash"],
+            "answers": answers
+        }), 200
+        
+    except Exception as e:
+        logger.error(f"Error answering questions: {str(e)}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+@app.route('/ask/session/<session_id>', methods=['GET'])
+def get_ask_session(session_id):
+    """Get the questions and answers of a question-answering session"""
+    session = qa_session_store.get(session_id)
+    if not session:
+        return jsonify({"error": "Session not found or expired"}), 404
+    return jsonify({
+        "session_id": session["session_id"],
+        "kind": session["kind"],
+        "file_hash": session["doc_hash"],
+        "turns": session["turns"]
+    }), 200
+
+@app.route('/documents', methods=['GET'])
+def list_documents():
+    """List ingested documents page by page, with totals from the document catalog"""
+    try:
+        kind = request.args.get('kind')
+        if kind and kind not in UPLOAD_KINDS:
+            return jsonify({"error": "kind must be one of: " + ", ".join(UPLOAD_KINDS)}), 400
+        limit = min(max(request.args.get('limit', 50, type=int), 1), 500)
+        offset = max(request.args.get('offset', 0, type=int), 0)
+        
+        catalog_kind = UPLOAD_KINDS[kind][0] if kind else None
+        return jsonify({
+            "status": "success",
+            "documents": document_catalog.list(catalog_kind, limit=limit, offset=offset),
+            "totals": document_catalog.stats(catalog_kind),
+            "limit": limit,
+            "offset": offset
+        }), 200
+        
+    except Exception as e:
+        logger.error(f"Error listing documents: {str(e)}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
 @app.route('/feedback', methods=['POST'])
 def submit_feedback():
     """Submit feedback for an RFP evaluation"""
@@ -238,14 +546,72 @@ def submit_feedback():
         logger.error(f"Error submitting feedback: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/evaluations/<evaluation_id>/report.pdf', methods=['GET'])
+def download_report(evaluation_id):
+    """Download a stored evaluation as a PDF report, rendered once and then served from cache"""
+    try:
+        result = result_tracker.load_result(evaluation_id)
+        if result is None:
+            return jsonify({"status": "error", "error": "Evaluation not found"}), 404
+        
+        path = report_cache.get(evaluation_id, result)
+        # Conditional requests with a matching ETag get 304 Not Modified
+        response = send_file(path, mimetype='application/pdf', as_attachment=True,
+                             download_name=f"RFP_Evaluation_Report_{evaluation_id[:8]}.pdf",
+                             conditional=True, etag=report_cache.etag(evaluation_id),
+                             max_age=REPORT_CACHE_MAX_AGE)
+        response.cache_control.private = True
+        response.cache_control.immutable = True
+        return response
+        
+    except Exception as e:
+        logger.error(f"Error exporting report for evaluation {evaluation_id}: {str(e)}")
+        return jsonify({"status": "error", "error": str(e)}), 500
+
 @app.route('/evaluate')
 def evaluate():
     """Render the evaluation page"""
     return render_template('index.html')
 
+@app.route('/admin/profiles', methods=['GET'])
+def list_profiles():
+    """List stored request profiles (admin only)"""
+    if not is_admin(request.headers):
+        return jsonify({"error": "Admin token required"}), 403
+    return jsonify({"profiles": profile_store.list(request.args.get('limit', 50, type=int))}), 200
+
+@app.route('/admin/profiles/<profile_id>', methods=['GET'])
+def get_profile(profile_id):
+    """Download a stored profile as a speedscope file (admin only); open it at https://www.speedscope.app"""
+    if not is_admin(request.headers):
+        return jsonify({"error": "Admin token required"}), 403
+    path = profile_store.path(profile_id)
+    if not path or not os.path.exists(path):
+        return jsonify({"error": "Profile not found"}), 404
+    return send_file(path, mimetype='application/json', as_attachment=True,
+                     download_name=f"{profile_id}.speedscope.json")
+
+@app.route('/healthz')
+def liveness():
+    """Liveness probe: the worker is up and serving requests"""
+    return jsonify({"status": "alive"}), 200
+
+@app.route('/readyz')
+def readiness_check():
+    """Readiness probe: the embedding model and vector stores are warmed up"""
+    status = dict(readiness, status="ready" if readiness["ready"] else "warming_up")
+    return jsonify(status), 200 if readiness["ready"] else 503
+
+@app.route('/metrics')
+def metrics():
+    """Admission control metrics of this worker in the Prometheus text format"""
+    return Response(admission_controller.prometheus(), mimetype='text/plain; version=0.0.4')
+
 @app.errorhandler(404)
 def not_found(e):
     return jsonify({"error": "Resource not found"}), 404
 
 if __name__ == '__main__':
+    # Development server only; use serve.py for deployments
+    warm_up()
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
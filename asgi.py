@@ -0,0 +1,114 @@
+"""ASGI entry point with an asyncio-native evaluation route.
+
+Run with:
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+
+POST /evaluate is served natively so one process can keep many evaluations
+in flight while they wait on the LLM; every other route is delegated to the
+Flask app. Both share the worker's admission controller, so queued
+evaluations wait on the event loop without holding a thread.
+"""
+import json
+import asyncio
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from fastapi.middleware.wsgi import WSGIMiddleware
+from app import app as flask_app, resolve_upload, build_evaluation_response
+from agents.master_agent import EligibilityEvaluatorAgent
+from utils import logger, readiness, warm_up, ASYNC_EXECUTOR_WORKERS, EVALUATION_MODE, EVALUATION_MODES
+from profiling import SamplingProfiler, profile_store, profiling_requested
+from admission import admission_controller, AdmissionRejected, client_key
+
+_evaluator = None
+
+def get_evaluator() -> EligibilityEvaluatorAgent:
+    """Agents hold no per-request state, so one evaluator serves all requests"""
+    global _evaluator
+    if _evaluator is None:
+        _evaluator = EligibilityEvaluatorAgent()
+    return _evaluator
+
+@asynccontextmanager
+async def lifespan(app):
+    # CPU-bound parsing, embedding and file I/O run on this pool
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(
+        ThreadPoolExecutor(max_workers=ASYNC_EXECUTOR_WORKERS, thread_name_prefix="async-exec")
+    )
+    if not readiness["ready"]:
+        loop.run_in_executor(None, warm_up)
+    yield
+
+app = FastAPI(lifespan=lifespan)
+
+@app.post('/evaluate')
+async def evaluate_eligibility(request: Request):
+    """Evaluate RFP eligibility once admitted, rejecting with 429 when the server is saturated"""
+    try:
+        async with admission_controller.aadmit(client_key(request.headers, request.client and request.client.host)):
+            return await _profiled_evaluate(request)
+    except AdmissionRejected as e:
+        logger.warning(f"Rejected POST /evaluate ({e.reason})")
+        return JSONResponse({"status": "error", "message": str(e), "reason": e.reason}, status_code=429,
+                            headers={"Retry-After": str(e.retry_after)})
+
+async def _profiled_evaluate(request: Request) -> JSONResponse:
+    """Evaluate under the sampling profiler when profiling is requested"""
+    if not profiling_requested(request.headers):
+        return await _evaluate(request)
+    
+    # Samples the event loop and executor threads, so concurrent requests show up too
+    profiler = SamplingProfiler()
+    profiler.start()
+    try:
+        response = await _evaluate(request)
+    finally:
+        profiler.stop()
+    try:
+        body = json.loads(response.body) if response.body else {}
+        profile_id = body.get("evaluation_id") or f"request-{uuid.uuid4().hex}"
+        profile_store.save(profile_id, profiler.speedscope("POST /evaluate"), profiler.duration)
+        response.headers["X-Profile-Id"] = profile_id
+    except Exception as e:
+        logger.error(f"Error saving request profile: {str(e)}")
+    return response
+
+async def _evaluate(request: Request) -> JSONResponse:
+    """Evaluate RFP eligibility without tying up a worker thread while the LLM responds"""
+    try:
+        data = await request.json()
+        if not data or 'rfp_file' not in data or 'company_file' not in data:
+            return JSONResponse({"error": "Both RFP and company file names are required"}, status_code=400)
+        
+        loop = asyncio.get_running_loop()
+        rfp_doc = await loop.run_in_executor(None, resolve_upload, 'rfp', data['rfp_file'])
+        company_doc = await loop.run_in_executor(None, resolve_upload, 'company-data', data['company_file'])
+        
+        if not (rfp_doc and company_doc):
+            return JSONResponse({"error": "RFP or company file not found. Please upload files first."}, status_code=404)
+        
+        mode = data.get('mode', EVALUATION_MODE)
+        if mode not in EVALUATION_MODES:
+            return JSONResponse({"error": f"mode must be one of: {', '.join(EVALUATION_MODES)}"}, status_code=400)
+        
+        result = await get_evaluator().aevaluate_eligibility(
+            rfp_doc["path"], company_doc["path"],
+            rfp_hash=rfp_doc["hash"], company_hash=company_doc["hash"], mode=mode,
+            rfp_name=rfp_doc["filename"], company_name=company_doc["filename"]
+        )
+        
+        if result["status"] == "error":
+            return JSONResponse({"status": "error", "message": result["message"]}, status_code=500)
+        
+        response = await loop.run_in_executor(None, build_evaluation_response, result)
+        return JSONResponse(response, status_code=200)
+    
+    except Exception as e:
+        logger.error(f"Error during eligibility evaluation: {str(e)}")
+        return JSONResponse({"status": "error", "message": str(e)}, status_code=500)
+
+# Everything else (pages, uploads, feedback) is served by the Flask app
+app.mount('/', WSGIMiddleware(flask_app))
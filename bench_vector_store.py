@@ -0,0 +1,136 @@
+"""Benchmark recall@k and query latency of the vector store backends on the local corpus.
+
+Usage:
+    python bench_vector_store.py [--k 5] [--queries 200] [--space l2] [--m 16 32] [--ef-search 10 50 100]
+
+Every PDF under data/ is parsed, chunked and embedded once; each backend then
+indexes the same vectors and answers the same queries. Recall is measured
+against exact brute-force search in the same distance space.
+"""
+import argparse
+import glob
+import os
+import shutil
+import tempfile
+import time
+import numpy as np
+from utils import BASE_DIR, parse_pdf, chunk_text, embedding_model, logger
+from vector_store import create_vector_store, faiss
+
+# Probe queries used by the evaluation workflow, mixed into the sampled queries
+PROBE_QUERIES = [
+    "company registration US state business entity legal incorporation authorized license",
+    "submission document executive summary letter transmittal proposal attachments forms",
+    "preferred optional good-to-have nice-to-have desirable qualifications experience",
+    "essential mandatory required must-have needs",
+    "technical skills expertise competencies technologies tools",
+    "certifications licenses accreditations compliance standards"
+]
+
+def load_corpus():
+    """Parse and chunk every PDF stored under data/"""
+    paths = sorted(set(glob.glob(os.path.join(BASE_DIR, 'data', '**', '*.pdf'), recursive=True)))
+    chunks = []
+    for path in paths:
+        text = parse_pdf(path)
+        if text:
+            chunks.extend(chunk_text(text, chunk_size=500, overlap=50))
+    logger.info(f"Benchmark corpus: {len(paths)} PDFs, {len(chunks)} chunks")
+    return chunks
+
+def sample_queries(chunks, count, seed=0):
+    """Use the probe queries plus the first sentence of randomly sampled chunks"""
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(chunks), size=min(count, len(chunks)), replace=False)
+    sampled = [chunks[i].split('. ')[0][:200] for i in picks]
+    return PROBE_QUERIES + sampled
+
+def exact_neighbours(corpus, queries, k, space):
+    """Ground-truth top-k indices by brute force"""
+    if space == "cosine":
+        corpus = corpus / np.linalg.norm(corpus, axis=1, keepdims=True)
+        queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    if space == "l2":
+        distances = (queries ** 2).sum(1, keepdims=True) - 2 * queries @ corpus.T + (corpus ** 2).sum(1)
+    else:
+        distances = -(queries @ corpus.T)
+    return np.argsort(distances, axis=1)[:, :k]
+
+def run_backend(label, store, corpus, chunks, queries, truth, k):
+    """Index the corpus into a store and measure recall@k and per-query latency"""
+    ids = [str(i) for i in range(len(chunks))]
+    start = time.perf_counter()
+    batch = 1000
+    for offset in range(0, len(ids), batch):
+        store.add(
+            ids=ids[offset:offset + batch],
+            embeddings=corpus[offset:offset + batch].tolist(),
+            documents=chunks[offset:offset + batch],
+            metadatas=[{"chunk_index": i} for i in range(offset, min(offset + batch, len(ids)))]
+        )
+    build_time = time.perf_counter() - start
+
+    # Warm up so one-off index loading is not counted as query latency
+    store.query(query_embeddings=[queries[0].tolist()], n_results=k)
+
+    latencies, hits = [], 0
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        result = store.query(query_embeddings=[query.tolist()], n_results=k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += len(set(int(i) for i in result["ids"][0]) & set(expected.tolist()))
+
+    return {
+        "backend": label,
+        "recall": hits / (len(queries) * k),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "build_s": build_time
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--space', choices=["l2", "cosine", "ip"], default="l2")
+    parser.add_argument('--m', type=int, nargs='+', default=[16, 32])
+    parser.add_argument('--ef-search', type=int, nargs='+', default=[10, 50, 100])
+    parser.add_argument('--ef-construction', type=int, default=100)
+    args = parser.parse_args()
+
+    chunks = load_corpus()
+    if len(chunks) <= args.k:
+        raise SystemExit("Not enough chunks to benchmark; upload a few PDFs first")
+
+    corpus = embedding_model.encode(chunks, batch_size=64, convert_to_numpy=True).astype(np.float32)
+    queries = embedding_model.encode(sample_queries(chunks, args.queries), convert_to_numpy=True).astype(np.float32)
+    truth = exact_neighbours(corpus, queries, args.k, args.space)
+
+    rows = []
+    tmp_root = tempfile.mkdtemp(prefix="bench_vectors_")
+    try:
+        for m in args.m:
+            for ef_search in args.ef_search:
+                path = os.path.join(tmp_root, f"m{m}_ef{ef_search}")
+                store = create_vector_store(
+                    "chroma", path, "bench", "Benchmark collection", space=args.space,
+                    m=m, ef_construction=args.ef_construction, ef_search=ef_search
+                )
+                rows.append(run_backend(f"chroma M={m} ef_search={ef_search}", store,
+                                        corpus, chunks, queries, truth, args.k))
+
+        backends = ["numpy"] + (["faiss"] if faiss is not None else [])
+        for backend in backends:
+            store = create_vector_store(backend, tmp_root, "bench", "Benchmark collection", space=args.space)
+            rows.append(run_backend(backend, store, corpus, chunks, queries, truth, args.k))
+    finally:
+        shutil.rmtree(tmp_root, ignore_errors=True)
+
+    print(f"\n{len(chunks)} chunks, {len(queries)} queries, k={args.k}, space={args.space}\n")
+    print(f"{'backend':<32} {'recall@k':>9} {'p50 ms':>8} {'p95 ms':>8} {'build s':>8}")
+    for row in rows:
+        print(f"{row['backend']:<32} {row['recall']:>9.3f} {row['p50_ms']:>8.2f} "
+              f"{row['p95_ms']:>8.2f} {row['build_s']:>8.2f}")
+
+if __name__ == "__main__":
+    main()
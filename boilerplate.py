@@ -0,0 +1,141 @@
+import re
+import hashlib
+from collections import Counter, defaultdict
+from typing import Dict, List, Tuple
+import numpy as np
+
+# Page numbers such as "7", "Page 7", "Page 7 of 40", "- 7 -" or "7/40"
+PAGE_NUMBER_PATTERN = re.compile(r"^\W*(?:page\s*)?\d+\s*(?:(?:of|/)\s*\d+)?\W*$", re.IGNORECASE)
+WORD_PATTERN = re.compile(r"\w+")
+
+def normalize_line(line: str) -> str:
+    """Normalize a line so that headers differing only in numbers or spacing compare equal"""
+    return re.sub(r"\s+", " ", re.sub(r"\d+", "#", line.lower())).strip()
+
+def strip_repeated_lines(pages: List[str], edge_lines: int = 3,
+                         min_fraction: float = 0.5) -> Tuple[List[str], List[Dict]]:
+    """Remove running headers, footers and page numbers from page texts.
+
+    A line counts as boilerplate when, after normalization, it is among the
+    first or last `edge_lines` lines of at least `min_fraction` of the pages
+    (and of at least two pages). Such lines are removed from the page edges
+    only, so the same sentence in the body of a page is kept. A number on its
+    own only goes when it follows the page numbering of the other pages or
+    repeats verbatim, so amounts and years at a page edge are kept. Returns
+    the cleaned pages and what was removed.
+    """
+    def edge_indices(count: int) -> List[int]:
+        # Short pages only contribute their first and last line, so body text is never an edge
+        width = min(edge_lines, max(1, count // 3))
+        return sorted(set(range(width)) | set(range(max(0, count - width), count)))
+
+    def page_number(line: str):
+        return int(re.search(r"\d+", line).group()) if PAGE_NUMBER_PATTERN.match(line) else None
+
+    page_edges, numbered = [], []
+    for page_index, page in enumerate(pages):
+        lines = [line.strip() for line in page.splitlines() if line.strip()]
+        edges = [lines[i] for i in edge_indices(len(lines))]
+        page_edges.append({normalize_line(line) for line in edges})
+        # Printed page numbers differ from the page index by the same offset on every page
+        numbered.append({line for line in edges if page_number(line) is not None})
+
+    threshold = max(2, min_fraction * len(pages))
+    counts = Counter(line for edges in page_edges for line in edges)
+    repeated = {line for line, count in counts.items() if count >= threshold}
+    verbatim = Counter(line for lines in numbered for line in lines)
+    offsets = Counter(offset for page_index, lines in enumerate(numbered)
+                      for offset in {page_number(line) - page_index for line in lines})
+    offset, offset_count = offsets.most_common(1)[0] if offsets else (None, 0)
+    if offset_count < threshold:
+        offset = None
+
+    removed: Dict[str, Dict] = {}
+    cleaned = []
+    for page_index, page in enumerate(pages):
+        lines = page.splitlines()
+        content = [i for i, line in enumerate(lines) if line.strip()]
+        edges = {content[i] for i in edge_indices(len(content))}
+        kept = []
+        for i, line in enumerate(lines):
+            if i in edges:
+                normalized = normalize_line(line)
+                number = page_number(line.strip())
+                if normalized in repeated and (number is None or number - page_index == offset
+                                               or verbatim[line.strip()] >= threshold):
+                    entry = removed.setdefault(normalized, {"line": line.strip(), "pages": 0})
+                    entry["pages"] += 1
+                    continue
+            kept.append(line)
+        cleaned.append("\n".join(kept))
+
+    return cleaned, list(removed.values())
+
+# Parameters of the MinHash signatures: 32 bands of 4 rows put the LSH
+# candidate threshold near a Jaccard similarity of 0.4, below any threshold
+# worth using, and candidates are then verified exactly
+MINHASH_BANDS = 32
+MINHASH_ROWS = 4
+MERSENNE_PRIME = (1 << 31) - 1
+_rng = np.random.default_rng(20240501)
+_PERMUTATION_A = _rng.integers(1, MERSENNE_PRIME, size=MINHASH_BANDS * MINHASH_ROWS, dtype=np.uint64)
+_PERMUTATION_B = _rng.integers(0, MERSENNE_PRIME, size=MINHASH_BANDS * MINHASH_ROWS, dtype=np.uint64)
+
+def shingles(text: str) -> set:
+    """Word trigrams of a text, for similarity comparisons"""
+    words = WORD_PATTERN.findall(text.lower())
+    return {" ".join(words[i:i + 3]) for i in range(max(1, len(words) - 2))} if words else set()
+
+def minhash(shingle_set: set) -> np.ndarray:
+    """MinHash signature of a set of shingles"""
+    hashes = np.array([
+        int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=4).digest(), "big") % MERSENNE_PRIME
+        for shingle in shingle_set
+    ], dtype=np.uint64)
+    if not len(hashes):
+        return np.full(MINHASH_BANDS * MINHASH_ROWS, MERSENNE_PRIME, dtype=np.uint64)
+    # (a * x + b) mod p stays below 2**62, so uint64 arithmetic cannot overflow
+    return ((_PERMUTATION_A[:, None] * hashes[None, :] + _PERMUTATION_B[:, None]) % MERSENNE_PRIME).min(axis=1)
+
+def dedupe_texts(texts: List[str], threshold: float = 0.8) -> Tuple[List[str], List[Dict]]:
+    """Drop texts that are exact or near duplicates of an earlier text.
+
+    Candidates come from MinHash LSH over word trigrams and are confirmed by
+    their exact Jaccard similarity. Returns the kept texts and, for each
+    dropped text, its index, the index of the text it duplicates and their
+    similarity.
+    """
+    buckets: Dict[Tuple[int, bytes], List[int]] = defaultdict(list)
+    shingle_sets: Dict[int, set] = {}
+    exact: Dict[str, int] = {}
+
+    kept, dropped = [], []
+    for index, text in enumerate(texts):
+        normalized = " ".join(text.lower().split())
+        if normalized in exact:
+            dropped.append({"index": index, "duplicate_of": exact[normalized], "similarity": 1.0})
+            continue
+
+        shingle_set = shingles(text)
+        signature = minhash(shingle_set)
+        keys = [(band, signature[band * MINHASH_ROWS:(band + 1) * MINHASH_ROWS].tobytes())
+                for band in range(MINHASH_BANDS)]
+        duplicate = None
+        candidates = {other for key in keys for other in buckets.get(key, ())}
+        for other in sorted(candidates):
+            union = len(shingle_set | shingle_sets[other])
+            similarity = len(shingle_set & shingle_sets[other]) / union if union else 1.0
+            if similarity >= threshold:
+                duplicate = (other, similarity)
+                break
+        if duplicate:
+            dropped.append({"index": index, "duplicate_of": duplicate[0], "similarity": round(duplicate[1], 3)})
+            continue
+
+        exact[normalized] = index
+        shingle_sets[index] = shingle_set
+        for key in keys:
+            buckets[key].append(index)
+        kept.append(text)
+
+    return kept, dropped
@@ -0,0 +1,72 @@
+"""Check that the configured embedding backend matches the reference PyTorch model.
+
+Usage:
+    EMBEDDING_BACKEND=onnx python check_embedding_backend.py [--threshold 0.99] [--samples 200]
+
+Encodes chunks from the PDFs under data/ (or built-in sample sentences) with
+the reference model and the configured backend, reports the cosine
+similarity between the two and the encoding speedup, and exits non-zero
+when the minimum similarity falls below the threshold.
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+from utils import (
+    BASE_DIR, EMBEDDING_BACKEND, parse_pdf, chunk_text, embedding_model,
+    load_embedding_model, compare_embedding_models
+)
+
+SAMPLE_TEXTS = [
+    "The contractor must be registered to do business in the State of Texas.",
+    "Proposals shall include an executive summary and a letter of transmittal.",
+    "Experience with municipal GIS systems is preferred but not required.",
+    "Our company holds ISO 9001 and CMMI Level 3 certifications.",
+    "We have delivered over forty infrastructure projects for public agencies."
+]
+
+def load_texts(samples):
+    texts = []
+    for path in sorted(glob.glob(os.path.join(BASE_DIR, 'data', '**', '*.pdf'), recursive=True)):
+        text = parse_pdf(path)
+        if text:
+            texts.extend(chunk_text(text, chunk_size=500, overlap=50))
+        if len(texts) >= samples:
+            break
+    return texts[:samples] or SAMPLE_TEXTS
+
+def timed_encode(model, texts):
+    start = time.perf_counter()
+    model.encode(texts, batch_size=32)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--threshold', type=float, default=0.99)
+    parser.add_argument('--samples', type=int, default=200)
+    args = parser.parse_args()
+
+    if EMBEDDING_BACKEND == "torch":
+        print("EMBEDDING_BACKEND is torch; nothing to compare")
+        return 0
+
+    texts = load_texts(args.samples)
+    reference = load_embedding_model("torch")
+    similarity = compare_embedding_models(reference, embedding_model, texts)
+
+    reference_time = timed_encode(reference, texts)
+    candidate_time = timed_encode(embedding_model, texts)
+
+    print(f"{len(texts)} texts, backend={EMBEDDING_BACKEND}")
+    print(f"cosine similarity: min {similarity['min']:.4f}, mean {similarity['mean']:.4f}")
+    print(f"encode time: torch {reference_time:.2f}s, {EMBEDDING_BACKEND} {candidate_time:.2f}s "
+          f"({reference_time / candidate_time:.2f}x)")
+
+    if similarity['min'] < args.threshold:
+        print(f"FAIL: minimum similarity is below {args.threshold}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
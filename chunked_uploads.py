@@ -0,0 +1,228 @@
+import os
+import glob
+import json
+import time
+import uuid
+import fcntl
+import hashlib
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Optional
+from utils import logger, DIRS, BlobStore, CHUNKED_UPLOAD_MAX_SIZE, CHUNKED_UPLOAD_TTL
+
+class UploadError(Exception):
+    """Raised when a chunked upload request cannot be applied"""
+    def __init__(self, message: str, status_code: int = 400, state: Optional[Dict] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.state = state
+
+class ChunkedUploadManager:
+    """Resumable uploads sent as sequential chunks and streamed straight to disk.
+
+    Upload state lives in a JSON file next to the partial data, so an
+    interrupted upload can be resumed from the last acknowledged offset by
+    any worker; changes to an upload hold a file lock, so workers never
+    write the same upload at once. The running SHA-256 is kept in memory and
+    rebuilt from the partial file when a different process picks the upload
+    up. Uploads untouched for `ttl` seconds are deleted.
+    """
+    def __init__(self, uploads_dir: str = DIRS['data']['uploads'], max_size: int = CHUNKED_UPLOAD_MAX_SIZE,
+                 ttl: float = CHUNKED_UPLOAD_TTL, cleanup_interval: float = 600):
+        self.uploads_dir = uploads_dir
+        self.max_size = max_size
+        self.ttl = ttl
+        self.cleanup_interval = cleanup_interval
+        self._lock = threading.Lock()
+        self._upload_locks: Dict[str, threading.Lock] = {}
+        self._hashers: Dict[str, Dict] = {}
+        self._last_cleanup = 0.0
+        os.makedirs(self.uploads_dir, exist_ok=True)
+
+    def _state_path(self, upload_id: str) -> str:
+        return os.path.join(self.uploads_dir, f"{upload_id}.json")
+
+    def _data_path(self, upload_id: str) -> str:
+        return os.path.join(self.uploads_dir, f"{upload_id}.part")
+
+    def _lock_path(self, upload_id: str) -> str:
+        return os.path.join(self.uploads_dir, f"{upload_id}.lock")
+
+    @contextmanager
+    def _upload_lock(self, upload_id: str, blocking: bool = True):
+        """Hold an upload exclusively across threads and worker processes; yields False
+        instead of waiting when `blocking` is off and the upload is busy"""
+        with self._lock:
+            thread_lock = self._upload_locks.setdefault(upload_id, threading.Lock())
+        if not thread_lock.acquire(blocking):
+            yield False
+            return
+        try:
+            with open(self._lock_path(upload_id), 'a') as lock_file:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+                except BlockingIOError:
+                    yield False
+                    return
+                try:
+                    yield True
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+        finally:
+            thread_lock.release()
+
+    def cleanup(self, now: Optional[float] = None) -> int:
+        """Delete uploads, finished or not, whose state has not changed for `ttl` seconds"""
+        now = now or time.time()
+        removed = 0
+        for state_path in glob.glob(os.path.join(self.uploads_dir, "*.json")):
+            upload_id = os.path.basename(state_path)[:-len(".json")]
+            try:
+                if now - os.path.getmtime(state_path) < self.ttl:
+                    continue
+            except FileNotFoundError:
+                continue
+            with self._upload_lock(upload_id, blocking=False) as locked:
+                if not locked:
+                    continue  # in use right now, so not abandoned
+                for path in (self._data_path(upload_id), state_path, f"{state_path}.tmp"):
+                    if os.path.exists(path):
+                        os.remove(path)
+                self._hashers.pop(upload_id, None)
+                removed += 1
+            if os.path.exists(self._lock_path(upload_id)):
+                os.remove(self._lock_path(upload_id))
+            with self._lock:
+                self._upload_locks.pop(upload_id, None)
+        if removed:
+            logger.info(f"Removed {removed} expired chunked uploads")
+        return removed
+
+    def _save_state(self, state: Dict):
+        tmp_path = f"{self._state_path(state['upload_id'])}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, self._state_path(state['upload_id']))
+
+    def get(self, upload_id: str) -> Dict:
+        """Get the state of an upload, including the offset to resume from"""
+        # Upload ids are generated by us; anything else is rejected before touching the filesystem
+        try:
+            valid = str(uuid.UUID(upload_id)) == upload_id
+        except ValueError:
+            valid = False
+        if not valid or not os.path.exists(self._state_path(upload_id)):
+            raise UploadError("Unknown upload", 404)
+        with open(self._state_path(upload_id), 'r') as f:
+            return json.load(f)
+
+    def init(self, kind: str, filename: str, size: int, sha256: Optional[str] = None) -> Dict:
+        """Start a new upload of a file with a known total size"""
+        if size <= 0:
+            raise UploadError("Upload size must be positive")
+        if size > self.max_size:
+            raise UploadError(f"Upload exceeds the maximum size of {self.max_size} bytes", 413)
+
+        # Abandoned uploads are swept as new ones start, at most once per cleanup interval
+        if time.time() - self._last_cleanup >= self.cleanup_interval:
+            self._last_cleanup = time.time()
+            try:
+                self.cleanup()
+            except Exception as e:
+                logger.error(f"Error removing expired chunked uploads: {str(e)}")
+
+        upload_id = str(uuid.uuid4())
+        state = {
+            "upload_id": upload_id,
+            "kind": kind,
+            "filename": filename,
+            "size": size,
+            "sha256": sha256.lower() if sha256 else None,
+            "received": 0,
+            "status": "uploading",
+            "created_at": datetime.now().isoformat()
+        }
+        open(self._data_path(upload_id), 'wb').close()
+        self._save_state(state)
+        logger.info(f"Started chunked upload {upload_id} for {filename} ({size} bytes)")
+        return state
+
+    def _hasher(self, state: Dict):
+        """Get the running hash for the bytes received so far"""
+        cached = self._hashers.get(state["upload_id"])
+        if cached and cached["offset"] == state["received"]:
+            return cached["hasher"]
+
+        hasher = hashlib.sha256()
+        remaining = state["received"]
+        with open(self._data_path(state["upload_id"]), 'rb') as f:
+            while remaining:
+                block = f.read(min(1024 * 1024, remaining))
+                if not block:
+                    break
+                hasher.update(block)
+                remaining -= len(block)
+        return hasher
+
+    def put_chunk(self, upload_id: str, offset: int, stream, chunk_sha256: Optional[str] = None,
+                  block_size: int = 1024 * 1024) -> Dict:
+        """Append a chunk at the given offset, streaming it to disk while hashing it"""
+        with self._upload_lock(upload_id):
+            state = self.get(upload_id)
+            if state["status"] != "uploading":
+                raise UploadError("Upload is already complete", 409, state)
+            if offset != state["received"]:
+                # A retried chunk that was already stored, or a gap; either way the
+                # client resumes from the offset we report
+                raise UploadError(f"Expected offset {state['received']}", 409, state)
+
+            hasher = self._hasher(state).copy()
+            chunk_hasher = hashlib.sha256()
+            written = 0
+            with open(self._data_path(upload_id), 'r+b') as f:
+                f.seek(offset)
+                for block in iter(lambda: stream.read(block_size), b''):
+                    written += len(block)
+                    if offset + written > state["size"]:
+                        raise UploadError("Chunk extends past the declared upload size", 413, state)
+                    f.write(block)
+                    hasher.update(block)
+                    chunk_hasher.update(block)
+                # Drop anything left over from an earlier interrupted attempt
+                f.truncate(offset + written)
+
+            if chunk_sha256 and chunk_hasher.hexdigest() != chunk_sha256.lower():
+                raise UploadError("Chunk checksum mismatch", 422, state)
+
+            state["received"] = offset + written
+            self._hashers[upload_id] = {"hasher": hasher, "offset": state["received"]}
+            self._save_state(state)
+            return state
+
+    def complete(self, upload_id: str, blob_store: BlobStore) -> Dict:
+        """Verify a fully received upload and move it into the blob store"""
+        with self._upload_lock(upload_id):
+            state = self.get(upload_id)
+            if state["status"] == "complete":
+                return state
+            if state["received"] != state["size"]:
+                raise UploadError(f"Upload incomplete: received {state['received']} of {state['size']} bytes",
+                                  409, state)
+
+            file_hash = self._hasher(state).hexdigest()
+            if state["sha256"] and file_hash != state["sha256"]:
+                raise UploadError("File checksum mismatch", 422, state)
+
+            stored = blob_store.adopt(self._data_path(upload_id), file_hash, state["filename"])
+            if os.path.exists(self._data_path(upload_id)):
+                os.remove(self._data_path(upload_id))  # duplicate content, the blob already exists
+
+            state.update(status="complete", hash=file_hash, path=stored["path"],
+                         duplicate=stored["duplicate"], completed_at=datetime.now().isoformat())
+            self._save_state(state)
+            self._hashers.pop(upload_id, None)
+            logger.info(f"Completed chunked upload {upload_id} as {file_hash}")
+            return state
+
+chunked_upload_manager = ChunkedUploadManager()
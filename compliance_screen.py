@@ -0,0 +1,139 @@
+import re
+from typing import Dict, List, Optional, Tuple
+
+US_STATES = [
+    "Alabama", "Alaska", "Arizona", "Arkansas", "California", "Colorado", "Connecticut", "Delaware",
+    "District of Columbia", "Florida", "Georgia", "Hawaii", "Idaho", "Illinois", "Indiana", "Iowa", "Kansas",
+    "Kentucky", "Louisiana", "Maine", "Maryland", "Massachusetts", "Michigan", "Minnesota", "Mississippi",
+    "Missouri", "Montana", "Nebraska", "Nevada", "New Hampshire", "New Jersey", "New Mexico", "New York",
+    "North Carolina", "North Dakota", "Ohio", "Oklahoma", "Oregon", "Pennsylvania", "Rhode Island",
+    "South Carolina", "South Dakota", "Tennessee", "Texas", "Utah", "Vermont", "Virginia", "Washington",
+    "West Virginia", "Wisconsin", "Wyoming"
+]
+# "Washington, D.C." and similar name the District, not Washington state
+DC_PATTERN = r"Washington,?\s+(?:D\.\s?C\.?|DC|District of Columbia)"
+# Case-sensitive, so addresses and common words ("maine", "new york time") are not read as states;
+# all-caps headings still match. Longest names first so "West Virginia" is not read as "Virginia"
+STATE_PATTERN = re.compile(
+    r"\b(" + DC_PATTERN + "|" + "|".join(
+        re.escape(name) for state in sorted(US_STATES, key=len, reverse=True) for name in (state, state.upper())
+    ) + r")(?!\w)"
+)
+CANONICAL_STATES = {state.upper(): state for state in US_STATES}
+
+def canonical_state(match: str) -> str:
+    """Spelling of a matched state as in US_STATES"""
+    if re.fullmatch(DC_PATTERN, match, re.IGNORECASE):
+        return "District of Columbia"
+    return CANONICAL_STATES[match.upper()]
+
+REGISTRATION_PATTERN = re.compile(
+    r"\b(registered|registration|register|licensed|license|incorporated|incorporation|organized under|"
+    r"formed under|authori[sz]ed to (?:do|transact) business|qualified to do business|good standing|"
+    r"secretary of state|domiciled|foreign (?:corporation|entity))\b",
+    re.IGNORECASE
+)
+REQUIREMENT_PATTERN = re.compile(r"\b(must|shall|required|requires|requirement|mandatory|only)\b", re.IGNORECASE)
+US_PATTERN = re.compile(r"\b(united states|u\.s\.|usa|us-based|domestic)", re.IGNORECASE)
+# Abbreviations such as "D.C." and "U.S." do not end a sentence
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?;])(?<!D\.C\.)(?<!U\.S\.)\s+|\n+")
+VERDICT_PATTERN = re.compile(r"ELIGIBLE:\s*(YES|NO|UNKNOWN)", re.IGNORECASE)
+REASON_PATTERN = re.compile(r"REASON:\s*(.+)", re.IGNORECASE)
+
+VERDICTS = {"YES": "ELIGIBLE", "NO": "NOT ELIGIBLE", "UNKNOWN": "UNKNOWN"}
+
+def extract_registration(texts: List[str], requirements: bool = False, max_evidence: int = 6) -> Dict:
+    """Pull registration statements out of document chunks.
+
+    With `requirements` only sentences that also state an obligation count,
+    which keeps an RFP's own address or background out of the requirements.
+    Returns the states and whether US registration is mentioned, with the
+    sentences they came from (those naming a state first).
+    """
+    states, evidence, seen = set(), [], set()
+    us = False
+    for text in texts:
+        for sentence in SENTENCE_PATTERN.split(text or ""):
+            sentence = " ".join(sentence.split())
+            key = sentence.lower()
+            if not sentence or key in seen or not REGISTRATION_PATTERN.search(sentence):
+                continue
+            if requirements and not REQUIREMENT_PATTERN.search(sentence):
+                continue
+            seen.add(key)
+            found = {canonical_state(match) for match in STATE_PATTERN.findall(sentence)}
+            states |= found
+            us = us or bool(US_PATTERN.search(sentence))
+            evidence.append((not found, sentence[:300]))
+    evidence.sort(key=lambda item: item[0])
+    return {
+        "states": sorted(states),
+        "us_registration": us,
+        "evidence": [sentence for _, sentence in evidence[:max_evidence]]
+    }
+
+def rule_verdict(requirements: Dict, company: Dict) -> Tuple[str, str]:
+    """Verdict from the extracted facts alone"""
+    if not requirements["evidence"]:
+        return "ELIGIBLE", "The RFP states no registration requirement"
+    if not company["evidence"]:
+        return "UNKNOWN", "No registration details found in the company documents"
+    missing = [state for state in requirements["states"] if state not in company["states"]]
+    if missing:
+        return "NOT ELIGIBLE", f"No registration found in {', '.join(missing)}"
+    if requirements["states"]:
+        return "ELIGIBLE", f"Registered in {', '.join(requirements['states'])}"
+    return "ELIGIBLE", "The company states it is registered to do business"
+
+def build_screen_prompt(requirements: Dict, company: Dict) -> str:
+    """Short prompt asking only for the core registration verdict"""
+    rfp_lines = "\n".join(f"- {sentence}" for sentence in requirements["evidence"])
+    company_lines = "\n".join(f"- {sentence}" for sentence in company["evidence"]) or "- (none found)"
+    return f"""ELIGIBILITY SCREEN. Decide only whether the company meets the RFP's legal registration requirements (US and state registration). Ignore submission documents and preferred qualifications.
+
+RFP registration requirements:
+{rfp_lines}
+
+Company registration facts:
+{company_lines}
+
+Reply with exactly two lines:
+ELIGIBLE: YES, NO or UNKNOWN
+REASON: one short sentence"""
+
+def prepare_screen(rfp_texts: List[str], company_texts: List[str]) -> Dict:
+    """Extract the registration facts and the rule-based verdict; `prompt` is None when
+    the RFP has no registration requirement and no LLM call is needed"""
+    requirements = extract_registration(rfp_texts, requirements=True)
+    company = extract_registration(company_texts)
+    verdict, reason = rule_verdict(requirements, company)
+    return {
+        "requirements": requirements,
+        "company": company,
+        "rule_verdict": verdict,
+        "rule_reason": reason,
+        "prompt": build_screen_prompt(requirements, company) if requirements["evidence"] else None
+    }
+
+def finish_screen(prepared: Dict, response: Optional[str] = None) -> Dict:
+    """Combine the extracted facts with the LLM's verdict, falling back to the rules
+    when there was no call or its reply cannot be parsed"""
+    verdict, reason, method = prepared["rule_verdict"], prepared["rule_reason"], "rules"
+    if response and not response.startswith("Error:"):
+        match = VERDICT_PATTERN.search(response)
+        if match:
+            verdict, method = VERDICTS[match.group(1).upper()], "llm"
+            reason_match = REASON_PATTERN.search(response)
+            reason = reason_match.group(1).strip() if reason_match else reason
+    elif response:
+        method = "rules (LLM unavailable)"
+    return {
+        "verdict": verdict,
+        "reason": reason,
+        "method": method,
+        "us_registration_required": prepared["requirements"]["us_registration"],
+        "required_states": prepared["requirements"]["states"],
+        "company_states": prepared["company"]["states"],
+        "rfp_evidence": prepared["requirements"]["evidence"],
+        "company_evidence": prepared["company"]["evidence"]
+    }
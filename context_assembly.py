@@ -0,0 +1,112 @@
+from typing import Callable, Dict, List, Optional
+import numpy as np
+from utils import logger, CONTEXT_TOKENIZER, CONTEXT_SECTION_TOKENS, MMR_LAMBDA
+
+def load_token_counter(tokenizer_name: Optional[str] = CONTEXT_TOKENIZER) -> Callable[[str], int]:
+    """Get a token counting function for the prompt budget.
+
+    Uses the Hugging Face tokenizer named by CONTEXT_TOKENIZER when set (e.g. a
+    Llama 3 tokenizer), otherwise tiktoken's cl100k_base, which is close to
+    Llama 3's BPE. Falls back to ~4 characters per token if neither loads.
+    """
+    if tokenizer_name:
+        try:
+            from transformers import AutoTokenizer
+            tokenizer = AutoTokenizer.from_pretrained(tokenizer_name)
+            return lambda text: len(tokenizer.encode(text, add_special_tokens=False))
+        except Exception as e:
+            logger.error(f"Error loading tokenizer {tokenizer_name}: {str(e)}")
+
+    try:
+        import tiktoken
+        encoding = tiktoken.get_encoding("cl100k_base")
+        return lambda text: len(encoding.encode(text, disallowed_special=()))
+    except Exception as e:
+        logger.error(f"Error loading tiktoken encoding, estimating tokens from length: {str(e)}")
+        return lambda text: max(1, len(text) // 4)
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+class ContextAssembler:
+    """Build the prompt context from retrieved chunks.
+
+    Chunks are deduplicated across sections (earlier sections win), ordered
+    by maximal marginal relevance so near-identical chunks do not crowd out
+    others, and packed into a per-section token budget.
+    """
+    def __init__(self, count_tokens: Optional[Callable[[str], int]] = None,
+                 section_tokens: int = CONTEXT_SECTION_TOKENS, mmr_lambda: float = MMR_LAMBDA,
+                 budgets: Optional[Dict[str, int]] = None):
+        self._count_tokens = count_tokens
+        self.section_tokens = section_tokens
+        self.mmr_lambda = mmr_lambda
+        self.budgets = budgets or {}
+
+    def count_tokens(self, text: str) -> int:
+        # The tokenizer is loaded on first use so importing this module stays cheap
+        if self._count_tokens is None:
+            self._count_tokens = load_token_counter()
+        return self._count_tokens(text)
+
+    def _mmr_order(self, query_embedding, embeddings, distances: List[float]) -> List[int]:
+        """Order candidates by maximal marginal relevance to the query"""
+        if embeddings is None or query_embedding is None or len(embeddings) == 0 \
+                or any(embedding is None for embedding in embeddings):
+            # Without vectors, keep the retrieval order (ascending distance)
+            return sorted(range(len(distances)), key=lambda i: distances[i])
+
+        vectors = _normalize(np.vstack(embeddings))
+        relevance = vectors @ _normalize(query_embedding)[0]
+        similarity = vectors @ vectors.T
+
+        selected: List[int] = []
+        remaining = list(range(len(vectors)))
+        while remaining:
+            if selected:
+                redundancy = similarity[np.ix_(remaining, selected)].max(axis=1)
+            else:
+                redundancy = np.zeros(len(remaining), dtype=np.float32)
+            scores = self.mmr_lambda * relevance[remaining] - (1 - self.mmr_lambda) * redundancy
+            best = remaining[int(np.argmax(scores))]
+            selected.append(best)
+            remaining.remove(best)
+        return selected
+
+    def assemble(self, sections: Dict[str, Dict]) -> Dict[str, str]:
+        """Turn per-section retrieval results into budgeted prompt text.
+
+        Each section maps to {"query_embedding", "ids", "documents",
+        "embeddings", "distances"}; sections are processed in insertion order.
+        """
+        seen_ids = set()
+        seen_texts = set()
+        context = {}
+        for name, section in sections.items():
+            budget = self.budgets.get(name, self.section_tokens)
+            ids = section.get("ids") or []
+            documents = section.get("documents") or []
+            distances = section.get("distances") or [0.0] * len(documents)
+
+            order = self._mmr_order(section.get("query_embedding"), section.get("embeddings"), distances)
+            parts, used, dropped = [], 0, 0
+            for i in order:
+                text = documents[i].strip()
+                if ids[i] in seen_ids or text in seen_texts:
+                    continue
+                tokens = self.count_tokens(text)
+                if used + tokens > budget:
+                    dropped += 1
+                    continue
+                parts.append(text)
+                used += tokens
+                seen_ids.add(ids[i])
+                seen_texts.add(text)
+
+            if dropped:
+                logger.info(f"Context section {name}: {len(parts)} chunks, {used} tokens, {dropped} over budget")
+            context[name] = "\n\n---\n\n".join(parts) if parts else "No relevant information found."
+        return context
+
+context_assembler = ContextAssembler()
@@ -0,0 +1,120 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    kind TEXT NOT NULL,
+    doc_hash TEXT NOT NULL,
+    source TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    chunk_count INTEGER NOT NULL,
+    page_count INTEGER,
+    ingested_at TEXT NOT NULL,
+    embedding_model TEXT,
+    PRIMARY KEY (kind, doc_hash)
+);
+CREATE INDEX IF NOT EXISTS documents_by_kind_and_time ON documents (kind, ingested_at);
+CREATE TABLE IF NOT EXISTS totals (
+    kind TEXT PRIMARY KEY,
+    documents INTEGER NOT NULL DEFAULT 0,
+    chunks INTEGER NOT NULL DEFAULT 0
+);
+CREATE TRIGGER IF NOT EXISTS documents_insert AFTER INSERT ON documents BEGIN
+    INSERT OR IGNORE INTO totals (kind) VALUES (NEW.kind);
+    UPDATE totals SET documents = documents + 1, chunks = chunks + NEW.chunk_count WHERE kind = NEW.kind;
+END;
+CREATE TRIGGER IF NOT EXISTS documents_delete AFTER DELETE ON documents BEGIN
+    UPDATE totals SET documents = documents - 1, chunks = chunks - OLD.chunk_count WHERE kind = OLD.kind;
+END;
+"""
+
+class DocumentCatalog:
+    """SQLite catalog of ingested documents with running totals.
+
+    One row per (kind, content hash) is written at ingestion time and the
+    totals table is kept up to date by triggers, so stats are a single-row
+    lookup and listings are paged off an index instead of scanning the
+    vector store.
+    """
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        with self._connection() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        # SQLite connections must not be shared between threads, nor used by a
+        # forked worker that inherited its parent's thread-local connection
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def record(self, kind: str, doc_hash: str, source: str, chunk_count: int,
+               page_count: Optional[int] = None, embedding_model: Optional[str] = None,
+               filename: Optional[str] = None) -> bool:
+        """Add an ingested document; returns False if it was already catalogued.
+
+        `source` is where the content is stored and `filename` the name it was
+        uploaded under, which defaults to the basename of `source`.
+        """
+        with self._connection() as conn:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO documents VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (kind, doc_hash, source, filename or os.path.basename(source), chunk_count, page_count,
+                 datetime.now().isoformat(), embedding_model)
+            )
+            return cursor.rowcount == 1
+
+    def has(self, kind: str, doc_hash: str) -> bool:
+        row = self._connection().execute(
+            "SELECT 1 FROM documents WHERE kind = ? AND doc_hash = ?", (kind, doc_hash)
+        ).fetchone()
+        return row is not None
+
+    def get(self, kind: str, doc_hash: str) -> Optional[Dict]:
+        row = self._connection().execute(
+            "SELECT * FROM documents WHERE kind = ? AND doc_hash = ?", (kind, doc_hash)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def stats(self, kind: Optional[str] = None) -> Dict[str, int]:
+        """Get document and chunk totals, for one kind or all of them"""
+        if kind:
+            rows = self._connection().execute(
+                "SELECT documents, chunks FROM totals WHERE kind = ?", (kind,)
+            ).fetchall()
+        else:
+            rows = self._connection().execute("SELECT documents, chunks FROM totals").fetchall()
+        return {
+            "documents": sum(row["documents"] for row in rows),
+            "chunks": sum(row["chunks"] for row in rows)
+        }
+
+    def list(self, kind: Optional[str] = None, limit: int = 50, offset: int = 0) -> List[Dict]:
+        """List documents, newest first"""
+        if kind:
+            rows = self._connection().execute(
+                "SELECT * FROM documents WHERE kind = ? ORDER BY ingested_at DESC LIMIT ? OFFSET ?",
+                (kind, limit, offset)
+            ).fetchall()
+        else:
+            rows = self._connection().execute(
+                "SELECT * FROM documents ORDER BY ingested_at DESC LIMIT ? OFFSET ?", (limit, offset)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def reset(self, kind: Optional[str] = None):
+        with self._connection() as conn:
+            if kind:
+                conn.execute("DELETE FROM documents WHERE kind = ?", (kind,))
+            else:
+                conn.execute("DELETE FROM documents")
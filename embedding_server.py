@@ -0,0 +1,183 @@
+"""Shared embedding server that holds one copy of the model for all web workers.
+
+Usage:
+    EMBEDDING_SERVER=unix:/tmp/consultbid-embeddings.sock python embedding_server.py
+
+Workers started with the same EMBEDDING_SERVER setting send their texts here
+instead of loading the model themselves. Concurrent requests are coalesced
+into micro-batches of up to EMBEDDING_BATCH_SIZE texts, waiting at most
+EMBEDDING_BATCH_WAIT_MS for a batch to fill.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing.connection import Listener, Client
+from typing import List, Optional, Tuple, Union
+import numpy as np
+
+def parse_address(address: str) -> Tuple[Union[str, Tuple[str, int]], str]:
+    """Turn "unix:/path.sock" or "host:port" into a multiprocessing address and family"""
+    if address.startswith("unix:"):
+        return address[len("unix:"):], "AF_UNIX"
+    host, port = address.rsplit(":", 1)
+    return (host, int(port)), "AF_INET"
+
+def check_authkey(family: str, authkey: Optional[bytes]):
+    """Refuse TCP connections without a shared secret.
+
+    Messages are pickled, so anyone able to connect could run code in the
+    server. A Unix socket is protected by its file permissions instead.
+    """
+    if family == "AF_INET" and not authkey:
+        raise ValueError("EMBEDDING_SERVER_AUTHKEY must be set when EMBEDDING_SERVER is a host:port address")
+
+class EmbeddingClient:
+    """Drop-in replacement for the SentenceTransformer `encode` call backed by the embedding server"""
+    def __init__(self, address: str, authkey: Optional[bytes]):
+        self.address, self.family = parse_address(address)
+        check_authkey(self.family, authkey)
+        self.authkey = authkey
+        # Connections are not thread-safe, so each thread keeps its own
+        self._local = threading.local()
+
+    def _connection(self):
+        if getattr(self._local, "conn", None) is None:
+            self._local.conn = Client(self.address, family=self.family, authkey=self.authkey)
+        return self._local.conn
+
+    def _request(self, op: str, payload=None):
+        for attempt in range(2):
+            try:
+                conn = self._connection()
+                conn.send((op, payload))
+                status, result = conn.recv()
+                break
+            except (EOFError, OSError):
+                # The server restarted or the connection dropped; reconnect once
+                self._local.conn = None
+                if attempt:
+                    raise
+        if status != "ok":
+            raise RuntimeError(f"Embedding server error: {result}")
+        return result
+
+    def encode(self, sentences: Union[str, List[str]], normalize_embeddings: bool = False, **kwargs) -> np.ndarray:
+        single = isinstance(sentences, str)
+        embeddings = self._request("encode", [sentences] if single else list(sentences))
+        if normalize_embeddings:
+            embeddings = embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+        return embeddings[0] if single else embeddings
+
+    def info(self) -> dict:
+        return self._request("info")
+
+class MicroBatcher:
+    """Coalesce concurrent encode requests into batches for a single model"""
+    def __init__(self, model, max_batch_size: int = 64, max_wait: float = 0.005):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queue: "queue.Queue[Tuple[List[str], Future]]" = queue.Queue()
+        threading.Thread(target=self._loop, name="embedding-batcher", daemon=True).start()
+
+    def submit(self, texts: List[str]) -> Future:
+        future = Future()
+        self._queue.put((texts, future))
+        return future
+
+    def _collect(self) -> List[Tuple[List[str], Future]]:
+        batch = [self._queue.get()]
+        size = len(batch[0][0])
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(item)
+            size += len(item[0])
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            texts = [text for item_texts, _ in batch for text in item_texts]
+            try:
+                embeddings = np.asarray(self.model.encode(texts, batch_size=self.max_batch_size), dtype=np.float32)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            offset = 0
+            for item_texts, future in batch:
+                future.set_result(embeddings[offset:offset + len(item_texts)])
+                offset += len(item_texts)
+
+def serve(address: str, authkey: Optional[bytes], model, max_batch_size: int, max_wait: float, logger):
+    """Accept worker connections and answer their encode requests until interrupted"""
+    listen_address, family = parse_address(address)
+    check_authkey(family, authkey)
+    if family == "AF_UNIX" and os.path.exists(listen_address):
+        os.remove(listen_address)  # stale socket from a previous run
+
+    batcher = MicroBatcher(model, max_batch_size=max_batch_size, max_wait=max_wait)
+    info = {"dimension": model.get_sentence_embedding_dimension()}
+
+    def handle(conn):
+        with conn:
+            while True:
+                try:
+                    op, payload = conn.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    if op == "encode":
+                        conn.send(("ok", batcher.submit(payload).result()))
+                    elif op == "info":
+                        conn.send(("ok", info))
+                    else:
+                        conn.send(("error", f"Unknown operation: {op}"))
+                except Exception as e:
+                    logger.error(f"Error handling embedding request: {str(e)}")
+                    conn.send(("error", str(e)))
+
+    with Listener(listen_address, family=family, authkey=authkey) as listener:
+        if family == "AF_UNIX":
+            # Only the user running the server (and the workers) may connect
+            os.chmod(listen_address, 0o600)
+        logger.info(f"Embedding server listening on {address}")
+        while True:
+            try:
+                conn = listener.accept()
+            except Exception as e:
+                # Failed handshakes (e.g. a wrong authkey) must not stop the server
+                logger.error(f"Rejected embedding client: {str(e)}")
+                continue
+            threading.Thread(target=handle, args=(conn,), daemon=True).start()
+
+def main():
+    # Imported here so workers can import EmbeddingClient without loading utils
+    from utils import (
+        logger, load_embedding_model, EMBEDDING_SERVER, EMBEDDING_SERVER_AUTHKEY,
+        EMBEDDING_BATCH_SIZE, EMBEDDING_BATCH_WAIT_MS
+    )
+    if not EMBEDDING_SERVER:
+        raise SystemExit("Set EMBEDDING_SERVER (e.g. unix:/tmp/consultbid-embeddings.sock or localhost:8765)")
+
+    try:
+        check_authkey(parse_address(EMBEDDING_SERVER)[1], EMBEDDING_SERVER_AUTHKEY)
+    except ValueError as e:
+        raise SystemExit(str(e))
+
+    model = load_embedding_model()
+    serve(EMBEDDING_SERVER, EMBEDDING_SERVER_AUTHKEY, model,
+          EMBEDDING_BATCH_SIZE, EMBEDDING_BATCH_WAIT_MS / 1000.0, logger)
+
+if __name__ == "__main__":
+    main()
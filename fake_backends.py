@@ -0,0 +1,117 @@
+"""Deterministic stand-ins for the LLM and the embedding model.
+
+Used with LLM_BACKEND=fake and EMBEDDING_BACKEND=fake to run the app fully
+offline, e.g. under loadtest.py. Responses depend only on the prompt, and
+latency is simulated as a fixed time to first token plus a token rate.
+"""
+import re
+import time
+import asyncio
+import hashlib
+from typing import Any, List, Optional, Union
+import numpy as np
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+WORD_PATTERN = re.compile(r"\w+")
+
+EVALUATION_TEMPLATE = """Core Compliance Status:
+- Eligible: {status}
+- Jurisdiction: the company states it is registered to do business in the required state.
+
+Required Submission Documents:
+- Executive summary and letter of transmittal
+- Signed proposal forms
+
+Additional Desired Qualifications:
+- Relevant past performance on similar contracts
+
+Overall Compliance Assessment:
+{assessment}
+
+Required Actions:
+- Confirm registration documents before submission
+"""
+
+class FakeChatModel(BaseChatModel):
+    """Chat model that answers from templates after a simulated generation delay"""
+    model_name: str = "fake-chat"
+    latency_ms: float = 200.0
+    tokens_per_second: float = 0.0
+    response_tokens: int = 300
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _respond(self, messages: List[BaseMessage]) -> str:
+        prompt = "\n".join(str(message.content) for message in messages)
+        digest = int(hashlib.sha256(prompt.encode("utf-8")).hexdigest(), 16)
+
+        if prompt.startswith("ELIGIBILITY SCREEN"):
+            # Short answers are not padded, like a real model stopping well before max_tokens
+            return f"ELIGIBLE: {'YES' if digest % 2 == 0 else 'NO'}\nREASON: Based on the registration facts provided."
+        if "Core Compliance Status:" in prompt:
+            compliant = digest % 2 == 0
+            text = EVALUATION_TEMPLATE.format(
+                status="Yes" if compliant else "No",
+                assessment="ELIGIBLE - the company meets the core requirements." if compliant
+                else "NOT ELIGIBLE - core registration requirements are not met."
+            )
+        elif "Answer 1:" in prompt:
+            count = len(re.findall(r"^Answer \d+:", prompt, re.MULTILINE))
+            text = "\n".join(f"Answer {i}: According to the provided context, item {i} is addressed in "
+                             f"section {(digest >> i) % 9 + 1}." for i in range(1, count + 1))
+        else:
+            text = "Based on the provided context, the requested information is available."
+
+        # Pad to the configured response length so token-rate latency is realistic
+        filler = " ".join(["details"] * max(0, self.response_tokens - len(WORD_PATTERN.findall(text))))
+        return f"{text}\n{filler}".rstrip()
+
+    def _delay(self, text: str) -> float:
+        delay = self.latency_ms / 1000.0
+        if self.tokens_per_second > 0:
+            delay += len(WORD_PATTERN.findall(text)) / self.tokens_per_second
+        return delay
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        text = self._respond(messages)
+        time.sleep(self._delay(text))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        text = self._respond(messages)
+        await asyncio.sleep(self._delay(text))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+class FakeEmbeddingModel:
+    """Hashed bag-of-words embeddings with the SentenceTransformer `encode` interface.
+
+    Texts sharing words get similar vectors, so retrieval still behaves
+    plausibly, at a tiny fraction of the cost of a real model.
+    """
+    def __init__(self, dimension: int = 384):
+        self.dimension = dimension
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimension
+
+    def _embed(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for word in WORD_PATTERN.findall(text.lower()):
+            value = int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "big")
+            vector[value % self.dimension] += 1.0 if value >> 63 else -1.0
+        return vector
+
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32,
+               normalize_embeddings: bool = False, **kwargs) -> np.ndarray:
+        single = isinstance(sentences, str)
+        embeddings = np.vstack([self._embed(text) for text in ([sentences] if single else sentences)]) \
+            if (single or len(sentences)) else np.zeros((0, self.dimension), dtype=np.float32)
+        if normalize_embeddings:
+            embeddings /= np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+        return embeddings[0] if single else embeddings
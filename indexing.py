@@ -0,0 +1,121 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+from utils import logger, file_sha256, document_catalog, INDEXING_WORKERS
+
+class IndexingManager:
+    """Run document ingestion on a background worker pool and track its status"""
+    def __init__(self, max_workers: int = INDEXING_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="indexer")
+        self._lock = threading.Lock()
+        self._jobs: Dict[Tuple[str, str], Dict] = {}
+        self._agents = {}
+        self._agents_lock = threading.Lock()
+
+    def _process(self, kind: str, file_path: str, doc_hash: str, filename: Optional[str] = None) -> Dict:
+        """Run the ingestion step of the agent responsible for this document kind"""
+        # Agents are imported lazily so that importing this module stays cheap, and created
+        # under a lock so jobs starting together on the pool share one agent per kind
+        with self._agents_lock:
+            if kind not in self._agents:
+                if kind == "rfp":
+                    from agents.rfp_extractor_agent import RFPAgent
+                    self._agents[kind] = RFPAgent()
+                elif kind == "company":
+                    from agents.company_data_agent import CompanyDataAgent
+                    self._agents[kind] = CompanyDataAgent()
+                else:
+                    raise ValueError(f"Unknown document kind: {kind}")
+            agent = self._agents[kind]
+        if kind == "rfp":
+            return agent.process_rfp(file_path, doc_hash, filename)
+        return agent.process_company_data(file_path, doc_hash, filename)
+
+    def _run(self, job: Dict) -> Dict:
+        job["status"] = "indexing"
+        job["started_at"] = datetime.now().isoformat()
+        logger.info(f"Background indexing started for {job['kind']} document: {job['file']}")
+        try:
+            result = self._process(job["kind"], job["file"], job["doc_hash"], job["filename"])
+        except Exception as e:
+            result = {"status": "error", "file": job["file"], "error": str(e)}
+
+        job["result"] = result
+        job["status"] = "ready" if result.get("status") == "success" else "error"
+        job["finished_at"] = datetime.now().isoformat()
+        if job["status"] == "ready":
+            logger.info(f"Background indexing finished for {job['kind']} document: {job['file']}")
+        else:
+            logger.error(f"Background indexing failed for {job['file']}: {result.get('error')}")
+        return result
+
+    def submit(self, kind: str, file_path: str, doc_hash: Optional[str] = None,
+               filename: Optional[str] = None) -> Dict:
+        """Queue a document for ingestion unless the same content is already queued or indexed.
+
+        `file_path` is the stored blob and `filename` the name it was uploaded under.
+        """
+        doc_hash = doc_hash or file_sha256(file_path)
+        key = (kind, doc_hash)
+
+        with self._lock:
+            job = self._jobs.get(key)
+            if job and job["status"] != "error":
+                return job
+
+            job = {
+                "kind": kind,
+                "file": file_path,
+                "filename": filename,
+                "doc_hash": doc_hash,
+                "status": "queued",
+                "submitted_at": datetime.now().isoformat(),
+                "started_at": None,
+                "finished_at": None,
+                "result": None
+            }
+            job["future"] = self._executor.submit(self._run, job)
+            self._jobs[key] = job
+            return job
+
+    def ensure_indexed(self, kind: str, file_path: str, doc_hash: Optional[str] = None,
+                       timeout: Optional[float] = None, filename: Optional[str] = None) -> Dict:
+        """Return the ingestion result for a document, waiting for an in-flight job if needed"""
+        job = self.submit(kind, file_path, doc_hash, filename)
+        future: Future = job["future"]
+        return future.result(timeout=timeout)
+
+    def status(self, kind: str, doc_hash: str) -> Dict:
+        """Get the indexing status of a document by content hash"""
+        with self._lock:
+            job = self._jobs.get((kind, doc_hash))
+
+        if job is None:
+            # Jobs are tracked per process; another worker may already have indexed the document
+            entry = document_catalog.get(kind, doc_hash)
+            if entry is None:
+                return {"status": "not_indexed", "doc_hash": doc_hash}
+            return {
+                "status": "ready",
+                "doc_hash": doc_hash,
+                "submitted_at": None,
+                "started_at": None,
+                "finished_at": entry["ingested_at"],
+                "chunks_processed": entry["chunk_count"]
+            }
+
+        status = {
+            "status": job["status"],
+            "doc_hash": doc_hash,
+            "submitted_at": job["submitted_at"],
+            "started_at": job["started_at"],
+            "finished_at": job["finished_at"]
+        }
+        if job["status"] == "ready":
+            status["chunks_processed"] = job["result"].get("chunks_processed")
+        elif job["status"] == "error":
+            status["error"] = job["result"].get("error")
+        return status
+
+indexing_manager = IndexingManager()
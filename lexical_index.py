@@ -0,0 +1,268 @@
+import os
+import re
+import glob
+import gzip
+import json
+import math
+import logging
+import threading
+from collections import Counter, OrderedDict
+from typing import List, Optional, Dict
+from vector_store import VectorStore, matches_where, pinned_values
+
+logger = logging.getLogger(__name__)
+
+# Identifiers such as "W-9", "SF-1449" or "LIC-2023/0042" are kept whole, and are
+# also indexed by their parts and with the separators removed ("w9")
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-/.][a-z0-9]+)*")
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have in is it its of on or that the this to was were will with
+""".split())
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase BM25 terms"""
+    terms = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        parts = re.split(r"[-/.]", token)
+        if len(parts) > 1:
+            terms.append(token)
+            terms.append("".join(parts))
+            terms.extend(part for part in parts if part not in STOPWORDS)
+        elif token not in STOPWORDS:
+            terms.append(token)
+    return terms
+
+class DocumentPostings:
+    """BM25 postings of one document's chunks, with the document's own term statistics.
+
+    Chunk texts are not kept: they are read from the vector store when a
+    lexical match is returned.
+    """
+    def __init__(self, ids: List[str], metadatas: List[Dict], term_freqs: List[Dict[str, int]]):
+        self.ids = ids
+        self.metadatas = metadatas
+        self.lengths = [sum(freqs.values()) for freqs in term_freqs]
+        self.avg_length = (sum(self.lengths) / len(self.lengths) if self.lengths else 0.0) or 1.0
+        self.postings: Dict[str, Dict[int, int]] = {}
+        for position, freqs in enumerate(term_freqs):
+            for term, tf in freqs.items():
+                self.postings.setdefault(term, {})[position] = tf
+
+    def score(self, terms: set, k1: float, b: float) -> Dict[int, float]:
+        """BM25 scores of the chunks containing any of `terms`, by chunk position"""
+        total = len(self.ids)
+        scores: Dict[int, float] = {}
+        for term in terms:
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for position, tf in postings.items():
+                norm = k1 * (1 - b + b * self.lengths[position] / self.avg_length)
+                scores[position] = scores.get(position, 0.0) + idf * tf * (k1 + 1) / (tf + norm)
+        return scores
+
+class BM25Index:
+    """Okapi BM25 inverted index over chunks, persisted one file per document.
+
+    Postings are kept per document, so a lookup filtered to a document (as
+    every retrieval is, by `doc_hash`) scores only that document's chunks,
+    whatever the size of the corpus. Each document's term frequencies are
+    written to `<doc_hash>.json.gz` at ingestion and loaded on first use
+    into an LRU of at most `max_documents` documents. Term statistics are
+    per document, which is what ranking chunks within a document needs.
+    """
+    def __init__(self, directory: str, k1: float = 1.5, b: float = 0.75, max_documents: int = 256):
+        self.directory = directory
+        self.k1 = k1
+        self.b = b
+        self.max_documents = max_documents
+        self._lock = threading.Lock()
+        self._documents: "OrderedDict[str, DocumentPostings]" = OrderedDict()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, doc_hash: str) -> str:
+        return os.path.join(self.directory, f"{doc_hash}.json.gz")
+
+    def _doc_hashes(self) -> List[str]:
+        return sorted(os.path.basename(path)[:-len(".json.gz")]
+                      for path in glob.glob(os.path.join(self.directory, "*.json.gz")))
+
+    def _cache(self, doc_hash: str, postings: DocumentPostings):
+        with self._lock:
+            self._documents[doc_hash] = postings
+            self._documents.move_to_end(doc_hash)
+            while len(self._documents) > self.max_documents:
+                self._documents.popitem(last=False)
+
+    def _load(self, doc_hash: str) -> Optional[DocumentPostings]:
+        """Postings of a document, read from disk on first use"""
+        with self._lock:
+            if doc_hash in self._documents:
+                self._documents.move_to_end(doc_hash)
+                return self._documents[doc_hash]
+        path = self._path(doc_hash)
+        if not os.path.exists(path):
+            return None
+        try:
+            # Files written before postings were split per document also hold the chunk texts, which are ignored
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                data = json.load(f)
+            postings = DocumentPostings(data["ids"], data["metadatas"], data["term_freqs"])
+        except Exception as e:
+            logger.error(f"Error loading lexical index {path}: {str(e)}")
+            return None
+        self._cache(doc_hash, postings)
+        return postings
+
+    def has(self, doc_hash: str) -> bool:
+        with self._lock:
+            if doc_hash in self._documents:
+                return True
+        return os.path.exists(self._path(doc_hash))
+
+    def add(self, doc_hash: str, ids: List[str], documents: List[str], metadatas: List[Dict]):
+        """Index the chunks of one document and persist its postings"""
+        term_freqs = [dict(Counter(tokenize(document))) for document in documents]
+        tmp_path = self._path(doc_hash) + ".tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump({"ids": ids, "metadatas": metadatas, "term_freqs": term_freqs}, f)
+        os.replace(tmp_path, self._path(doc_hash))
+        self._cache(doc_hash, DocumentPostings(ids, metadatas, term_freqs))
+
+    def add_from_store(self, doc_hash: str, store: VectorStore):
+        """Build the postings of a document that was indexed before lexical indexing existed"""
+        data = store.get(where={"doc_hash": doc_hash}, include=["documents", "metadatas"])
+        if data["ids"]:
+            chunks = sorted(zip(data["ids"], data["documents"], data["metadatas"]),
+                            key=lambda chunk: chunk[2].get("chunk_index", 0))
+            ids, documents, metadatas = (list(column) for column in zip(*chunks))
+            self.add(doc_hash, ids, documents, metadatas)
+            logger.info(f"Built lexical index for {doc_hash} from {len(ids)} stored chunks")
+
+    def search(self, query: str, n_results: int = 10, where: Optional[Dict] = None) -> List[tuple]:
+        """Get (id, metadata, score) tuples for the best matching chunks, best first.
+
+        Only the documents `where` pins by doc_hash are scored; an unpinned
+        filter falls back to scoring every document on disk.
+        """
+        terms = set(tokenize(query))
+        doc_hashes = pinned_values(where, "doc_hash")
+        matches = []
+        for doc_hash in sorted(doc_hashes) if doc_hashes is not None else self._doc_hashes():
+            postings = self._load(doc_hash)
+            if postings is None:
+                continue
+            for position, score in postings.score(terms, self.k1, self.b).items():
+                if matches_where(postings.metadatas[position], where):
+                    matches.append((postings.ids[position], postings.metadatas[position], score))
+        matches.sort(key=lambda match: -match[2])
+        return matches[:n_results]
+
+    def query(self, query_texts: List[str], n_results: int = 10, where: Optional[Dict] = None,
+              include: Optional[List[str]] = None) -> Dict:
+        """Search with ChromaDB-style results; distances are negated BM25 scores.
+
+        Chunk texts are not stored here, so `documents` is always None.
+        """
+        include = include or ["metadatas", "distances"]
+        results = {"ids": [], "documents": None, "metadatas": [], "distances": []}
+        for query in query_texts:
+            matches = self.search(query, n_results, where)
+            results["ids"].append([match[0] for match in matches])
+            results["metadatas"].append([match[1] for match in matches])
+            results["distances"].append([-match[2] for match in matches])
+        for key in ("metadatas", "distances"):
+            if key not in include:
+                results[key] = None
+        return results
+
+    def count(self) -> int:
+        return sum(len(postings.ids) for postings in map(self._load, self._doc_hashes()) if postings)
+
+    def reset(self):
+        with self._lock:
+            for path in glob.glob(os.path.join(self.directory, "*.json.gz")):
+                os.remove(path)
+            self._documents.clear()
+
+class HybridRetriever:
+    """Fuse BM25 and vector search results with weighted reciprocal rank fusion.
+
+    `lexical_weight` of 0 is pure vector search and 1 is pure BM25, in which
+    case no query embeddings are needed. Results use the ChromaDB layout;
+    distances are 1 minus the fused score relative to a chunk ranked first by
+    both retrievers, so lower is better.
+    """
+    def __init__(self, vector_index: VectorStore, lexical_index: BM25Index,
+                 lexical_weight: float = 0.5, rrf_k: int = 60, candidate_factor: int = 2):
+        self.vector_index = vector_index
+        self.lexical_index = lexical_index
+        self.lexical_weight = min(max(lexical_weight, 0.0), 1.0)
+        self.rrf_k = rrf_k
+        self.candidate_factor = candidate_factor
+
+    @property
+    def uses_vectors(self) -> bool:
+        return self.lexical_weight < 1.0
+
+    def query(self, query_texts: List[str], query_embeddings: Optional[List] = None, n_results: int = 10,
+              where: Optional[Dict] = None, include: Optional[List[str]] = None) -> Dict:
+        include = include or ["documents", "metadatas", "distances"]
+        candidates = n_results * self.candidate_factor
+        vector_include = sorted(set(include) | {"documents", "metadatas"})
+
+        vector_results = None
+        if self.uses_vectors and query_embeddings is not None:
+            vector_results = self.vector_index.query(
+                query_embeddings=query_embeddings, n_results=candidates, where=where, include=vector_include
+            )
+        lexical_results = None
+        if self.lexical_weight > 0:
+            lexical_results = self.lexical_index.query(
+                query_texts, n_results=candidates, where=where, include=["metadatas"]
+            )
+
+        best = 1.0 / (self.rrf_k + 1)
+        results = {"ids": [], "documents": [], "metadatas": [], "distances": [], "embeddings": []}
+        for q in range(len(query_texts)):
+            fused: Dict[str, float] = {}
+            chunks: Dict[str, Dict] = {}
+            for weight, source in ((1.0 - self.lexical_weight, vector_results),
+                                   (self.lexical_weight, lexical_results)):
+                if source is None:
+                    continue
+                for rank, id_ in enumerate(source["ids"][q]):
+                    fused[id_] = fused.get(id_, 0.0) + weight / (self.rrf_k + rank + 1)
+                    chunk = chunks.setdefault(id_, {})
+                    if source.get("documents") is not None:
+                        chunk.setdefault("document", source["documents"][q][rank])
+                    chunk.setdefault("metadata", source["metadatas"][q][rank])
+                    if source.get("embeddings") is not None and "embedding" not in chunk:
+                        chunk["embedding"] = source["embeddings"][q][rank]
+
+            top = sorted(fused, key=lambda id_: -fused[id_])[:n_results]
+            # Chunks found only by BM25 have their text, and vector if asked for, read from the vector store
+            want_embeddings = "embeddings" in include
+            missing = [id_ for id_ in top
+                       if "document" not in chunks[id_] or (want_embeddings and "embedding" not in chunks[id_])]
+            if missing:
+                stored = self.vector_index.get(
+                    ids=missing, include=["documents"] + (["embeddings"] if want_embeddings else [])
+                )
+                for position, id_ in enumerate(stored["ids"]):
+                    chunks[id_].setdefault("document", stored["documents"][position])
+                    if want_embeddings:
+                        chunks[id_].setdefault("embedding", stored["embeddings"][position])
+            if want_embeddings:
+                results["embeddings"].append([chunks[id_].get("embedding") for id_ in top])
+
+            results["ids"].append(top)
+            results["documents"].append([chunks[id_].get("document", "") for id_ in top])
+            results["metadatas"].append([chunks[id_]["metadata"] for id_ in top])
+            results["distances"].append([1.0 - fused[id_] / best for id_ in top])
+
+        for key in ("documents", "metadatas", "distances", "embeddings"):
+            if key not in include:
+                results[key] = None
+        return results
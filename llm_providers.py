@@ -0,0 +1,147 @@
+"""LLM providers and per-task routing.
+
+Every LLM call names a route ("evaluation", "screen", "qa", "analysis").
+A route picks a provider - the main model or an optional small local one -
+and its sampling settings, so cheap calls can go to a local
+OpenAI-compatible server (llama.cpp, vLLM, Ollama) while the full report
+uses the large model. Routes whose outputs are memoized run at temperature
+0 so a cached answer is the one the model would give again.
+"""
+import logging
+from typing import Any, Dict, List, Optional
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from pydantic import PrivateAttr
+
+logger = logging.getLogger(__name__)
+
+PROVIDERS = ("groq", "openai", "fake")
+
+class OpenAICompatibleChatModel(BaseChatModel):
+    """Chat model for any server implementing the OpenAI chat completions API"""
+    model_name: str
+    base_url: str
+    api_key: str = "not-needed"
+    temperature: float = 0.7
+    max_tokens: int = 2048
+    timeout: float = 60.0
+    _client: Any = PrivateAttr(default=None)
+    _async_client: Any = PrivateAttr(default=None)
+
+    @property
+    def _llm_type(self) -> str:
+        return "openai-compatible"
+
+    def _request(self, messages: List[BaseMessage], stop: Optional[List[str]], kwargs: Dict) -> Dict:
+        roles = {HumanMessage: "user", SystemMessage: "system", AIMessage: "assistant"}
+        return {
+            "model": self.model_name,
+            "messages": [{"role": roles.get(type(message), "user"), "content": str(message.content)}
+                         for message in messages],
+            "temperature": kwargs.get("temperature", self.temperature),
+            "max_tokens": kwargs.get("max_tokens", self.max_tokens),
+            "stop": stop
+        }
+
+    def _result(self, completion) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(
+            content=completion.choices[0].message.content or ""
+        ))])
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        if self._client is None:
+            from openai import OpenAI
+            self._client = OpenAI(base_url=self.base_url, api_key=self.api_key, timeout=self.timeout)
+        return self._result(self._client.chat.completions.create(**self._request(messages, stop, kwargs)))
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        if self._async_client is None:
+            from openai import AsyncOpenAI
+            self._async_client = AsyncOpenAI(base_url=self.base_url, api_key=self.api_key, timeout=self.timeout)
+        return self._result(await self._async_client.chat.completions.create(**self._request(messages, stop, kwargs)))
+
+def create_chat_model(provider: str, model: str, temperature: float = 0.7, max_tokens: int = 2048,
+                      api_key: Optional[str] = None, base_url: Optional[str] = None,
+                      fake_settings: Optional[Dict] = None) -> BaseChatModel:
+    """Create a chat model for a provider ("groq", "openai" for any OpenAI-compatible server, or "fake")"""
+    if provider == "groq":
+        from langchain_groq import ChatGroq
+        return ChatGroq(groq_api_key=api_key, model_name=model, temperature=temperature, max_tokens=max_tokens)
+    if provider == "openai":
+        if not base_url:
+            raise ValueError("The openai provider needs a base URL")
+        return OpenAICompatibleChatModel(model_name=model, base_url=base_url, api_key=api_key or "not-needed",
+                                         temperature=temperature, max_tokens=max_tokens)
+    if provider == "fake":
+        from fake_backends import FakeChatModel
+        return FakeChatModel(model_name=model or "fake-chat", **(fake_settings or {}))
+    raise ValueError(f"Unknown LLM provider: {provider}")
+
+class LLMRouter:
+    """Map task routes to chat models and their sampling settings.
+
+    `routes` maps a route name to a provider name ("main" or "local"),
+    `settings` a route name to bind arguments such as temperature. Calls
+    to a local model that fail are retried once on the main model.
+    """
+    def __init__(self, providers: Dict[str, BaseChatModel], routes: Dict[str, str],
+                 settings: Dict[str, Dict], descriptions: Dict[str, str]):
+        unknown = {provider for provider in routes.values() if provider not in providers}
+        if unknown:
+            raise ValueError(f"LLM routes use unconfigured providers: {', '.join(sorted(unknown))}")
+        self.providers = providers
+        self.routes = routes
+        self.settings = settings
+        self.descriptions = descriptions
+
+    def provider(self, route: str) -> str:
+        return self.routes.get(route, "main")
+
+    def _bind(self, provider: str, route: str, overrides: Dict) -> BaseChatModel:
+        bind = {**self.settings.get(route, {}), **{key: value for key, value in overrides.items() if value is not None}}
+        model = self.providers[provider]
+        return model.bind(**bind) if bind else model
+
+    def model(self, route: str, **overrides) -> BaseChatModel:
+        """The chat model for a route, bound to the route's settings and any overrides"""
+        return self._bind(self.provider(route), route, overrides)
+
+    def deterministic(self, route: str) -> bool:
+        """Whether a route samples at temperature 0, so its outputs may be memoized"""
+        return self.settings.get(route, {}).get("temperature") == 0
+
+    def signature(self, route: str) -> str:
+        """Identify the model and settings behind a route, for cache keys"""
+        settings = ",".join(f"{key}={value}" for key, value in sorted(self.settings.get(route, {}).items()))
+        return f"{self.descriptions[self.provider(route)]}[{settings}]"
+
+    def invoke(self, route: str, messages: List[BaseMessage], **overrides):
+        try:
+            return self.model(route, **overrides).invoke(messages)
+        except Exception as e:
+            if self.provider(route) == "main":
+                raise
+            logger.warning(f"Local LLM failed for {route} ({str(e)}), falling back to the main model")
+            return self._bind("main", route, overrides).invoke(messages)
+
+    async def ainvoke(self, route: str, messages: List[BaseMessage], **overrides):
+        try:
+            return await self.model(route, **overrides).ainvoke(messages)
+        except Exception as e:
+            if self.provider(route) == "main":
+                raise
+            logger.warning(f"Local LLM failed for {route} ({str(e)}), falling back to the main model")
+            return await self._bind("main", route, overrides).ainvoke(messages)
+
+def parse_routes(value: str) -> Dict[str, str]:
+    """Parse "screen=local,qa=local" into a route to provider mapping"""
+    routes = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        route, _, provider = item.partition("=")
+        if not provider:
+            raise ValueError(f"Invalid LLM route: {item!r} (expected route=provider)")
+        routes[route.strip()] = provider.strip()
+    return routes
@@ -0,0 +1,397 @@
+"""Offline load test for the HTTP API.
+
+Usage:
+    python loadtest.py --steps 1,2,4,8 --step-duration 30
+
+Starts the app with the fake LLM and embedding backends (LLM_BACKEND=fake,
+EMBEDDING_BACKEND=fake) so no network or model download is needed, uploads
+a pool of synthetic RFP and company PDFs, then drives a weighted mix of
+uploads, evaluations and questions at each concurrency step. For every
+step it reports throughput and p50/p95/p99 latency per endpoint, plus the
+peak RSS of the server process tree.
+
+The server runs from a temporary copy of the code, so its uploads and
+indexes never mix with the real data and embeddings directories.
+
+Pass --url to test an already running server instead (its backends are then
+whatever it was started with), and --embedding-model to use a small real
+model in place of the fake embeddings. --max-p95-ms and --max-error-rate
+make the run exit non-zero when exceeded, so it can gate a release.
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+import subprocess
+from collections import defaultdict
+from typing import Dict, List, Optional
+import requests
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+RFP_SENTENCES = [
+    "The vendor must be registered to do business in the State of {state}.",
+    "Proposals shall include a signed Form W-9 and a letter of transmittal.",
+    "The contractor is required to maintain general liability insurance of ${amount} per occurrence.",
+    "Bidders must hold a valid {state} contractor license at the time of submission.",
+    "Experience with municipal records systems is preferred.",
+    "Offerors should describe their approach to data migration and training.",
+    "An executive summary not exceeding {pages} pages is mandatory.",
+    "Certification as a minority-owned business is desirable but optional.",
+    "All responses must be delivered by {time} local time on the closing date.",
+    "The selected firm shall provide monthly progress reports to the project manager.",
+]
+COMPANY_SENTENCES = [
+    "The company is incorporated in the State of {state} and registered with the Secretary of State.",
+    "Our team of {count} engineers has delivered over {projects} public sector projects.",
+    "We hold ISO 9001 and SOC 2 Type II certifications.",
+    "Past clients include the City of Springfield and {state} Department of Transportation.",
+    "Our headquarters and data center are located in {state}.",
+    "We maintain general liability insurance of ${amount} per occurrence.",
+]
+STATES = ["Texas", "Ohio", "Oregon", "Georgia", "Virginia", "Colorado", "Arizona", "Nevada"]
+QUESTIONS = [
+    "Which state registration is required?",
+    "What insurance coverage is required?",
+    "What forms must be submitted with the proposal?",
+    "What is the submission deadline?",
+    "Are there preferred qualifications?",
+]
+
+def make_pdf(path: str, kind: str, index: int, pages: int, rng: random.Random):
+    """Write a synthetic multi-page RFP or company PDF with running headers and footers"""
+    sentences = RFP_SENTENCES if kind == "rfp" else COMPANY_SENTENCES
+    pdf = canvas.Canvas(path, pagesize=letter)
+    width, height = letter
+    for page in range(1, pages + 1):
+        pdf.setFont("Helvetica", 9)
+        pdf.drawString(72, height - 40, f"{'Request for Proposals' if kind == 'rfp' else 'Company Profile'} No. {index}")
+        pdf.drawString(72, 30, f"Page {page} of {pages}")
+        text = pdf.beginText(72, height - 80)
+        text.setFont("Helvetica", 11)
+        for _ in range(40):
+            text.textLine(rng.choice(sentences).format(
+                state=rng.choice(STATES), amount=f"{rng.randint(1, 5)},000,000", pages=rng.randint(2, 10),
+                time=f"{rng.randint(1, 4)}:00 PM", count=rng.randint(10, 500), projects=rng.randint(5, 200)
+            ))
+        pdf.drawText(text)
+        pdf.showPage()
+    pdf.save()
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100.0 * (len(ordered) - 1))))]
+
+def process_tree_rss(pid: int) -> int:
+    """Resident memory in bytes of a process and all of its descendants (Linux /proc)"""
+    children = defaultdict(list)
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    # The command name may contain spaces, so split after its closing parenthesis
+                    ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+                children[ppid].append(int(entry))
+            except (OSError, IndexError, ValueError):
+                continue
+
+    total, pending = 0, [pid]
+    while pending:
+        current = pending.pop()
+        pending.extend(children.get(current, []))
+        try:
+            with open(f"/proc/{current}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) * 1024
+        except OSError:
+            continue
+    return total
+
+class RssMonitor:
+    """Track the peak RSS of the server process tree while a step runs"""
+    def __init__(self, pid: Optional[int], interval: float = 0.5):
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        if self.pid and os.path.isdir("/proc"):
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, process_tree_rss(self.pid))
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self.peak = max(self.peak, process_tree_rss(self.pid))
+
+class LoadTest:
+    """Drive a weighted mix of API calls against one server"""
+    def __init__(self, base_url: str, documents: Dict[str, List[str]], mix: Dict[str, float],
+                 unique_uploads: float, seed: int, timeout: float):
+        self.base_url = base_url.rstrip("/")
+        self.documents = documents
+        self.mix = mix
+        self.unique_uploads = unique_uploads
+        self.seed = seed
+        self.timeout = timeout
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    def _upload(self, session: requests.Session, kind: str, path: str, unique: bool) -> requests.Response:
+        route, field = ("rfp", "rfp_file") if kind == "rfp" else ("company-data", "company_file")
+        with open(path, "rb") as f:
+            content = f.read()
+        filename = os.path.basename(path)
+        if unique:
+            # Bytes after %%EOF are ignored by PDF readers but change the content hash,
+            # so the server has to parse and embed the document again
+            with self._lock:
+                self._counter += 1
+                nonce = f"{os.getpid()}-{self._counter}-{time.time_ns()}"
+            content += f"\n% loadtest {nonce}\n".encode()
+            filename = f"{filename[:-4]}_{nonce}.pdf"
+        return session.post(f"{self.base_url}/upload/{route}", files={field: (filename, content, "application/pdf")},
+                            timeout=self.timeout)
+
+    def setup(self, wait_timeout: float = 600):
+        """Upload the document pool once and wait until it is indexed"""
+        session = requests.Session()
+        for kind, paths in self.documents.items():
+            route = "rfp" if kind == "rfp" else "company-data"
+            for path in paths:
+                response = self._upload(session, kind, path, unique=False)
+                response.raise_for_status()
+            for path in paths:
+                deadline = time.time() + wait_timeout
+                while True:
+                    status = session.get(f"{self.base_url}/upload/{route}/status/{os.path.basename(path)}",
+                                         timeout=self.timeout).json()
+                    if status.get("status") in ("ready", "error") or time.time() > deadline:
+                        break
+                    time.sleep(0.5)
+                if status.get("status") != "ready":
+                    raise RuntimeError(f"Indexing did not finish for {path}: {status}")
+
+    def _call(self, session: requests.Session, action: str, rng: random.Random) -> requests.Response:
+        if action in ("upload_rfp", "upload_company"):
+            kind = "rfp" if action == "upload_rfp" else "company"
+            return self._upload(session, kind, rng.choice(self.documents[kind]),
+                                unique=rng.random() < self.unique_uploads)
+        if action in ("evaluate", "screen"):
+            return session.post(f"{self.base_url}/evaluate", json={
+                "rfp_file": os.path.basename(rng.choice(self.documents["rfp"])),
+                "company_file": os.path.basename(rng.choice(self.documents["company"])),
+                "mode": "screen" if action == "screen" else "full"
+            }, timeout=self.timeout)
+        if action == "ask":
+            return session.post(f"{self.base_url}/ask/rfp", json={
+                "file": os.path.basename(rng.choice(self.documents["rfp"])),
+                "questions": rng.sample(QUESTIONS, rng.randint(1, len(QUESTIONS)))
+            }, timeout=self.timeout)
+        raise ValueError(f"Unknown action: {action}")
+
+    def run_step(self, concurrency: int, duration: float) -> Dict[str, Dict]:
+        """Run `concurrency` virtual users for `duration` seconds and collect latencies"""
+        latencies = defaultdict(list)
+        errors = defaultdict(int)
+        rejected = defaultdict(int)
+        actions, weights = zip(*self.mix.items())
+        deadline = time.perf_counter() + duration
+
+        def user(number: int):
+            rng = random.Random(self.seed * 1000 + concurrency * 100 + number)
+            session = requests.Session()
+            while time.perf_counter() < deadline:
+                action = rng.choices(actions, weights)[0]
+                started = time.perf_counter()
+                try:
+                    status = self._call(session, action, rng).status_code
+                except requests.RequestException:
+                    status = None
+                elapsed = time.perf_counter() - started
+                with self._lock:
+                    latencies[action].append(elapsed)
+                    # Admission control rejections (429) are counted apart from failures
+                    if status == 429:
+                        rejected[action] += 1
+                    elif status is None or status >= 400:
+                        errors[action] += 1
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=user, args=(i,), daemon=True) for i in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - started
+
+        return {action: {
+            "requests": len(values),
+            "errors": errors[action],
+            "rejected": rejected[action],
+            "throughput_rps": round(len(values) / wall, 2),
+            "p50_ms": round(percentile(values, 50) * 1000, 1),
+            "p95_ms": round(percentile(values, 95) * 1000, 1),
+            "p99_ms": round(percentile(values, 99) * 1000, 1)
+        } for action, values in latencies.items()}
+
+def copy_app(destination: str) -> str:
+    """Copy the application code, without its data, so the test never touches real indexes"""
+    shutil.copytree(BASE_DIR, destination, ignore=shutil.ignore_patterns(
+        "data", "embeddings", "logs", ".git", "__pycache__", "*.pyc", ".env"
+    ))
+    return destination
+
+def start_server(args, root: str) -> subprocess.Popen:
+    """Start the app with offline backends in its own process group"""
+    env = dict(os.environ)
+    env.setdefault("LLM_BACKEND", "fake")
+    # All virtual users share one address, so per-client rate limits would throttle the test itself
+    env.setdefault("CLIENT_RATE_PER_MINUTE", "0")
+    env["FAKE_LLM_LATENCY_MS"] = str(args.llm_latency_ms)
+    env["FAKE_LLM_TOKENS_PER_SECOND"] = str(args.llm_tokens_per_second)
+    if args.embedding_model:
+        env["EMBEDDING_MODEL"] = args.embedding_model
+        env.setdefault("EMBEDDING_BACKEND", "torch")
+    else:
+        env.setdefault("EMBEDDING_BACKEND", "fake")
+    env["PORT"] = str(args.port)
+    env["WEB_CONCURRENCY"] = str(args.workers)
+    env["WEB_THREADS"] = str(args.threads)
+
+    if args.server == "serve":
+        command = [sys.executable, "serve.py"]
+    else:
+        # The Flask development server, threaded and without the reloader
+        command = [sys.executable, "-m", "flask", "--app", "app", "run", "--port", str(args.port),
+                   "--with-threads", "--no-reload", "--no-debugger"]
+    os.makedirs(os.path.join(root, "logs"), exist_ok=True)
+    log = open(os.path.join(root, "logs", "loadtest_server.log"), "w")
+    return subprocess.Popen(command, cwd=root, env=env, stdout=log, stderr=subprocess.STDOUT,
+                            start_new_session=True)
+
+def wait_ready(base_url: str, timeout: float):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(f"{base_url}/readyz", timeout=2).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"Server at {base_url} did not become ready within {timeout}s")
+
+def print_report(results: List[Dict]):
+    print(f"\n{'conc':>5} {'endpoint':<16} {'reqs':>6} {'err':>5} {'429':>5} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for step in results:
+        for action, stats in sorted(step["endpoints"].items()):
+            print(f"{step['concurrency']:>5} {action:<16} {stats['requests']:>6} {stats['errors']:>5} {stats['rejected']:>5} "
+                  f"{stats['throughput_rps']:>8} {stats['p50_ms']:>9} {stats['p95_ms']:>9} {stats['p99_ms']:>9}")
+        if step["peak_rss_mb"]:
+            print(f"{step['concurrency']:>5} {'server RSS':<16} peak {step['peak_rss_mb']} MB")
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test for the RFP analysis API")
+    parser.add_argument("--url", help="Test a running server instead of starting one")
+    parser.add_argument("--server", choices=["serve", "flask"], default="serve",
+                        help="serve.py (gunicorn, preloaded) or the threaded Flask server")
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--workers", type=int, default=2, help="WEB_CONCURRENCY for serve.py")
+    parser.add_argument("--threads", type=int, default=4, help="WEB_THREADS for serve.py")
+    parser.add_argument("--steps", default="1,2,4,8", help="Comma-separated concurrency levels")
+    parser.add_argument("--step-duration", type=float, default=30, help="Seconds per concurrency level")
+    parser.add_argument("--mix", default="evaluate=6,upload_rfp=1,upload_company=1,ask=2",
+                        help="Weighted actions: evaluate, screen, upload_rfp, upload_company, ask")
+    parser.add_argument("--unique-uploads", type=float, default=0.5,
+                        help="Fraction of uploads with new content that must be indexed again")
+    parser.add_argument("--documents", type=int, default=3, help="Synthetic PDFs per kind")
+    parser.add_argument("--pages", type=int, default=10, help="Pages per synthetic PDF")
+    parser.add_argument("--llm-latency-ms", type=float, default=800)
+    parser.add_argument("--llm-tokens-per-second", type=float, default=250)
+    parser.add_argument("--embedding-model", help="Small sentence-transformers model instead of fake embeddings")
+    parser.add_argument("--timeout", type=float, default=300, help="Per-request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", help="Also write the results to this file")
+    parser.add_argument("--max-p95-ms", type=float, help="Fail if any endpoint's p95 exceeds this")
+    parser.add_argument("--max-error-rate", type=float, help="Fail if any endpoint's error rate exceeds this")
+    args = parser.parse_args()
+
+    mix = {}
+    for item in args.mix.split(","):
+        action, weight = item.split("=")
+        mix[action.strip()] = float(weight)
+
+    rng = random.Random(args.seed)
+    workdir = tempfile.mkdtemp(prefix="loadtest_")
+    documents = {"rfp": [], "company": []}
+    for kind in documents:
+        for i in range(args.documents):
+            path = os.path.join(workdir, f"loadtest_{kind}_{args.seed}_{i}.pdf")
+            make_pdf(path, kind, i, args.pages, rng)
+            documents[kind].append(path)
+
+    server = None
+    base_url = args.url or f"http://127.0.0.1:{args.port}"
+    try:
+        if not args.url:
+            root = copy_app(os.path.join(workdir, "app"))
+            print(f"Starting the server in {root} (log: {os.path.join(root, 'logs', 'loadtest_server.log')})")
+            server = start_server(args, root)
+        wait_ready(base_url, timeout=300)
+
+        test = LoadTest(base_url, documents, mix, args.unique_uploads, args.seed, args.timeout)
+        print("Uploading and indexing the document pool...")
+        test.setup()
+
+        results = []
+        for concurrency in [int(step) for step in args.steps.split(",")]:
+            print(f"Running {concurrency} concurrent users for {args.step_duration:.0f}s...")
+            with RssMonitor(server.pid if server else None) as rss:
+                endpoints = test.run_step(concurrency, args.step_duration)
+            results.append({
+                "concurrency": concurrency,
+                "endpoints": endpoints,
+                "peak_rss_mb": round(rss.peak / (1024 * 1024), 1)
+            })
+        print_report(results)
+
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump({"settings": vars(args), "results": results}, f, indent=2)
+
+        failures = []
+        for step in results:
+            for action, stats in step["endpoints"].items():
+                if args.max_p95_ms is not None and stats["p95_ms"] > args.max_p95_ms:
+                    failures.append(f"{action} p95 {stats['p95_ms']} ms at concurrency {step['concurrency']}")
+                error_rate = stats["errors"] / stats["requests"] if stats["requests"] else 0.0
+                if args.max_error_rate is not None and error_rate > args.max_error_rate:
+                    failures.append(f"{action} error rate {error_rate:.1%} at concurrency {step['concurrency']}")
+        if failures:
+            print("\nLoad test thresholds exceeded:\n  " + "\n  ".join(failures))
+            sys.exit(1)
+    finally:
+        if server:
+            os.killpg(server.pid, 15)
+            server.wait(timeout=30)
+
+if __name__ == "__main__":
+    main()
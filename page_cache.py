@@ -0,0 +1,87 @@
+import os
+import zlib
+import sqlite3
+import threading
+from typing import Dict, List, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    doc_hash TEXT NOT NULL,
+    extractor TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    text BLOB NOT NULL,
+    PRIMARY KEY (doc_hash, extractor, page)
+);
+CREATE TABLE IF NOT EXISTS page_counts (
+    doc_hash TEXT NOT NULL,
+    extractor TEXT NOT NULL,
+    page_count INTEGER NOT NULL,
+    PRIMARY KEY (doc_hash, extractor)
+);
+"""
+
+class PageTextCache:
+    """Persistent cache of extracted PDF page text, zlib-compressed in SQLite.
+
+    Entries are keyed by file content hash, page number and extractor version,
+    so they survive changes to chunking or the embedding model and are only
+    invalidated when the extraction itself changes.
+    """
+    def __init__(self, db_path: str, extractor: str):
+        self.db_path = db_path
+        self.extractor = extractor
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        with self._connection() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread, and a fresh one in forked workers
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get_pages(self, doc_hash: str) -> Dict[int, str]:
+        """Get whatever pages of a document are cached, by page number"""
+        rows = self._connection().execute(
+            "SELECT page, text FROM pages WHERE doc_hash = ? AND extractor = ?", (doc_hash, self.extractor)
+        ).fetchall()
+        return {page: zlib.decompress(text).decode("utf-8") for page, text in rows}
+
+    def get_page_count(self, doc_hash: str) -> Optional[int]:
+        row = self._connection().execute(
+            "SELECT page_count FROM page_counts WHERE doc_hash = ? AND extractor = ?", (doc_hash, self.extractor)
+        ).fetchone()
+        return row[0] if row else None
+
+    def get(self, doc_hash: str) -> Optional[List[str]]:
+        """Get all page texts of a document, or None unless every page is cached"""
+        page_count = self.get_page_count(doc_hash)
+        if page_count is None:
+            return None
+        pages = self.get_pages(doc_hash)
+        if len(pages) < page_count:
+            return None
+        return [pages[page] for page in range(page_count)]
+
+    def put_page(self, doc_hash: str, page: int, text: str):
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?)",
+                (doc_hash, self.extractor, page, zlib.compress(text.encode("utf-8")))
+            )
+
+    def set_page_count(self, doc_hash: str, page_count: int):
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO page_counts VALUES (?, ?, ?)", (doc_hash, self.extractor, page_count)
+            )
+
+    def clear(self):
+        with self._connection() as conn:
+            conn.execute("DELETE FROM pages")
+            conn.execute("DELETE FROM page_counts")
@@ -0,0 +1,148 @@
+import os
+import re
+import sys
+import json
+import time
+import hmac
+import random
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from utils import logger, DIRS, ADMIN_TOKEN, PROFILE_SAMPLE_RATE, PROFILE_INTERVAL_MS
+
+PROFILE_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+class SamplingProfiler:
+    """Low-overhead sampling profiler for one request.
+
+    A background thread snapshots the Python stacks of the request thread and
+    of worker pool threads (e.g. background indexing) every `interval`
+    seconds. Nothing is instrumented, so the profiled code runs at full speed
+    apart from the sampler's own share of the GIL.
+    """
+    def __init__(self, interval: float = PROFILE_INTERVAL_MS / 1000.0,
+                 thread_prefixes: Tuple[str, ...] = ("indexer", "qa", "async-exec", "task", "shard")):
+        self.interval = interval
+        self.thread_prefixes = thread_prefixes
+        self._target = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._frames: Dict[Tuple[str, str, int], int] = {}
+        self._samples: Dict[str, List[Tuple[List[int], float]]] = {}
+        self.started_at = None
+        self.duration = 0.0
+
+    def _frame_index(self, code) -> int:
+        key = (getattr(code, "co_qualname", code.co_name), code.co_filename, code.co_firstlineno)
+        if key not in self._frames:
+            self._frames[key] = len(self._frames)
+        return self._frames[key]
+
+    def _sample(self, elapsed: float):
+        frames = sys._current_frames()
+        for thread in threading.enumerate():
+            if thread.ident != self._target and not thread.name.startswith(self.thread_prefixes):
+                continue
+            frame = frames.get(thread.ident)
+            stack = []
+            while frame is not None:
+                stack.append(self._frame_index(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                stack.reverse()
+                self._samples.setdefault(thread.name, []).append((stack, elapsed))
+
+    def _run(self):
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            self._sample(now - last)
+            last = now
+
+    def start(self):
+        """Start sampling the calling thread"""
+        self._target = threading.get_ident()
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self.duration = time.perf_counter() - self.started_at
+
+    def speedscope(self, name: str) -> Dict:
+        """Export the samples in speedscope's file format, one profile per thread"""
+        frames = [{"name": qualname, "file": filename, "line": line}
+                  for (qualname, filename, line), _ in sorted(self._frames.items(), key=lambda item: item[1])]
+        profiles = []
+        for thread_name, samples in self._samples.items():
+            profiles.append({
+                "type": "sampled",
+                "name": thread_name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": sum(weight for _, weight in samples),
+                "samples": [stack for stack, _ in samples],
+                "weights": [weight for _, weight in samples]
+            })
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "consultbid-profiler",
+            "activeProfileIndex": 0,
+            "shared": {"frames": frames},
+            "profiles": profiles
+        }
+
+class ProfileStore:
+    """Speedscope profiles on disk, keyed by evaluation id"""
+    def __init__(self, directory: str = DIRS['data']['profiles']):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, profile_id: str) -> Optional[str]:
+        if not PROFILE_ID_PATTERN.match(profile_id):
+            return None
+        return os.path.join(self.directory, f"{profile_id}.speedscope.json")
+
+    def save(self, profile_id: str, profile: Dict, duration: float) -> str:
+        profile["duration_seconds"] = round(duration, 3)
+        profile["created_at"] = datetime.now().isoformat()
+        with open(self.path(profile_id), 'w') as f:
+            json.dump(profile, f)
+        logger.info(f"Saved request profile {profile_id} ({duration:.2f}s)")
+        return profile_id
+
+    def list(self, limit: int = 50) -> List[Dict]:
+        """List stored profiles, newest first"""
+        entries = []
+        for filename in os.listdir(self.directory):
+            if filename.endswith(".speedscope.json"):
+                stat = os.stat(os.path.join(self.directory, filename))
+                entries.append({
+                    "profile_id": filename[:-len(".speedscope.json")],
+                    "size": stat.st_size,
+                    "created_at": datetime.fromtimestamp(stat.st_mtime).isoformat()
+                })
+        entries.sort(key=lambda entry: entry["created_at"], reverse=True)
+        return entries[:limit]
+
+profile_store = ProfileStore()
+
+def is_admin(headers) -> bool:
+    """Check a request's admin token; admin features are disabled without ADMIN_TOKEN"""
+    if not ADMIN_TOKEN:
+        return False
+    token = headers.get("X-Admin-Token") or ""
+    authorization = headers.get("Authorization") or ""
+    if authorization.startswith("Bearer "):
+        token = token or authorization[len("Bearer "):]
+    return hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode())
+
+def profiling_requested(headers) -> bool:
+    """Profile when an admin asks for it with an X-Profile header, or for a random sample of requests"""
+    if headers.get("X-Profile") and is_admin(headers):
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
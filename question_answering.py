@@ -0,0 +1,240 @@
+import os
+import re
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from utils import (
+    logger, generate_embeddings, get_llm_response, BASE_DIR,
+    QA_TOP_K, QA_BATCH_SIZE, QA_CONTEXT_TOKENS, QA_SESSION_TTL, QA_MAX_SESSIONS
+)
+from context_assembly import context_assembler
+
+# Follow-up questions see this many earlier turns and previously retrieved chunks
+SESSION_TURNS = 10
+SESSION_CHUNKS = 20
+
+SESSION_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    doc_hash TEXT NOT NULL,
+    turns TEXT NOT NULL,
+    chunks TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_by_time ON sessions (updated_at);
+"""
+
+ANSWER_PATTERN = re.compile(r"^\s*\**Answer\s+(\d+)\s*:\**", re.MULTILINE | re.IGNORECASE)
+
+class QASessionStore:
+    """Question-answering sessions bound to one document, expired after a TTL.
+
+    Sessions are kept in SQLite next to the document catalog, so a
+    follow-up question can be answered by any worker process.
+    """
+    def __init__(self, db_path: str = os.path.join(BASE_DIR, 'data', 'qa_sessions.db'),
+                 ttl: int = QA_SESSION_TTL, max_sessions: int = QA_MAX_SESSIONS):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        with self._connection() as conn:
+            conn.executescript(SESSION_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread, reopened in forked workers
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _expire(self, conn: sqlite3.Connection):
+        conn.execute("DELETE FROM sessions WHERE updated_at < ?", (time.time() - self.ttl,))
+        conn.execute(
+            "DELETE FROM sessions WHERE session_id IN "
+            "(SELECT session_id FROM sessions ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_sessions,)
+        )
+
+    @staticmethod
+    def _session(row: sqlite3.Row) -> Dict:
+        return {
+            "session_id": row["session_id"],
+            "kind": row["kind"],
+            "doc_hash": row["doc_hash"],
+            "turns": json.loads(row["turns"]),
+            "chunks": OrderedDict(json.loads(row["chunks"])),
+            "updated_at": row["updated_at"]
+        }
+
+    def create(self, kind: str, doc_hash: str) -> Dict:
+        session = {
+            "session_id": str(uuid.uuid4()),
+            "kind": kind,
+            "doc_hash": doc_hash,
+            "turns": [],
+            "chunks": OrderedDict(),
+            "updated_at": time.time()
+        }
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT INTO sessions VALUES (?, ?, ?, '[]', '[]', ?)",
+                (session["session_id"], kind, doc_hash, session["updated_at"])
+            )
+            self._expire(conn)
+        return session
+
+    def get(self, session_id: str) -> Optional[Dict]:
+        with self._connection() as conn:
+            self._expire(conn)
+            conn.execute("UPDATE sessions SET updated_at = ? WHERE session_id = ?", (time.time(), session_id))
+            row = conn.execute("SELECT * FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return self._session(row) if row else None
+
+    def discard(self, session_id: str):
+        with self._connection() as conn:
+            conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def record(self, session: Dict, turns: List[Dict], chunks: Dict[str, str]):
+        """Remember answered questions and the chunks they were answered from"""
+        conn = self._connection()
+        with conn:
+            # Take the write lock before reading, so turns recorded meanwhile by another worker are kept
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT * FROM sessions WHERE session_id = ?", (session["session_id"],)).fetchone()
+            if row is None:
+                return
+            stored = self._session(row)
+            stored["turns"] = (stored["turns"] + turns)[-SESSION_TURNS:]
+            for chunk_id, document in chunks.items():
+                stored["chunks"].pop(chunk_id, None)
+                stored["chunks"][chunk_id] = document
+            while len(stored["chunks"]) > SESSION_CHUNKS:
+                stored["chunks"].popitem(last=False)
+            stored["updated_at"] = time.time()
+            conn.execute(
+                "UPDATE sessions SET turns = ?, chunks = ?, updated_at = ? WHERE session_id = ?",
+                (json.dumps(stored["turns"]), json.dumps(list(stored["chunks"].items())),
+                 stored["updated_at"], session["session_id"])
+            )
+        session.update(stored)
+
+qa_session_store = QASessionStore()
+
+def _build_prompt(questions: List[str], passages: List[str], doc_label: str, turns: List[Dict]) -> str:
+    history = ""
+    if turns:
+        history = "Earlier questions in this session:\n" + "\n".join(
+            f"Q: {turn['question']}\nA: {turn['answer']}" for turn in turns
+        ) + "\n\n"
+    numbered_questions = "\n".join(f"{i}. {question}" for i, question in enumerate(questions, 1))
+    context = "\n\n".join(f"[{i}] {passage}" for i, passage in enumerate(passages, 1))
+    heading = doc_label[:1].upper() + doc_label[1:]
+    answer_format = "\n".join(f"Answer {i}: <answer>" for i in range(1, len(questions) + 1))
+    return f"""Based on the following {doc_label} context, please answer each of these questions:
+
+{history}Questions:
+{numbered_questions}
+
+{heading} Context:
+{context}
+
+Provide a clear and concise answer to each question based only on the information provided in the {doc_label} context.
+If the information isn't available in the context, say so.
+Use this EXACT format, one answer per question and in the same order:
+{answer_format}"""
+
+def _parse_answers(response: str, count: int) -> List[str]:
+    """Split a numbered multi-answer LLM response into one answer per question"""
+    if response.startswith("Error:"):
+        return [response] * count
+    answers = ["No answer was returned for this question."] * count
+    parts = ANSWER_PATTERN.split(response)
+    # parts: [preamble, number, text, number, text, ...]
+    for number, text in zip(parts[1::2], parts[2::2]):
+        index = int(number) - 1
+        if 0 <= index < count:
+            answers[index] = text.strip()
+    if count == 1 and len(parts) == 1:
+        answers[0] = response.strip()
+    return answers
+
+def answer_questions(retriever, questions: List[str], doc_hash: str, doc_label: str,
+                     session: Optional[Dict] = None) -> List[Dict]:
+    """Answer many questions about one document with batched retrieval and few LLM calls.
+
+    All questions are embedded in one batch and retrieved with one
+    multi-query lookup. Questions are then answered QA_BATCH_SIZE at a time,
+    each group in a single LLM call over the deduplicated chunks of its
+    questions; several groups run concurrently.
+    """
+    embeddings = None
+    if retriever.uses_vectors:
+        embeddings = generate_embeddings(questions)
+        if any(embedding is None for embedding in embeddings):
+            raise ValueError("Failed to generate embeddings for the questions")
+
+    matches = retriever.query(
+        query_texts=questions,
+        query_embeddings=embeddings,
+        n_results=QA_TOP_K,
+        where={"doc_hash": doc_hash}
+    )
+
+    turns = list(session["turns"]) if session else []
+    session_chunks = dict(session["chunks"]) if session else {}
+
+    def answer_group(indices: range) -> List[Dict]:
+        # Each chunk appears once even when several questions retrieved it; chunks
+        # from earlier turns come last so fresh matches win the token budget
+        chunks: Dict[str, str] = OrderedDict()
+        for q in indices:
+            for chunk_id, document in zip(matches["ids"][q], matches["documents"][q]):
+                chunks.setdefault(chunk_id, document)
+        for chunk_id, document in session_chunks.items():
+            chunks.setdefault(chunk_id, document)
+
+        passages, used = [], 0
+        for document in chunks.values():
+            tokens = context_assembler.count_tokens(document)
+            if used + tokens > QA_CONTEXT_TOKENS:
+                continue
+            passages.append(document)
+            used += tokens
+
+        group_questions = [questions[q] for q in indices]
+        response = get_llm_response(_build_prompt(group_questions, passages, doc_label, turns), route="qa")
+        return [{
+            "question": questions[q],
+            "answer": answer,
+            "sources": matches["ids"][q]
+        } for q, answer in zip(indices, _parse_answers(response, len(group_questions)))]
+
+    groups = [range(start, min(start + QA_BATCH_SIZE, len(questions)))
+              for start in range(0, len(questions), QA_BATCH_SIZE)]
+    if len(groups) == 1:
+        answers = answer_group(groups[0])
+    else:
+        with ThreadPoolExecutor(max_workers=len(groups), thread_name_prefix="qa") as executor:
+            answers = [answer for group in executor.map(answer_group, groups) for answer in group]
+    logger.info(f"Answered {len(questions)} {doc_label} questions with {len(groups)} LLM call(s)")
+
+    if session is not None:
+        qa_session_store.record(
+            session,
+            [{"question": answer["question"], "answer": answer["answer"]} for answer in answers],
+            {chunk_id: document for q in range(len(questions))
+             for chunk_id, document in zip(matches["ids"][q], matches["documents"][q])}
+        )
+    return answers
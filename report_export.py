@@ -0,0 +1,187 @@
+import os
+import re
+import tempfile
+import threading
+from datetime import datetime
+from typing import Dict, List
+from xml.sax.saxutils import escape
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import mm
+from reportlab.platypus import ListFlowable, ListItem, Paragraph, SimpleDocTemplate, Spacer
+from utils import logger, DIRS
+
+# Bump when the layout changes so cached exports are rendered again
+REPORT_VERSION = "3"
+
+SECTIONS = [
+    ("core_compliance", "Core Compliance Status:", "Core Compliance Status"),
+    ("submission_requirements", "Required Submission Documents:", "Required Submission Documents"),
+    ("additional_qualifications", "Additional Desired Qualifications:", "Additional Desired Qualifications"),
+    ("compliance_assessment", "Overall Compliance Assessment:", "Overall Compliance Assessment"),
+    ("required_actions", "Required Actions:", "Required Actions")
+]
+ACTION_GROUPS = [
+    ("Critical (must be completed to become eligible):", "critical"),
+    ("Important (needed for submission):", "important"),
+    ("Optional (for competitive advantage):", "optional")
+]
+SEPARATOR_PATTERN = re.compile(r"^[-_*\s]{3,}$")
+BULLET_PATTERN = re.compile(r"^[-*0-9.\s]+")
+
+def split_sections(evaluation: str) -> Dict[str, str]:
+    """Split an evaluation into its sections; missing headings give empty sections"""
+    sections = {}
+    for i, (key, heading, _) in enumerate(SECTIONS):
+        start = evaluation.find(heading)
+        if start < 0:
+            sections[key] = ""
+            continue
+        start += len(heading)
+        ends = [evaluation.find(h, start) for _, h, _ in SECTIONS[i + 1:]]
+        ends = [end for end in ends if end >= 0]
+        sections[key] = evaluation[start:min(ends) if ends else len(evaluation)].strip()
+    return sections
+
+def list_items(text: str) -> List[str]:
+    """Section lines without separators and leading bullets or numbers, as in the web view"""
+    items = []
+    for line in text.splitlines():
+        line = line.strip()
+        if line and not SEPARATOR_PATTERN.match(line):
+            item = BULLET_PATTERN.sub("", line).strip()
+            if item:
+                items.append(item)
+    return items
+
+def group_actions(text: str) -> Dict[str, List[str]]:
+    """Group required actions by priority; lines before any priority heading are kept as critical"""
+    groups = {name: [] for _, name in ACTION_GROUPS}
+    current = None
+    for line in text.splitlines():
+        line = line.strip()
+        heading = next((name for label, name in ACTION_GROUPS if label in line), None)
+        if heading:
+            current = heading
+        elif line and not SEPARATOR_PATTERN.match(line):
+            item = BULLET_PATTERN.sub("", line).strip()
+            if item:
+                groups[current or "critical"].append(item)
+    return groups
+
+def render_evaluation_pdf(result: Dict, evaluation_id: str, path: str):
+    """Render a stored evaluation to a text-based PDF report"""
+    styles = getSampleStyleSheet()
+    title = ParagraphStyle("ReportTitle", parent=styles["Title"], textColor=colors.HexColor("#0d6efd"))
+    heading = ParagraphStyle("SectionHeading", parent=styles["Heading2"], textColor=colors.HexColor("#0d6efd"),
+                             spaceBefore=12)
+    body = ParagraphStyle("ReportBody", parent=styles["BodyText"], leading=14)
+    critical = ParagraphStyle("Critical", parent=body, textColor=colors.HexColor("#dc3545"))
+    meta = ParagraphStyle("ReportMeta", parent=body, textColor=colors.HexColor("#6c757d"), alignment=1)
+
+    def bullet_list(items: List[str], style: ParagraphStyle, numbered: bool = True):
+        flowables = [ListItem(Paragraph(escape(item), style)) for item in items]
+        return ListFlowable(flowables, bulletType="1" if numbered else "bullet", leftIndent=14)
+
+    timestamp = result.get("timestamp")
+    generated = datetime.fromisoformat(timestamp).strftime("%B %d, %Y") if timestamp else ""
+    story = [
+        Paragraph("RFP Compliance Evaluation Report", title),
+        Paragraph(escape(f"Evaluated on {generated} - evaluation {evaluation_id}"), meta),
+        Spacer(1, 6 * mm)
+    ]
+
+    # Documents are stored under their content hash, so show the names they were uploaded under
+    for label, analysis in (("RFP", result.get("rfp_analysis")), ("Company data", result.get("company_analysis"))):
+        analysis = analysis or {}
+        value = analysis.get("filename") or os.path.basename(analysis.get("file") or "")
+        if value:
+            story.append(Paragraph(f"<b>{label}:</b> {escape(value)}", body))
+
+    # A screen has a registration verdict (which may be UNKNOWN) instead of report sections
+    if result.get("mode") == "screen":
+        screen = result.get("screen") or {}
+        story.append(Paragraph(f"<b>Registration screen:</b> {escape(screen.get('verdict', 'UNKNOWN'))}", body))
+        story.append(Paragraph(escape(screen.get("reason", "")), body))
+        for label, states in (("Required states", screen.get("required_states")),
+                              ("Company registered in", screen.get("company_states"))):
+            story.append(Paragraph(f"<b>{label}:</b> {escape(', '.join(states or []) or 'None found')}", body))
+        story.append(Paragraph(f"<b>Decided by:</b> {escape(screen.get('method', ''))}", body))
+        for label, evidence in (("RFP Registration Requirements", screen.get("rfp_evidence")),
+                                ("Company Registration Facts", screen.get("company_evidence"))):
+            story.append(Paragraph(label, heading))
+            story.append(bullet_list(evidence, body, numbered=False) if evidence else Paragraph("None found.", body))
+        story.append(Spacer(1, 4 * mm))
+        story.append(Paragraph("This is a screen of US and state registration only, not a full compliance report.",
+                               meta))
+    else:
+        story.append(Paragraph(
+            f"<b>Eligibility:</b> {'ELIGIBLE' if result.get('is_compliant') else 'NOT ELIGIBLE'}",
+            body
+        ))
+        sections = split_sections(result.get("evaluation", ""))
+        for key, _, label in SECTIONS:
+            story.append(Paragraph(label, heading))
+            if key == "required_actions":
+                groups = group_actions(sections[key])
+                for group_label, name in ACTION_GROUPS:
+                    if groups[name]:
+                        style = critical if name == "critical" else body
+                        story.append(Paragraph(f"<b>{escape(group_label)}</b>", style))
+                        story.append(bullet_list(groups[name], style, numbered=False))
+            else:
+                items = list_items(sections[key])
+                story.append(bullet_list(items, body) if items else Paragraph("Not stated in the evaluation.", body))
+
+    document = SimpleDocTemplate(
+        path, pagesize=A4, leftMargin=20 * mm, rightMargin=20 * mm, topMargin=18 * mm, bottomMargin=18 * mm,
+        title="RFP Compliance Evaluation Report", author="RFP Eligibility Evaluator", invariant=1
+    )
+    document.build(story)
+
+class ReportCache:
+    """Rendered PDF reports on disk, one per evaluation id and report version.
+
+    Stored evaluations never change, so a rendered report stays valid until
+    REPORT_VERSION is bumped. Concurrent requests for the same report wait
+    for a single render.
+    """
+    def __init__(self, directory: str = DIRS['data']['reports']):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._rendering: Dict[str, threading.Lock] = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, evaluation_id: str) -> str:
+        return os.path.join(self.directory, f"{evaluation_id}.v{REPORT_VERSION}.pdf")
+
+    def etag(self, evaluation_id: str) -> str:
+        return f"{evaluation_id}-v{REPORT_VERSION}"
+
+    def get(self, evaluation_id: str, result: Dict) -> str:
+        """Path of the rendered report, rendering it on first use"""
+        path = self.path(evaluation_id)
+        if os.path.exists(path):
+            return path
+
+        with self._lock:
+            lock = self._rendering.setdefault(evaluation_id, threading.Lock())
+        try:
+            with lock:
+                if not os.path.exists(path):
+                    fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".part")
+                    os.close(fd)
+                    try:
+                        render_evaluation_pdf(result, evaluation_id, tmp_path)
+                        os.replace(tmp_path, path)
+                    finally:
+                        if os.path.exists(tmp_path):
+                            os.remove(tmp_path)
+                    logger.info(f"Rendered PDF report for evaluation {evaluation_id}")
+        finally:
+            with self._lock:
+                self._rendering.pop(evaluation_id, None)
+        return path
+
+report_cache = ReportCache()
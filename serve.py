@@ -0,0 +1,79 @@
+"""Production server entry point.
+
+Usage:
+    WEB_CONCURRENCY=4 WEB_THREADS=4 python serve.py
+
+The app, embedding model and vector store handles are loaded once in the
+master process before workers are forked, so model weights are shared
+copy-on-write instead of being loaded by every worker. Each worker reopens
+its vector store handles, then warms up in the background; /readyz reports
+503 until that is done and /healthz reports liveness.
+
+Settings:
+    BIND             address to listen on (default 0.0.0.0:$PORT, PORT defaults to 5000)
+    WEB_CONCURRENCY  number of worker processes (default 2)
+    WEB_THREADS      threads per worker for the WSGI app (default 4)
+    SERVER_APP       "wsgi" serves app:app, "asgi" serves asgi:app with uvicorn workers
+    WEB_TIMEOUT      worker timeout in seconds (default 300, evaluations wait on the LLM)
+"""
+import gc
+import os
+import threading
+from gunicorn.app.base import BaseApplication
+
+def _worker_torch_threads(workers: int) -> int:
+    """Split the CPU cores between workers so they do not oversubscribe each other"""
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+def when_ready(server):
+    # Everything allocated so far (model weights, modules) is moved out of the
+    # collector's reach so garbage collection in workers does not touch those
+    # pages and break copy-on-write sharing
+    gc.freeze()
+    server.log.info("Application preloaded, forking workers")
+
+def post_fork(server, worker):
+    import torch
+    from utils import reopen_vector_stores, warm_up, EMBEDDING_THREADS
+
+    if not EMBEDDING_THREADS:
+        torch.set_num_threads(_worker_torch_threads(server.cfg.workers))
+    reopen_vector_stores()
+    threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+
+class ProductionServer(BaseApplication):
+    """Gunicorn application that preloads the app in the master process"""
+    def __init__(self, options):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        if os.getenv("SERVER_APP", "wsgi") == "asgi":
+            from asgi import app
+        else:
+            from app import app
+        return app
+
+def main():
+    workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+    options = {
+        "bind": os.getenv("BIND", f"0.0.0.0:{os.getenv('PORT', '5000')}"),
+        "workers": workers,
+        "threads": int(os.getenv("WEB_THREADS", "4")),
+        "timeout": int(os.getenv("WEB_TIMEOUT", "300")),
+        "preload_app": True,
+        "when_ready": when_ready,
+        "post_fork": post_fork,
+        "accesslog": "-"
+    }
+    if os.getenv("SERVER_APP", "wsgi") == "asgi":
+        options["worker_class"] = "uvicorn.workers.UvicornWorker"
+
+    ProductionServer(options).run()
+
+if __name__ == "__main__":
+    main()
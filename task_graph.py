@@ -0,0 +1,214 @@
+import json
+import time
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from utils import logger, TASK_GRAPH_WORKERS, TASK_CACHE_SIZE
+
+class TaskCache:
+    """Thread-safe LRU cache of node outputs keyed by their input hashes"""
+    def __init__(self, max_entries: int = TASK_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        with self._lock:
+            if key not in self._entries:
+                return False, None
+            self._entries.move_to_end(key)
+            return True, self._entries[key]
+
+    def put(self, key: str, value: Any):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+task_cache = TaskCache()
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_executor() -> ThreadPoolExecutor:
+    """Shared worker pool for graph nodes, created on first use so forked workers get their own"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=TASK_GRAPH_WORKERS, thread_name_prefix="task")
+        return _executor
+
+class TaskNode:
+    def __init__(self, name: str, func: Callable, deps: Tuple[str, ...], inputs: Dict, cache: bool,
+                 cache_if: Optional[Callable[[Any], bool]], afunc: Optional[Callable]):
+        self.name = name
+        self.func = func
+        self.deps = deps
+        self.inputs = inputs
+        self.cache = cache
+        self.cache_if = cache_if
+        self.afunc = afunc
+
+class TaskGraph:
+    """In-process DAG of workflow steps.
+
+    Each node's function receives the outputs of its dependencies as keyword
+    arguments. Independent nodes run in parallel on a shared worker pool.
+    A node's cache key hashes its declared `inputs` (content hashes and
+    settings) together with the keys of its dependencies, so keys are known
+    before anything runs: a cached node is not executed, and neither are
+    dependencies that only it needed. Outputs are kept on the graph, so a
+    later run for further targets continues from the earlier one. Per-node
+    timings are kept in `timings`.
+    """
+    def __init__(self, name: str, cache: TaskCache = task_cache):
+        self.name = name
+        self.cache = cache
+        self.nodes: Dict[str, TaskNode] = {}
+        self.timings: Dict[str, Dict] = {}
+        self.outputs: Dict[str, Any] = {}
+        self._keys: Dict[str, str] = {}
+
+    def add(self, name: str, func: Callable, deps: Iterable[str] = (), inputs: Optional[Dict] = None,
+            cache: bool = True, cache_if: Optional[Callable[[Any], bool]] = None,
+            afunc: Optional[Callable] = None) -> "TaskGraph":
+        """Add a node; dependencies must already be in the graph, which keeps it acyclic.
+
+        `afunc` is an optional coroutine function used instead of `func` by `arun`,
+        and `cache_if` can veto caching of an output (e.g. an error message).
+        """
+        if name in self.nodes:
+            raise ValueError(f"Duplicate task graph node: {name}")
+        missing = [dep for dep in deps if dep not in self.nodes]
+        if missing:
+            raise ValueError(f"Unknown dependencies of {name}: {', '.join(missing)}")
+        self.nodes[name] = TaskNode(name, func, tuple(deps), inputs or {}, cache, cache_if, afunc)
+        return self
+
+    def key(self, name: str) -> str:
+        """Cache key of a node, derived from its inputs and its dependencies' keys"""
+        if name not in self._keys:
+            node = self.nodes[name]
+            payload = json.dumps({
+                "graph": self.name,
+                "node": name,
+                "inputs": node.inputs,
+                "deps": {dep: self.key(dep) for dep in node.deps}
+            }, sort_keys=True, default=str)
+            self._keys[name] = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+        return self._keys[name]
+
+    def _plan(self, targets: Iterable[str]) -> Tuple[Dict[str, Any], List[str]]:
+        """Split the nodes needed for `targets` into cached outputs and nodes to run"""
+        outputs, pending, seen = {}, [], set()
+
+        def visit(name: str):
+            if name in seen:
+                return
+            seen.add(name)
+            node = self.nodes[name]
+            if name in self.outputs:
+                outputs[name] = self.outputs[name]
+                return
+            if node.cache:
+                hit, value = self.cache.get(self.key(name))
+                if hit:
+                    outputs[name] = value
+                    self.timings[name] = {"status": "cached", "seconds": 0.0}
+                    return
+            for dep in node.deps:
+                visit(dep)
+            pending.append(name)
+
+        for target in targets:
+            visit(target)
+        return outputs, pending
+
+    def _finish(self, name: str, output: Any, started: float, origin: float):
+        node = self.nodes[name]
+        if node.cache and (node.cache_if is None or node.cache_if(output)):
+            self.cache.put(self.key(name), output)
+        finished = time.perf_counter()
+        self.timings[name] = {
+            "status": "done",
+            "start": round(started - origin, 4),
+            "seconds": round(finished - started, 4)
+        }
+
+    def _log(self, elapsed: float):
+        steps = ", ".join(f"{name} {timing['seconds']:.2f}s" + (" (cached)" if timing["status"] == "cached" else "")
+                          for name, timing in self.timings.items())
+        logger.info(f"Task graph {self.name} finished in {elapsed:.2f}s: {steps}")
+
+    def run(self, targets: Iterable[str]) -> Dict[str, Any]:
+        """Compute the target nodes and return every output produced or reused along the way"""
+        origin = time.perf_counter()
+        outputs, pending = self._plan(targets)
+        executor = get_executor()
+        running = {}
+        try:
+            while pending or running:
+                for name in [name for name in pending if all(dep in outputs for dep in self.nodes[name].deps)]:
+                    pending.remove(name)
+                    node = self.nodes[name]
+                    kwargs = {dep: outputs[dep] for dep in node.deps}
+                    running[executor.submit(node.func, **kwargs)] = (name, time.perf_counter())
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, started = running.pop(future)
+                    try:
+                        outputs[name] = future.result()
+                    except Exception:
+                        self.timings[name] = {"status": "error", "seconds": round(time.perf_counter() - started, 4)}
+                        raise
+                    self._finish(name, outputs[name], started, origin)
+        finally:
+            for future in running:
+                future.cancel()
+        self.outputs.update(outputs)
+        self._log(time.perf_counter() - origin)
+        return outputs
+
+    async def arun(self, targets: Iterable[str]) -> Dict[str, Any]:
+        """Like `run`, without blocking the event loop: `afunc` nodes are awaited and the
+        rest run on the worker pool"""
+        loop = asyncio.get_running_loop()
+        origin = time.perf_counter()
+        outputs, pending = self._plan(targets)
+        running = {}
+        try:
+            while pending or running:
+                for name in [name for name in pending if all(dep in outputs for dep in self.nodes[name].deps)]:
+                    pending.remove(name)
+                    node = self.nodes[name]
+                    kwargs = {dep: outputs[dep] for dep in node.deps}
+                    if node.afunc:
+                        task = asyncio.ensure_future(node.afunc(**kwargs))
+                    else:
+                        task = loop.run_in_executor(get_executor(), lambda node=node, kwargs=kwargs: node.func(**kwargs))
+                    running[task] = (name, time.perf_counter())
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    name, started = running.pop(task)
+                    try:
+                        outputs[name] = task.result()
+                    except Exception:
+                        self.timings[name] = {"status": "error", "seconds": round(time.perf_counter() - started, 4)}
+                        raise
+                    self._finish(name, outputs[name], started, origin)
+        finally:
+            for task in running:
+                task.cancel()
+        self.outputs.update(outputs)
+        self._log(time.perf_counter() - origin)
+        return outputs
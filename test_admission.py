@@ -0,0 +1,111 @@
+import time
+import asyncio
+import threading
+import pytest
+from admission import AdmissionController, AdmissionRejected, TokenBucket, client_key
+
+def test_token_bucket_allows_a_burst_then_refills():
+    bucket = TokenBucket(rate=0.5, burst=2, now=0.0)
+    assert bucket.take(0.0) == 0 and bucket.take(0.0) == 0
+    assert bucket.take(0.0) == pytest.approx(2.0)
+    assert bucket.take(1.0) == pytest.approx(1.0)
+    assert bucket.take(2.0) == 0
+    bucket.refill(100.0)
+    assert bucket.tokens == 2
+
+def test_rate_limit_is_per_client():
+    controller = AdmissionController(max_in_flight=0, rate_per_minute=60, burst=2)
+    for _ in range(2):
+        with controller.admit("a"):
+            pass
+    with pytest.raises(AdmissionRejected) as rejected:
+        with controller.admit("a"):
+            pass
+    assert rejected.value.reason == "rate_limited" and rejected.value.retry_after >= 1
+    with controller.admit("b"):
+        pass
+    assert controller.stats()["rejected"]["rate_limited"] == 1
+
+def hold_slot(controller, release):
+    entered = threading.Event()
+
+    def run():
+        with controller.admit("holder"):
+            entered.set()
+            release.wait(5)
+    thread = threading.Thread(target=run)
+    thread.start()
+    entered.wait(5)
+    return thread
+
+def test_queue_full_and_queue_timeout():
+    controller = AdmissionController(max_in_flight=1, queue_size=1, queue_timeout=0.05, rate_per_minute=0)
+    release = threading.Event()
+    holder = hold_slot(controller, release)
+
+    with pytest.raises(AdmissionRejected) as timed_out:
+        with controller.admit("waiter"):
+            pass
+    assert timed_out.value.reason == "queue_timeout"
+    assert controller.stats()["queue_depth"] == 0
+
+    controller.queue_timeout = 5
+    admitted, done = threading.Event(), threading.Event()
+
+    def queued():
+        with controller.admit("queued"):
+            admitted.set()
+            done.wait(5)
+    waiting = threading.Thread(target=queued)
+    waiting.start()
+    while not controller.stats()["queue_depth"]:
+        time.sleep(0.001)
+    with pytest.raises(AdmissionRejected) as full:
+        with controller.admit("late"):
+            pass
+    assert full.value.reason == "queue_full"
+
+    release.set()
+    holder.join()
+    assert admitted.wait(5)
+    stats = controller.stats()
+    # The released slot went straight to the queued request
+    assert stats["in_flight"] == 1 and stats["queued"] == 1 and stats["admitted"] == 2
+    assert stats["rejected"] == {"rate_limited": 0, "queue_full": 1, "queue_timeout": 1}
+    done.set()
+    waiting.join()
+    assert controller.stats()["in_flight"] == 0
+
+def test_cancelled_async_waiter_gives_back_its_slot():
+    controller = AdmissionController(max_in_flight=1, queue_size=4, queue_timeout=5, rate_per_minute=0)
+
+    async def main():
+        release = asyncio.Event()
+
+        async def holder():
+            async with controller.aadmit("a"):
+                await release.wait()
+
+        async def waiter():
+            async with controller.aadmit("b"):
+                pass
+
+        first = asyncio.ensure_future(holder())
+        await asyncio.sleep(0)
+        second = asyncio.ensure_future(waiter())
+        await asyncio.sleep(0)
+        assert controller.stats()["queue_depth"] == 1
+        second.cancel()
+        release.set()
+        await first
+        with pytest.raises(asyncio.CancelledError):
+            await second
+
+    asyncio.run(main())
+    assert controller.stats()["in_flight"] == 0 and controller.stats()["queue_depth"] == 0
+
+def test_client_key_prefers_the_configured_header():
+    headers = {"X-Forwarded-For": "203.0.113.7, 10.0.0.1"}
+    assert client_key(headers, "10.0.0.1", header="X-Forwarded-For") == "203.0.113.7"
+    assert client_key({}, "10.0.0.1", header="X-Forwarded-For") == "10.0.0.1"
+    assert client_key(headers, None, header=None) == "unknown"
@@ -0,0 +1,38 @@
+from boilerplate import strip_repeated_lines, dedupe_texts
+
+def page(number: int, body: str, first: str = "ACME RFP 2024-17", last: str = None) -> str:
+    return "\n".join([first, body, "More requirement text follows here.", last or f"Page {number} of 3"])
+
+def test_running_headers_and_page_numbers_are_removed():
+    pages = [page(n, f"Section {n} describes the scope.") for n in (1, 2, 3)]
+    cleaned, removed = strip_repeated_lines(pages)
+    assert all("ACME RFP" not in text and "Page" not in text for text in cleaned)
+    assert {entry["line"] for entry in removed} == {"ACME RFP 2024-17", "Page 1 of 3"}
+
+def test_numeric_edge_lines_that_do_not_repeat_are_kept():
+    pages = [
+        "Scope of work\nThe vendor supplies staff.\nTotal budget:\n$500,000",
+        "Schedule\nWork starts in the fiscal year.\nContract year\n2023",
+        "Evaluation\nProposals are scored on merit.\nPoints available\n100"
+    ]
+    cleaned, removed = strip_repeated_lines(pages)
+    assert cleaned == pages
+    assert removed == []
+
+def test_bare_page_numbers_go_but_a_year_at_the_edge_stays():
+    pages = [f"{number}\nBody text of page {number}.\nMore text.\nEnd of page." for number in (1, 2, 3, 4)]
+    pages[2] = "2023\nBody text of page 3.\nMore text.\nEnd of page."
+    cleaned, _ = strip_repeated_lines(pages)
+    assert cleaned[0].splitlines()[0] == "Body text of page 1."
+    assert cleaned[2].splitlines()[0] == "2023"
+
+def test_duplicates_point_at_original_positions():
+    texts = [
+        "The vendor must be registered to do business in Virginia.",
+        "Proposals are due on May 1 at noon Eastern time.",
+        "The vendor must be registered to do business in Virginia.",
+        "Proposals are due on May 1 at noon Eastern time!"
+    ]
+    kept, dropped = dedupe_texts(texts)
+    assert kept == texts[:2]
+    assert [(entry["index"], entry["duplicate_of"]) for entry in dropped] == [(2, 0), (3, 1)]
@@ -0,0 +1,50 @@
+import io
+import os
+import time
+import threading
+from chunked_uploads import ChunkedUploadManager, UploadError
+
+def test_expired_uploads_are_removed(tmp_path):
+    manager = ChunkedUploadManager(str(tmp_path), max_size=1024, ttl=60)
+    stale = manager.init("rfp", "old.pdf", 10)
+    fresh = manager.init("rfp", "new.pdf", 10)
+    old = time.time() - 120
+    os.utime(manager._state_path(stale["upload_id"]), (old, old))
+
+    assert manager.cleanup() == 1
+    assert not os.path.exists(manager._data_path(stale["upload_id"]))
+    assert not os.path.exists(manager._state_path(stale["upload_id"]))
+    assert manager.get(fresh["upload_id"])["received"] == 0
+
+def test_busy_upload_is_not_removed(tmp_path):
+    manager = ChunkedUploadManager(str(tmp_path), max_size=1024, ttl=0)
+    upload = manager.init("rfp", "busy.pdf", 10)
+    with manager._upload_lock(upload["upload_id"]):
+        other = ChunkedUploadManager(str(tmp_path), max_size=1024, ttl=0)
+        assert other.cleanup(time.time() + 1) == 0
+    assert manager.get(upload["upload_id"])
+
+def test_concurrent_chunks_at_the_same_offset(tmp_path):
+    # Separate managers stand in for separate worker processes
+    managers = [ChunkedUploadManager(str(tmp_path), max_size=1024) for _ in range(4)]
+    upload_id = managers[0].init("rfp", "doc.pdf", 8)["upload_id"]
+    outcomes = []
+
+    def put(manager, data):
+        try:
+            manager.put_chunk(upload_id, 0, io.BytesIO(data))
+            outcomes.append("ok")
+        except UploadError as e:
+            outcomes.append(e.status_code)
+
+    threads = [threading.Thread(target=put, args=(manager, bytes([65 + i]) * 4))
+               for i, manager in enumerate(managers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert outcomes.count("ok") == 1 and outcomes.count(409) == 3
+    state = managers[0].get(upload_id)
+    with open(managers[0]._data_path(upload_id), 'rb') as f:
+        assert state["received"] == 4 and len(set(f.read())) == 1
@@ -0,0 +1,43 @@
+from compliance_screen import extract_registration, rule_verdict, prepare_screen, finish_screen
+
+def test_washington_dc_is_the_district_not_the_state():
+    facts = extract_registration(["The vendor must be registered in Washington, D.C. and Maryland."],
+                                 requirements=True)
+    assert facts["states"] == ["District of Columbia", "Maryland"]
+    assert extract_registration(["Registered in Washington DC."])["states"] == ["District of Columbia"]
+    assert extract_registration(["Licensed in Washington and Oregon."])["states"] == ["Oregon", "Washington"]
+
+def test_states_are_matched_case_sensitively_and_whole():
+    assert extract_registration(["We are registered in maine street offices."])["states"] == []
+    assert extract_registration(["REGISTERED IN NEW YORK AND WEST VIRGINIA"])["states"] == \
+        ["New York", "West Virginia"]
+    assert extract_registration(["Incorporated in Virginian territory."])["states"] == []
+
+def test_only_obligations_count_as_requirements():
+    rfp = ["The agency is located in Richmond, Virginia and is registered with the state.",
+           "Offerors must be registered to do business in Virginia."]
+    facts = extract_registration(rfp, requirements=True)
+    assert facts["evidence"] == ["Offerors must be registered to do business in Virginia."]
+    assert extract_registration(["Bidders must be U.S. registered entities."], requirements=True)["us_registration"]
+
+def facts(states, evidence=True):
+    return {"states": states, "us_registration": False, "evidence": ["sentence"] if evidence else []}
+
+def test_rule_verdict():
+    assert rule_verdict(facts([], evidence=False), facts([]))[0] == "ELIGIBLE"
+    assert rule_verdict(facts(["Virginia"]), facts([], evidence=False))[0] == "UNKNOWN"
+    assert rule_verdict(facts(["Virginia", "Maryland"]), facts(["Virginia"])) == \
+        ("NOT ELIGIBLE", "No registration found in Maryland")
+    assert rule_verdict(facts(["Virginia"]), facts(["Virginia", "Ohio"]))[0] == "ELIGIBLE"
+
+def test_llm_verdict_overrides_rules_unless_unavailable():
+    prepared = prepare_screen(["Offerors must be registered in Virginia."],
+                              ["Acme is registered in Virginia."])
+    assert prepared["rule_verdict"] == "ELIGIBLE" and prepared["prompt"]
+
+    screen = finish_screen(prepared, "ELIGIBLE: UNKNOWN\nREASON: Registration date unclear")
+    assert (screen["verdict"], screen["reason"], screen["method"]) == \
+        ("UNKNOWN", "Registration date unclear", "llm")
+    assert finish_screen(prepared, "Error: timeout")["method"] == "rules (LLM unavailable)"
+    assert finish_screen(prepared, "no verdict here")["verdict"] == "ELIGIBLE"
+    assert prepare_screen(["The project starts in May."], [])["prompt"] is None
@@ -0,0 +1,15 @@
+from document_catalog import DocumentCatalog
+
+def test_catalog_lists_upload_names(tmp_path):
+    catalog = DocumentCatalog(str(tmp_path / "documents.db"))
+    blob = str(tmp_path / "blobs" / "ab" / "abc123.pdf")
+    catalog.record("company", "abc123", blob, 4, 2, "model", filename="Acme Capabilities.pdf")
+    catalog.record("company", "def456", "/data/uploads/legacy.pdf", 3)
+
+    entry = catalog.get("company", "abc123")
+    assert entry["filename"] == "Acme Capabilities.pdf"
+    assert entry["source"] == blob
+    assert catalog.get("company", "def456")["filename"] == "legacy.pdf"
+    assert sorted(document["filename"] for document in catalog.list("company")) == \
+        ["Acme Capabilities.pdf", "legacy.pdf"]
+    assert catalog.stats("company") == {"documents": 2, "chunks": 7}
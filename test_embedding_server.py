@@ -0,0 +1,13 @@
+import pytest
+from embedding_server import parse_address, check_authkey
+
+def test_tcp_address_requires_authkey():
+    _, family = parse_address("0.0.0.0:8765")
+    with pytest.raises(ValueError):
+        check_authkey(family, None)
+    check_authkey(family, b"secret")
+
+def test_unix_socket_needs_no_authkey():
+    address, family = parse_address("unix:/tmp/embeddings.sock")
+    assert (address, family) == ("/tmp/embeddings.sock", "AF_UNIX")
+    check_authkey(family, None)
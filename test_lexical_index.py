@@ -0,0 +1,45 @@
+from lexical_index import BM25Index, HybridRetriever, tokenize
+from vector_store import InMemoryVectorStore
+
+def add_document(index, store, doc_hash, texts):
+    ids = [f"{doc_hash}_{i}" for i in range(len(texts))]
+    metadatas = [{"doc_hash": doc_hash, "chunk_index": i} for i in range(len(texts))]
+    index.add(doc_hash, ids, texts, metadatas)
+    store.add(ids=ids, embeddings=[[float(i), 1.0] for i in range(len(texts))], documents=texts,
+              metadatas=metadatas)
+
+def corpus(tmp_path):
+    index, store = BM25Index(str(tmp_path / "lexical")), InMemoryVectorStore()
+    add_document(index, store, "rfp1", ["Submit form W-9 with the proposal.", "The contract term is two years."])
+    add_document(index, store, "rfp2", ["A W-9 form is required.", "Insurance of $1M is required."])
+    return index, store
+
+def test_identifiers_are_indexed_whole_and_by_parts():
+    assert {"w-9", "w9", "w"} <= set(tokenize("Form W-9"))
+
+def test_filtered_search_scores_only_the_pinned_document(tmp_path):
+    index, _ = corpus(tmp_path)
+    matches = index.search("W-9 form", where={"doc_hash": "rfp2"})
+    assert [match[0] for match in matches] == ["rfp2_0"]
+    assert matches[0][1] == {"doc_hash": "rfp2", "chunk_index": 0} and matches[0][2] > 0
+
+    unfiltered = index.search("W-9 form")
+    assert {match[0] for match in unfiltered} == {"rfp1_0", "rfp2_0"}
+    assert index.search("W-9", where={"$and": [{"doc_hash": "rfp1"}, {"chunk_index": 1}]}) == []
+
+def test_postings_are_reloaded_from_disk(tmp_path):
+    index, _ = corpus(tmp_path)
+    reopened = BM25Index(str(tmp_path / "lexical"), max_documents=1)
+    assert reopened.has("rfp1") and not reopened.has("rfp3")
+    assert reopened.search("insurance", where={"doc_hash": {"$in": ["rfp1", "rfp2"]}})[0][0] == "rfp2_1"
+    assert reopened.count() == 4
+
+def test_lexical_matches_read_their_text_from_the_vector_store(tmp_path):
+    index, store = corpus(tmp_path)
+    retriever = HybridRetriever(store, index, lexical_weight=1.0)
+    results = retriever.query(["contract term"], n_results=1, where={"doc_hash": "rfp1"},
+                              include=["documents", "metadatas", "distances", "embeddings"])
+    assert results["ids"] == [["rfp1_1"]]
+    assert results["documents"] == [["The contract term is two years."]]
+    assert list(results["embeddings"][0][0]) == [1.0, 1.0]
+    assert results["distances"][0][0] == 0.0
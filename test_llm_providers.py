@@ -0,0 +1,18 @@
+from llm_providers import LLMRouter, parse_routes
+
+def router(**settings):
+    return LLMRouter({"main": object()}, {}, settings=settings, descriptions={"main": "fake:model"})
+
+def test_only_zero_temperature_routes_are_deterministic():
+    llm_router = router(evaluation={"temperature": 0.0}, screen={"temperature": 0, "max_tokens": 80},
+                        qa={}, analysis={"temperature": 0.7})
+    assert llm_router.deterministic("evaluation")
+    assert llm_router.deterministic("screen")
+    assert not llm_router.deterministic("qa")
+    assert not llm_router.deterministic("analysis")
+    assert not llm_router.deterministic("unknown")
+
+def test_signature_includes_route_settings():
+    llm_router = router(screen={"temperature": 0.0, "max_tokens": 80})
+    assert llm_router.signature("screen") == "fake:model[max_tokens=80,temperature=0.0]"
+    assert parse_routes("screen=local, qa=local") == {"screen": "local", "qa": "local"}
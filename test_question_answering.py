@@ -0,0 +1,37 @@
+import time
+from question_answering import QASessionStore
+
+def test_session_is_shared_between_stores(tmp_path):
+    # Separate stores on one database stand in for separate worker processes
+    path = str(tmp_path / "sessions.db")
+    first, second = QASessionStore(path), QASessionStore(path)
+    session = first.create("rfp", "abc")
+
+    first.record(session, [{"question": "Due date?", "answer": "May 1"}], {"c1": "Proposals are due May 1."})
+    second.record(second.get(session["session_id"]),
+                  [{"question": "Budget?", "answer": "$500,000"}], {"c2": "The budget is $500,000."})
+
+    stored = first.get(session["session_id"])
+    assert stored["kind"] == "rfp" and stored["doc_hash"] == "abc"
+    assert [turn["question"] for turn in stored["turns"]] == ["Due date?", "Budget?"]
+    assert list(stored["chunks"]) == ["c1", "c2"]
+
+def test_expired_and_discarded_sessions(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    store = QASessionStore(path, ttl=60)
+    old = store.create("rfp", "abc")
+    kept = store.create("rfp", "abc")
+    with store._connection() as conn:
+        conn.execute("UPDATE sessions SET updated_at = ? WHERE session_id = ?",
+                     (time.time() - 120, old["session_id"]))
+
+    assert store.get(old["session_id"]) is None
+    assert store.get(kept["session_id"])
+    store.discard(kept["session_id"])
+    assert store.get(kept["session_id"]) is None
+
+def test_oldest_sessions_are_evicted(tmp_path):
+    store = QASessionStore(str(tmp_path / "sessions.db"), max_sessions=2)
+    sessions = [store.create("company", str(i)) for i in range(3)]
+    assert store.get(sessions[0]["session_id"]) is None
+    assert store.get(sessions[2]["session_id"])
@@ -0,0 +1,27 @@
+from agents.rfp_extractor_agent import classify_sentence, classify_chunks
+
+def test_keywords_match_whole_words_only():
+    assert classify_sentence("The vendor must provide scanned copies.") == "must_have"
+    assert classify_sentence("All documents were scanned by the Mayor's office.") == "none"
+    assert classify_sentence("A surplus of staff is not expected.") == "none"
+    assert classify_sentence("Proposals are due May 5.") == "none"
+    assert classify_sentence("Bidders may include references.") == "good_to_have"
+    assert classify_sentence("Experience with GIS is a plus.") == "good_to_have"
+
+def test_must_have_wins_within_a_sentence():
+    assert classify_sentence("The vendor shall submit a plan and may add an appendix.") == "must_have"
+    assert classify_sentence("Offerors need\nto be licensed.") == "must_have"
+
+def test_chunks_are_labelled_from_their_sentences():
+    chunk = ("Background on the agency. Knowledge of Python is preferred.\n"
+             "- Prior state contracts are desirable.")
+    mixed = "The vendor must hold a license. Certification is optional."
+    neutral = "The agency serves the public."
+
+    good, both, none = classify_chunks([chunk, mixed, neutral])
+    assert good["requirement_type"] == "good_to_have"
+    assert good["sentence_labels"] == ["none", "good_to_have", "good_to_have"]
+    assert (both["requirement_type"], both["must_have_sentences"], both["good_to_have_sentences"]) == \
+        ("must_have", 1, 1)
+    # Chunks without any requirement keyword stay must-have, the conservative default
+    assert none["requirement_type"] == "must_have" and none["must_have_sentences"] == 0
@@ -0,0 +1,52 @@
+import asyncio
+from task_graph import TaskCache, TaskGraph
+
+def counting_graph(calls, cache, llm_cache=True):
+    graph = TaskGraph("test", cache=cache)
+    def step(name, result):
+        def run(**deps):
+            calls.append(name)
+            return result(**deps)
+        return run
+    graph.add("rfp", step("rfp", lambda: "rfp chunks"), inputs={"doc_hash": "r1"})
+    graph.add("company", step("company", lambda: "company chunks"), inputs={"doc_hash": "c1"})
+    graph.add("context", step("context", lambda rfp, company: f"{rfp} + {company}"), deps=["rfp", "company"])
+    graph.add("evaluation", step("evaluation", lambda context: f"verdict on {context}"), deps=["context"],
+              inputs={"llm": "fake:model[temperature=0]"}, cache=llm_cache,
+              cache_if=lambda response: not response.startswith("Error:"))
+    return graph
+
+def test_outputs_are_memoized_across_graphs():
+    cache, calls = TaskCache(16), []
+    first = counting_graph(calls, cache).run(["evaluation"])
+    assert sorted(calls) == ["company", "context", "evaluation", "rfp"]
+
+    calls.clear()
+    graph = counting_graph(calls, cache)
+    second = graph.run(["evaluation"])
+    assert calls == []
+    assert second["evaluation"] == first["evaluation"]
+    assert graph.timings["evaluation"]["status"] == "cached"
+
+def test_uncached_node_runs_again_but_reuses_its_dependencies():
+    cache, calls = TaskCache(16), []
+    counting_graph(calls, cache, llm_cache=False).run(["evaluation"])
+    calls.clear()
+    counting_graph(calls, cache, llm_cache=False).run(["evaluation"])
+    assert calls == ["evaluation"]
+
+def test_changed_inputs_miss_the_cache():
+    cache, calls = TaskCache(16), []
+    counting_graph(calls, cache).run(["evaluation"])
+    calls.clear()
+    graph = counting_graph(calls, cache)
+    graph.nodes["company"].inputs = {"doc_hash": "c2"}
+    graph.run(["evaluation"])
+    assert sorted(calls) == ["company", "context", "evaluation"]
+
+def test_async_run_shares_the_cache():
+    cache, calls = TaskCache(16), []
+    counting_graph(calls, cache).run(["evaluation"])
+    calls.clear()
+    outputs = asyncio.run(counting_graph(calls, cache).arun(["evaluation"]))
+    assert calls == [] and outputs["evaluation"].startswith("verdict on")
@@ -0,0 +1,60 @@
+import numpy as np
+from vector_store import InMemoryVectorStore, ShardedVectorStore
+
+class CountingStore(InMemoryVectorStore):
+    def __init__(self):
+        super().__init__(space="l2")
+        self.queries = 0
+
+    def query(self, *args, **kwargs):
+        self.queries += 1
+        return super().query(*args, **kwargs)
+
+def build(shard_count=4, documents=12, chunks=5):
+    rng = np.random.default_rng(7)
+    sharded = ShardedVectorStore([CountingStore() for _ in range(shard_count)])
+    single = InMemoryVectorStore(space="l2")
+    for d in range(documents):
+        ids = [f"doc{d}_{c}" for c in range(chunks)]
+        embeddings = rng.normal(size=(chunks, 8)).astype(np.float32)
+        texts = [f"chunk {c} of document {d}" for c in range(chunks)]
+        metadatas = [{"doc_hash": f"doc{d}", "chunk_index": c} for c in range(chunks)]
+        for store in (sharded, single):
+            store.add(ids=ids, embeddings=embeddings, documents=texts, metadatas=metadatas)
+    return sharded, single, rng
+
+def test_documents_stay_on_one_shard():
+    sharded, _, _ = build()
+    assert sharded.count() == 60
+    for d in range(12):
+        homes = [i for i, shard in enumerate(sharded.shards) if shard.get(where={"doc_hash": f"doc{d}"})["ids"]]
+        assert homes == [sharded.shard_for(f"doc{d}")]
+
+def test_fan_out_merges_the_global_top_k():
+    sharded, single, rng = build()
+    queries = rng.normal(size=(3, 8)).astype(np.float32)
+    merged = sharded.query(query_embeddings=queries, n_results=7)
+    expected = single.query(query_embeddings=queries, n_results=7)
+    assert merged["ids"] == expected["ids"]
+    assert merged["documents"] == expected["documents"]
+    np.testing.assert_allclose(merged["distances"], expected["distances"], rtol=1e-5, atol=1e-5)
+
+    without_distances = sharded.query(query_embeddings=queries, n_results=7, include=["metadatas"])
+    assert without_distances["ids"] == expected["ids"] and without_distances["distances"] is None
+
+def test_pinned_queries_only_touch_owning_shards():
+    sharded, single, rng = build()
+    for shard in sharded.shards:
+        shard.queries = 0
+    where = {"doc_hash": {"$in": ["doc1", "doc2"]}}
+    query = rng.normal(size=(1, 8)).astype(np.float32)
+    merged = sharded.query(query_embeddings=query, n_results=4, where=where)
+    assert merged["ids"] == single.query(query_embeddings=query, n_results=4, where=where)["ids"]
+    owners = {sharded.shard_for("doc1"), sharded.shard_for("doc2")}
+    assert {i for i, shard in enumerate(sharded.shards) if shard.queries} == owners
+
+def test_get_merges_and_limits():
+    sharded, _, _ = build()
+    result = sharded.get(ids=["doc0_0", "doc5_1", "missing"], include=["documents"])
+    assert sorted(result["ids"]) == ["doc0_0", "doc5_1"] and result["metadatas"] is None
+    assert len(sharded.get(limit=3)["ids"]) == 3
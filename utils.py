@@ -1,18 +1,29 @@
 import os
 import pdfplumber
 import docx
-import chromadb
 import logging
 import logging.handlers
+import re
 import json
 import hashlib
 import warnings
+import fcntl
+import tempfile
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 from dotenv import load_dotenv
-from langchain_groq import ChatGroq
 from sentence_transformers import SentenceTransformer
-from typing import List, Optional, Dict, Any
+import numpy as np
+import torch
+from typing import List, Optional, Dict, Any, Tuple, Union
 from langchain_core.messages import HumanMessage
+from vector_store import create_vector_store, ScopeCache, CompactEmbeddingStore
+from llm_providers import create_chat_model, LLMRouter, parse_routes
+from lexical_index import BM25Index
+from document_catalog import DocumentCatalog
+from page_cache import PageTextCache
+from boilerplate import strip_repeated_lines, dedupe_texts
 
 # Configure logging to suppress specific PDFMiner warnings
 logging.getLogger('pdfminer').setLevel(logging.ERROR)
@@ -24,7 +35,123 @@ class LLMError(Exception):
 # Load environment variables
 load_dotenv()
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+# Main LLM provider: "groq", "openai" (any OpenAI-compatible server at LLM_BASE_URL)
+# or "fake" for a deterministic offline LLM with simulated latency (see loadtest.py)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "groq")
+LLM_MODEL = os.getenv("LLM_MODEL", "llama-3.3-70b-versatile")
+LLM_BASE_URL = os.getenv("LLM_BASE_URL")
+LLM_API_KEY = os.getenv("LLM_API_KEY")
+LLM_TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", "0.7"))
+LLM_MAX_TOKENS = int(os.getenv("LLM_MAX_TOKENS", "2048"))
+# Optional small local model for cheap calls, and which routes use it, e.g. "screen=local,qa=local"
+LOCAL_LLM_BACKEND = os.getenv("LOCAL_LLM_BACKEND", "openai")
+LOCAL_LLM_BASE_URL = os.getenv("LOCAL_LLM_BASE_URL")
+LOCAL_LLM_MODEL = os.getenv("LOCAL_LLM_MODEL", "local")
+LOCAL_LLM_API_KEY = os.getenv("LOCAL_LLM_API_KEY")
+LLM_ROUTES = os.getenv("LLM_ROUTES", "")
+FAKE_LLM_LATENCY_MS = float(os.getenv("FAKE_LLM_LATENCY_MS", "200"))
+FAKE_LLM_TOKENS_PER_SECOND = float(os.getenv("FAKE_LLM_TOKENS_PER_SECOND", "0"))
+FAKE_LLM_RESPONSE_TOKENS = int(os.getenv("FAKE_LLM_RESPONSE_TOKENS", "300"))
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-mpnet-base-v2")
+# Embedding inference backend ("torch", "onnx", "quantized" for dynamic int8 weights
+# or "fake" for offline load tests)
+# and intra-op thread count (0 keeps the library default)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0"))
+INDEXING_WORKERS = int(os.getenv("INDEXING_WORKERS", "2"))
+ASYNC_EXECUTOR_WORKERS = int(os.getenv("ASYNC_EXECUTOR_WORKERS", "8"))
+
+# Resumable uploads: largest accepted file, the chunk size suggested to clients and how long
+# (seconds) an upload may sit untouched before it is deleted
+CHUNKED_UPLOAD_MAX_SIZE = int(os.getenv("CHUNKED_UPLOAD_MAX_SIZE", str(512 * 1024 * 1024)))
+CHUNKED_UPLOAD_CHUNK_SIZE = int(os.getenv("CHUNKED_UPLOAD_CHUNK_SIZE", str(8 * 1024 * 1024)))
+CHUNKED_UPLOAD_TTL = float(os.getenv("CHUNKED_UPLOAD_TTL", str(24 * 3600)))
+
+# Shared embedding server ("unix:/path.sock" or "host:port"); when set, workers do not load the model.
+# A host:port server needs a shared secret; a Unix socket is limited to its owner instead
+EMBEDDING_SERVER = os.getenv("EMBEDDING_SERVER")
+EMBEDDING_SERVER_AUTHKEY = os.getenv("EMBEDDING_SERVER_AUTHKEY", "").encode() or None
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+EMBEDDING_BATCH_WAIT_MS = float(os.getenv("EMBEDDING_BATCH_WAIT_MS", "5"))
+
+# Vector store backend ("chroma", "numpy" or "faiss") and HNSW tuning for Chroma
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")
+VECTOR_SPACE = os.getenv("VECTOR_SPACE", "l2")
+HNSW_M = int(os.getenv("HNSW_M", "16"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "100"))
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "10"))
+# Number of stores each collection is partitioned into, and the chunk metadata key that picks the shard
+VECTOR_SHARDS = int(os.getenv("VECTOR_SHARDS", "1"))
+VECTOR_SHARD_KEY = os.getenv("VECTOR_SHARD_KEY", "doc_hash")
+
+# "exact" answers per-evaluation lookups from an in-memory matrix of the documents in play,
+# "index" queries the vector store directly
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "exact")
+SCOPE_CACHE_SIZE = int(os.getenv("SCOPE_CACHE_SIZE", "8"))
+
+# Quantized sidecar copy of chunk embeddings ("off", "float16" or "int8") and how many
+# candidates per result are re-scored in full precision
+EMBEDDING_STORAGE = os.getenv("EMBEDDING_STORAGE", "off")
+RERANK_FACTOR = int(os.getenv("RERANK_FACTOR", "4"))
+
+# Prompt context assembly: candidates retrieved per probe, token budget per prompt section,
+# relevance/diversity trade-off for MMR and an optional Hugging Face tokenizer for counting
+CONTEXT_CANDIDATES = int(os.getenv("CONTEXT_CANDIDATES", "10"))
+CONTEXT_SECTION_TOKENS = int(os.getenv("CONTEXT_SECTION_TOKENS", "1000"))
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", "0.7"))
+CONTEXT_TOKENIZER = os.getenv("CONTEXT_TOKENIZER")
+
+# Hybrid retrieval: weight of BM25 keyword matches against vector similarity
+# (0 is vector search only, 1 is keyword search only and skips query embeddings)
+LEXICAL_WEIGHT = float(os.getenv("LEXICAL_WEIGHT", "0.5"))
+
+# Cache extracted PDF page text so re-chunking or re-embedding skips parsing ("on" or "off")
+PAGE_CACHE = os.getenv("PAGE_CACHE", "on")
+
+# Strip repeated headers/footers and near-duplicate pages and chunks before embedding ("on" or "off");
+# texts whose word-trigram Jaccard similarity reaches NEAR_DUPLICATE_THRESHOLD are duplicates
+BOILERPLATE_FILTER = os.getenv("BOILERPLATE_FILTER", "on")
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", "0.8"))
+
+# Admin routes (e.g. stored request profiles) are disabled unless ADMIN_TOKEN is set.
+# Evaluations are profiled when an admin sends X-Profile, or at PROFILE_SAMPLE_RATE (0-1)
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+
+# Worker threads for the evaluation task graph (its nodes mostly wait on indexing and the LLM),
+# and how many node outputs it memoizes (0 disables)
+TASK_GRAPH_WORKERS = int(os.getenv("TASK_GRAPH_WORKERS", "16"))
+TASK_CACHE_SIZE = int(os.getenv("TASK_CACHE_SIZE", "256"))
+
+# Evaluation depth: "full" report, a fast registration "screen", or "auto" (screen first and
+# write the full report unless the screen finds the company ineligible)
+EVALUATION_MODES = ("full", "screen", "auto")
+EVALUATION_MODE = os.getenv("EVALUATION_MODE", "full")
+SCREEN_MAX_TOKENS = int(os.getenv("SCREEN_MAX_TOKENS", "80"))
+
+# Admission control for evaluations and questions, per worker process: concurrent requests (0 is
+# unlimited), how many may wait and for how long (seconds), and each client's rate (requests per
+# minute, 0 disables) and burst. Clients are told apart by ADMISSION_CLIENT_HEADER when set
+# (e.g. X-Forwarded-For behind a trusted proxy), otherwise by their address
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "8"))
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "16"))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "10"))
+CLIENT_RATE_PER_MINUTE = float(os.getenv("CLIENT_RATE_PER_MINUTE", "30"))
+CLIENT_BURST = int(os.getenv("CLIENT_BURST", "10"))
+ADMISSION_CLIENT_HEADER = os.getenv("ADMISSION_CLIENT_HEADER")
+
+# Browser cache lifetime of exported PDF reports, which never change once rendered
+REPORT_CACHE_MAX_AGE = int(os.getenv("REPORT_CACHE_MAX_AGE", "86400"))
+
+# Question answering: chunks retrieved per question, questions answered per LLM call,
+# token budget of the shared context and lifetime of follow-up sessions (seconds)
+QA_TOP_K = int(os.getenv("QA_TOP_K", "3"))
+QA_BATCH_SIZE = int(os.getenv("QA_BATCH_SIZE", "10"))
+QA_CONTEXT_TOKENS = int(os.getenv("QA_CONTEXT_TOKENS", "3000"))
+QA_MAX_QUESTIONS = int(os.getenv("QA_MAX_QUESTIONS", "50"))
+QA_SESSION_TTL = int(os.getenv("QA_SESSION_TTL", "3600"))
+QA_MAX_SESSIONS = int(os.getenv("QA_MAX_SESSIONS", "256"))
 
 # Define base directory and directory structure
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -34,11 +161,24 @@ DIRS = {
         'company_data': os.path.join(BASE_DIR, 'data', 'company_data'),
         'evaluation_results': os.path.join(BASE_DIR, 'data', 'evaluation_results'),
         'feedback': os.path.join(BASE_DIR, 'data', 'feedback'),
-        'cache': os.path.join(BASE_DIR, 'data', 'cache')
+        'cache': os.path.join(BASE_DIR, 'data', 'cache'),
+        'blobs': os.path.join(BASE_DIR, 'data', 'blobs'),
+        'uploads': os.path.join(BASE_DIR, 'data', 'uploads'),
+        'ingestion_reports': os.path.join(BASE_DIR, 'data', 'ingestion_reports'),
+        'profiles': os.path.join(BASE_DIR, 'data', 'profiles'),
+        'reports': os.path.join(BASE_DIR, 'data', 'reports')
     },
     'embeddings': {
         'rfp': os.path.join(BASE_DIR, 'embeddings', 'rfp_embeddings'),
-        'company': os.path.join(BASE_DIR, 'embeddings', 'company_embeddings')
+        'company': os.path.join(BASE_DIR, 'embeddings', 'company_embeddings'),
+        'compact': {
+            'rfp': os.path.join(BASE_DIR, 'embeddings', 'compact', 'rfp'),
+            'company': os.path.join(BASE_DIR, 'embeddings', 'compact', 'company')
+        },
+        'lexical': {
+            'rfp': os.path.join(BASE_DIR, 'embeddings', 'lexical', 'rfp'),
+            'company': os.path.join(BASE_DIR, 'embeddings', 'lexical', 'company')
+        }
     },
     'logs': os.path.join(BASE_DIR, 'logs'),
     'templates': os.path.join(BASE_DIR, 'templates')
@@ -67,62 +207,185 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Initialize embedding model
+def load_embedding_model(backend: str = EMBEDDING_BACKEND, threads: int = EMBEDDING_THREADS) -> SentenceTransformer:
+    """Load the embedding model with the requested CPU inference backend"""
+    if threads:
+        torch.set_num_threads(threads)
+    
+    if backend == "torch":
+        return SentenceTransformer(EMBEDDING_MODEL)
+    
+    if backend == "onnx":
+        import onnxruntime
+        session_options = onnxruntime.SessionOptions()
+        if threads:
+            session_options.intra_op_num_threads = threads
+        return SentenceTransformer(
+            EMBEDDING_MODEL,
+            backend="onnx",
+            model_kwargs={"provider": "CPUExecutionProvider", "session_options": session_options}
+        )
+    
+    if backend == "fake":
+        # Hashed bag-of-words vectors for offline load tests; no model download
+        from fake_backends import FakeEmbeddingModel
+        return FakeEmbeddingModel()
+    
+    if backend == "quantized":
+        # Dynamic quantization stores Linear weights as int8 and quantizes activations on the fly
+        model = SentenceTransformer(EMBEDDING_MODEL, device="cpu")
+        return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    
+    raise ValueError(f"Unknown embedding backend: {backend}")
+
+def compare_embedding_models(reference: SentenceTransformer, candidate: SentenceTransformer,
+                             texts: List[str]) -> Dict[str, float]:
+    """Cosine similarity between reference and candidate embeddings of the same texts"""
+    expected = reference.encode(texts, normalize_embeddings=True)
+    actual = candidate.encode(texts, normalize_embeddings=True)
+    similarities = (expected * actual).sum(axis=1)
+    return {"min": float(similarities.min()), "mean": float(similarities.mean())}
+
+# Initialize embedding model, or a client for the shared embedding server
 try:
-    embedding_model = SentenceTransformer(EMBEDDING_MODEL)  # This model produces 768-dimensional embeddings
-    logger.info(f"Loaded embedding model: {EMBEDDING_MODEL}")
+    if EMBEDDING_SERVER:
+        from embedding_server import EmbeddingClient
+        embedding_model = EmbeddingClient(EMBEDDING_SERVER, EMBEDDING_SERVER_AUTHKEY)
+        logger.info(f"Using shared embedding server at {EMBEDDING_SERVER}")
+    else:
+        embedding_model = load_embedding_model()  # all-mpnet-base-v2 produces 768-dimensional embeddings
+        logger.info(f"Loaded embedding model: {EMBEDDING_MODEL} ({EMBEDDING_BACKEND} backend)")
 except Exception as e:
     logger.error(f"Error loading embedding model: {str(e)}")
     raise
 
-# Initialize LLM with Groq client
-llm = ChatGroq(
-    groq_api_key=GROQ_API_KEY,
-    model_name="llama-3.3-70b-versatile",
-    temperature=0.7,
-    max_tokens=2048
-)
+# Initialize the LLM providers and route each kind of call to one of them
+fake_llm_settings = {
+    "latency_ms": FAKE_LLM_LATENCY_MS,
+    "tokens_per_second": FAKE_LLM_TOKENS_PER_SECOND,
+    "response_tokens": FAKE_LLM_RESPONSE_TOKENS
+}
+try:
+    llm_providers = {"main": create_chat_model(
+        LLM_BACKEND, LLM_MODEL, temperature=LLM_TEMPERATURE, max_tokens=LLM_MAX_TOKENS,
+        api_key=GROQ_API_KEY if LLM_BACKEND == "groq" else LLM_API_KEY, base_url=LLM_BASE_URL,
+        fake_settings=fake_llm_settings
+    )}
+    llm_descriptions = {"main": f"{LLM_BACKEND}:{LLM_MODEL}"}
+    if LOCAL_LLM_BASE_URL or LOCAL_LLM_BACKEND == "fake":
+        llm_providers["local"] = create_chat_model(
+            LOCAL_LLM_BACKEND, LOCAL_LLM_MODEL, temperature=LLM_TEMPERATURE, max_tokens=LLM_MAX_TOKENS,
+            api_key=LOCAL_LLM_API_KEY, base_url=LOCAL_LLM_BASE_URL, fake_settings=fake_llm_settings
+        )
+        llm_descriptions["local"] = f"{LOCAL_LLM_BACKEND}:{LOCAL_LLM_MODEL}"
+    
+    # Memoized calls (the evaluation and the screen are cached by the task graph) are deterministic
+    llm_router = LLMRouter(llm_providers, parse_routes(LLM_ROUTES), settings={
+        "evaluation": {"temperature": 0.0},
+        "screen": {"temperature": 0.0, "max_tokens": SCREEN_MAX_TOKENS},
+        "qa": {},
+        "analysis": {}
+    }, descriptions=llm_descriptions)
+    # CrewAI agents are given the main model
+    llm = llm_providers["main"]
+    logger.info(f"Initialized LLM providers: {', '.join(f'{name}={description}' for name, description in llm_descriptions.items())}")
+except Exception as e:
+    logger.error(f"Error initializing LLM providers: {str(e)}")
+    raise
 
-# Initialize ChromaDB clients for different collections
+# Initialize vector stores for RFP and company documents
 try:
-    # Client for RFP embeddings
-    rfp_chroma_client = chromadb.PersistentClient(path="embeddings/rfp_embeddings")
-    rfp_collection = rfp_chroma_client.get_or_create_collection(
-        name="rfp_documents",
-        metadata={"description": "RFP document embeddings"}
+    rfp_store = create_vector_store(
+        VECTOR_BACKEND, DIRS['embeddings']['rfp'], "rfp_documents", "RFP document embeddings",
+        space=VECTOR_SPACE, m=HNSW_M, ef_construction=HNSW_EF_CONSTRUCTION, ef_search=HNSW_EF_SEARCH,
+        shards=VECTOR_SHARDS, shard_key=VECTOR_SHARD_KEY
     )
-    
-    # Client for company embeddings
-    company_chroma_client = chromadb.PersistentClient(path="embeddings/company_embeddings")
-    company_collection = company_chroma_client.get_or_create_collection(
-        name="company_documents",
-        metadata={"description": "Company document embeddings"}
+    company_store = create_vector_store(
+        VECTOR_BACKEND, DIRS['embeddings']['company'], "company_documents", "Company document embeddings",
+        space=VECTOR_SPACE, m=HNSW_M, ef_construction=HNSW_EF_CONSTRUCTION, ef_search=HNSW_EF_SEARCH,
+        shards=VECTOR_SHARDS, shard_key=VECTOR_SHARD_KEY
     )
     
-    logger.info("Initialized ChromaDB collections with separate persistent storage")
+    scope_cache = ScopeCache(SCOPE_CACHE_SIZE, rerank_factor=RERANK_FACTOR)
+    
+    # Optional quantized sidecar stores, keyed by document content hash
+    rfp_compact_store = None
+    company_compact_store = None
+    if EMBEDDING_STORAGE != "off":
+        rfp_compact_store = CompactEmbeddingStore(DIRS['embeddings']['compact']['rfp'], EMBEDDING_STORAGE)
+        company_compact_store = CompactEmbeddingStore(DIRS['embeddings']['compact']['company'], EMBEDDING_STORAGE)
+    
+    # BM25 keyword indexes built alongside the embeddings at ingestion
+    rfp_lexical_index = BM25Index(DIRS['embeddings']['lexical']['rfp'])
+    company_lexical_index = BM25Index(DIRS['embeddings']['lexical']['company'])
+    
+    # Catalog of ingested documents with running totals for O(1) stats
+    document_catalog = DocumentCatalog(os.path.join(BASE_DIR, 'data', 'documents.db'))
+    
+    logger.info(f"Initialized {VECTOR_BACKEND} vector stores ({VECTOR_SPACE} space, {VECTOR_SHARDS} shards)")
 except Exception as e:
-    logger.error(f"Error initializing ChromaDB: {str(e)}")
+    logger.error(f"Error initializing vector stores: {str(e)}")
     raise
 
-def parse_pdf(file_path: str) -> Optional[str]:
-    """Extract text from a PDF file"""
+def file_sha256(file_path: str, block_size: int = 1024 * 1024) -> str:
+    """Compute the SHA-256 content hash of a file without loading it into memory"""
+    hasher = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+# Extracted page text is cached by content hash; bump the suffix whenever the
+# extraction itself changes so stale entries are no longer used
+PDF_EXTRACTOR_VERSION = f"pdfplumber-{pdfplumber.__version__}-1"
+page_text_cache = PageTextCache(
+    os.path.join(DIRS['data']['cache'], 'pages.db'), PDF_EXTRACTOR_VERSION
+) if PAGE_CACHE == "on" else None
+
+def parse_pdf_pages(file_path: str, doc_hash: Optional[str] = None) -> Optional[List[str]]:
+    """Extract the text of each page of a PDF file ("" for pages without text)"""
     try:
+        cached = {}
+        if page_text_cache:
+            doc_hash = doc_hash or file_sha256(file_path)
+            pages = page_text_cache.get(doc_hash)
+            if pages is not None:
+                return pages
+            # Resume a partially cached document from the pages already extracted
+            cached = page_text_cache.get_pages(doc_hash)
+
         # Suppress PDFMiner warnings about CropBox
         with warnings.catch_warnings():
             warnings.filterwarnings("ignore", category=UserWarning, module="pdfminer")
-            text_content = []
+            pages = []
             with pdfplumber.open(file_path) as pdf:
-                for page in pdf.pages:
-                    text = page.extract_text()
-                    if text:
-                        text_content.append(text)
-            
-            return "\n\n".join(text_content) if text_content else None
+                for number, page in enumerate(pdf.pages):
+                    if number in cached:
+                        pages.append(cached[number])
+                        continue
+                    text = page.extract_text() or ""
+                    page.close()  # release the parsed page objects as we go
+                    pages.append(text)
+                    if page_text_cache:
+                        page_text_cache.put_page(doc_hash, number, text)
+
+        if page_text_cache:
+            page_text_cache.set_page_count(doc_hash, len(pages))
+        return pages
     
     except Exception as e:
         logger.error(f"Error parsing PDF {file_path}: {str(e)}")
         return None
 
+def join_pages(pages: Optional[List[str]]) -> Optional[str]:
+    """Join extracted page texts the way parse_pdf does"""
+    text_content = [text for text in pages or [] if text]
+    return "\n\n".join(text_content) if text_content else None
+
+def parse_pdf(file_path: str, doc_hash: Optional[str] = None) -> Optional[str]:
+    """Extract text from a PDF file"""
+    return join_pages(parse_pdf_pages(file_path, doc_hash))
+
 def chunk_text(text: str, chunk_size: int = 500, overlap: int = 50) -> List[str]:
     """Split text into overlapping chunks"""
     if not text:
@@ -157,7 +420,43 @@ def chunk_text(text: str, chunk_size: int = 500, overlap: int = 50) -> List[str]
         
     return chunks
 
-def generate_embedding(text: str) -> Optional[List[float]]:
+
+def prepare_chunks(pages: List[str], chunk_size: int = 500, overlap: int = 50) -> Tuple[List[str], Dict]:
+    """Chunk a document's page texts, dropping boilerplate and near-duplicate content first.
+
+    Returns the chunks and a report of the header/footer lines, repeated
+    pages (e.g. signature forms) and duplicate chunks that were removed.
+    """
+    report = {"boilerplate_lines": [], "duplicate_pages": [], "duplicate_chunks": []}
+    if BOILERPLATE_FILTER != "on":
+        return chunk_text(join_pages(pages), chunk_size=chunk_size, overlap=overlap), report
+    
+    pages, report["boilerplate_lines"] = strip_repeated_lines(pages)
+    # Blank pages are left for join_pages to skip, not reported as duplicates of each other.
+    # Duplicates are reported by their position in the document's page list, blank pages included
+    page_indexes = [index for index, page in enumerate(pages) if page.strip()]
+    kept_pages, report["duplicate_pages"] = dedupe_texts(
+        [pages[index] for index in page_indexes], threshold=NEAR_DUPLICATE_THRESHOLD
+    )
+    for entry in report["duplicate_pages"]:
+        entry["index"] = page_indexes[entry["index"]]
+        entry["duplicate_of"] = page_indexes[entry["duplicate_of"]]
+    chunks = chunk_text(join_pages(kept_pages), chunk_size=chunk_size, overlap=overlap)
+    kept_chunks, report["duplicate_chunks"] = dedupe_texts(chunks, threshold=NEAR_DUPLICATE_THRESHOLD)
+    for entry in report["duplicate_chunks"]:
+        entry["preview"] = chunks[entry["index"]][:200]
+    return kept_chunks, report
+
+def save_ingestion_report(kind: str, doc_hash: str, report: Dict):
+    """Record what ingestion removed from a document"""
+    try:
+        path = os.path.join(DIRS['data']['ingestion_reports'], f"{kind}_{doc_hash}.json")
+        with open(path, 'w') as f:
+            json.dump(dict(report, kind=kind, doc_hash=doc_hash, created_at=datetime.now().isoformat()), f, indent=2)
+    except Exception as e:
+        logger.error(f"Error saving ingestion report for {doc_hash}: {str(e)}")
+
+def generate_embedding(text: str, as_numpy: bool = False) -> Optional[Union[List[float], np.ndarray]]:
     """Generate embedding for a text using the configured model"""
     try:
         if not text:
@@ -165,20 +464,38 @@ def generate_embedding(text: str) -> Optional[List[float]]:
         
         # Generate embedding
         embedding = embedding_model.encode(text)
-        return embedding.tolist()
+        return embedding if as_numpy else embedding.tolist()
         
     except Exception as e:
         logger.error(f"Error generating embedding: {str(e)}")
         return None
 
-def get_llm_response(prompt: str) -> str:
-    """Get a response from the LLM"""
+def generate_embeddings(texts: List[str], as_numpy: bool = False):
+    """Generate embeddings for several texts in a single model call.
+
+    With `as_numpy` the result is one float32 matrix (a row per text, None on
+    failure), avoiding the per-float Python objects of the list form.
+    """
+    try:
+        if as_numpy:
+            return np.asarray(embedding_model.encode(texts), dtype=np.float32)
+        
+        embeddings = embedding_model.encode([text for text in texts if text])
+        embeddings = iter(embeddings.tolist())
+        return [next(embeddings) if text else None for text in texts]
+        
+    except Exception as e:
+        logger.error(f"Error generating embeddings: {str(e)}")
+        return None if as_numpy else [None] * len(texts)
+
+def get_llm_response(prompt: str, route: str = "analysis", max_tokens: Optional[int] = None) -> str:
+    """Get a response from the LLM serving `route`, optionally capped at `max_tokens`"""
     try:
         # Format prompt as a chat message
         message = HumanMessage(content=prompt)
         
         # Get response from LLM
-        response = llm.invoke([message])
+        response = llm_router.invoke(route, [message], max_tokens=max_tokens)
         
         return response.content if response else "Sorry, I couldn't generate a response."
         
@@ -186,30 +503,55 @@ def get_llm_response(prompt: str) -> str:
         logger.error(f"Error getting LLM response: {str(e)}")
         return f"Error: {str(e)}"
 
-def reset_collections():
-    """Reset ChromaDB collections to handle embedding dimension changes"""
+async def get_llm_response_async(prompt: str, route: str = "analysis", max_tokens: Optional[int] = None) -> str:
+    """Get a response from the LLM serving `route` without blocking the event loop"""
     try:
-        # Reset RFP collection
-        rfp_chroma_client.delete_collection("rfp_documents")
-        global rfp_collection
-        rfp_collection = rfp_chroma_client.create_collection(
-            name="rfp_documents",
-            metadata={"description": "RFP document embeddings"}
-        )
+        message = HumanMessage(content=prompt)
+        response = await llm_router.ainvoke(route, [message], max_tokens=max_tokens)
         
-        # Reset company collection
-        company_chroma_client.delete_collection("company_documents")
-        global company_collection
-        company_collection = company_chroma_client.create_collection(
-            name="company_documents",
-            metadata={"description": "Company document embeddings"}
-        )
+        return response.content if response else "Sorry, I couldn't generate a response."
         
-        logger.info("Successfully reset ChromaDB collections")
+    except Exception as e:
+        logger.error(f"Error getting LLM response: {str(e)}")
+        return f"Error: {str(e)}"
+
+def reset_collections():
+    """Reset vector store collections to handle embedding dimension changes"""
+    try:
+        rfp_store.reset()
+        company_store.reset()
+        for compact_store in (rfp_compact_store, company_compact_store):
+            if compact_store:
+                compact_store.reset()
+        rfp_lexical_index.reset()
+        company_lexical_index.reset()
+        document_catalog.reset()
+        scope_cache.clear()
+        logger.info("Successfully reset vector store collections")
     except Exception as e:
         logger.error(f"Error resetting collections: {str(e)}")
         raise
 
+# Warm-up state reported by the readiness endpoint
+readiness = {"ready": False, "warmed_up_at": None, "error": None}
+
+def reopen_vector_stores():
+    """Reopen vector store handles in a freshly forked worker"""
+    rfp_store.reopen()
+    company_store.reopen()
+
+def warm_up():
+    """Run one embedding and touch the vector stores so the first request is not a cold start"""
+    try:
+        generate_embeddings(["warm up"], as_numpy=True)
+        rfp_store.count()
+        company_store.count()
+        readiness.update(ready=True, warmed_up_at=datetime.now().isoformat(), error=None)
+        logger.info("Warm-up complete")
+    except Exception as e:
+        readiness.update(ready=False, error=str(e))
+        logger.error(f"Warm-up failed: {str(e)}")
+
 class ResultTracker:
     """Track and store evaluation results"""
     def __init__(self):
@@ -227,6 +569,16 @@ class ResultTracker:
         
         return result_id
 
+    def load_result(self, result_id: str) -> Optional[dict]:
+        """Load a saved evaluation result by ID, or None if there is none"""
+        if not re.fullmatch(r"[0-9a-f]{32}", result_id or ""):
+            return None
+        filepath = os.path.join(self.results_dir, f"{result_id}.json")
+        if not os.path.exists(filepath):
+            return None
+        with open(filepath, 'r') as f:
+            return json.load(f)
+
 result_tracker = ResultTracker()
 
 class FeedbackAnalyzer:
@@ -255,4 +607,81 @@ class FeedbackAnalyzer:
             logger.error(f"Error saving feedback: {str(e)}")
             return False
 
-feedback_analyzer = FeedbackAnalyzer()
\ No newline at end of file
+feedback_analyzer = FeedbackAnalyzer()
+
+class BlobStore:
+    """Content-addressed storage for uploaded documents with a filename to hash mapping"""
+    def __init__(self, names_dir: str, blobs_dir: str = DIRS['data']['blobs']):
+        self.blobs_dir = blobs_dir
+        self.names_path = os.path.join(names_dir, "names.json")
+        self._lock = threading.Lock()
+        os.makedirs(self.blobs_dir, exist_ok=True)
+
+    def blob_path(self, file_hash: str) -> str:
+        """Get the storage path of a blob from its content hash"""
+        return os.path.join(self.blobs_dir, file_hash[:2], f"{file_hash}.pdf")
+
+    def _load_names(self) -> Dict[str, str]:
+        if not os.path.exists(self.names_path):
+            return {}
+        with open(self.names_path, 'r') as f:
+            return json.load(f)
+
+    def _save_names(self, names: Dict[str, str]):
+        # Write to a unique temp file first so a crash never leaves a truncated mapping
+        # and concurrent writers never share a temp file
+        with tempfile.NamedTemporaryFile('w', dir=os.path.dirname(self.names_path),
+                                         prefix="names.", suffix=".tmp", delete=False) as f:
+            json.dump(names, f, indent=2)
+        os.replace(f.name, self.names_path)
+
+    @contextmanager
+    def _names_locked(self):
+        """Serialize updates of the name mapping across threads and worker processes"""
+        with self._lock, open(f"{self.names_path}.lock", 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def save_stream(self, stream, filename: str, block_size: int = 1024 * 1024) -> Dict:
+        """Stream an upload to disk, hashing it on the way, and map the filename to its hash"""
+        hasher = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=self.blobs_dir, suffix=".part")
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                for block in iter(lambda: stream.read(block_size), b''):
+                    hasher.update(block)
+                    out.write(block)
+            return self.adopt(tmp_path, hasher.hexdigest(), filename)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def adopt(self, tmp_path: str, file_hash: str, filename: str) -> Dict:
+        """Move an already hashed file into the store, dropping it if the content is known"""
+        path = self.blob_path(file_hash)
+        duplicate = os.path.exists(path)
+        if not duplicate:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+
+        with self._names_locked():
+            names = self._load_names()
+            names[filename] = file_hash
+            self._save_names(names)
+
+        return {"filename": filename, "hash": file_hash, "path": path, "duplicate": duplicate}
+
+    def resolve(self, filename: str) -> Optional[Dict]:
+        """Look up the stored blob for an uploaded filename"""
+        with self._lock:
+            file_hash = self._load_names().get(filename)
+
+        if file_hash and os.path.exists(self.blob_path(file_hash)):
+            return {"filename": filename, "hash": file_hash, "path": self.blob_path(file_hash)}
+        return None
+
+rfp_blob_store = BlobStore(DIRS['data']['rfps'])
+company_blob_store = BlobStore(DIRS['data']['company_data'])
@@ -0,0 +1,635 @@
+import os
+import glob
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import chromadb
+from chromadb.api.client import SharedSystemClient
+from typing import List, Optional, Dict, Any, Set
+
+try:
+    import faiss
+except ImportError:  # FAISS is optional, the NumPy backend covers the same use case
+    faiss = None
+
+logger = logging.getLogger(__name__)
+
+SPACES = ("cosine", "l2", "ip")
+
+class VectorStore:
+    """Collection interface shared by all vector store backends.
+
+    Results follow the ChromaDB layout (one inner list per query embedding) so
+    agents can switch backends without changing how they read results.
+    """
+    def add(self, ids: List[str], embeddings: List, documents: List[str], metadatas: List[Dict]):
+        raise NotImplementedError
+
+    def query(self, query_embeddings: List, n_results: int = 10, where: Optional[Dict] = None,
+              include: Optional[List[str]] = None) -> Dict:
+        raise NotImplementedError
+
+    def get(self, ids: Optional[List[str]] = None, where: Optional[Dict] = None,
+            limit: Optional[int] = None, include: Optional[List[str]] = None) -> Dict:
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def reset(self):
+        raise NotImplementedError
+
+    def reopen(self):
+        """Drop handles inherited from a parent process; only needed for on-disk backends"""
+
+class ChromaVectorStore(VectorStore):
+    """Persistent ChromaDB collection with configurable HNSW parameters"""
+    def __init__(self, path: str, name: str, description: str, space: str = "l2",
+                 m: int = 16, ef_construction: int = 100, ef_search: int = 10):
+        if space not in SPACES:
+            raise ValueError(f"Unsupported distance space: {space}")
+        self.path = path
+        self.client = chromadb.PersistentClient(path=path)
+        self.name = name
+        # HNSW settings are fixed when a collection is created, so they only
+        # take effect for new collections (e.g. after reset_collections)
+        self.metadata = {
+            "description": description,
+            "hnsw:space": space,
+            "hnsw:M": m,
+            "hnsw:construction_ef": ef_construction,
+            "hnsw:search_ef": ef_search
+        }
+        self.collection = self.client.get_or_create_collection(name=name, metadata=self.metadata)
+
+    def add(self, ids, embeddings, documents, metadatas):
+        self.collection.add(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+
+    def query(self, query_embeddings, n_results=10, where=None, include=None):
+        kwargs = {"query_embeddings": query_embeddings, "n_results": n_results}
+        if where:
+            kwargs["where"] = where
+        if include:
+            kwargs["include"] = include
+        return self.collection.query(**kwargs)
+
+    def get(self, ids=None, where=None, limit=None, include=None):
+        kwargs = {}
+        if ids is not None:
+            kwargs["ids"] = ids
+        if where:
+            kwargs["where"] = where
+        if limit is not None:
+            kwargs["limit"] = limit
+        if include:
+            kwargs["include"] = include
+        return self.collection.get(**kwargs)
+
+    def count(self):
+        return self.collection.count()
+
+    def reset(self):
+        self.client.delete_collection(self.name)
+        self.collection = self.client.create_collection(name=self.name, metadata=self.metadata)
+
+    def reopen(self):
+        # SQLite connections must not be shared across fork, and Chroma caches one
+        # system per path, so the cache is dropped before opening a fresh client
+        SharedSystemClient.clear_system_cache()
+        self.client = chromadb.PersistentClient(path=self.path)
+        self.collection = self.client.get_or_create_collection(name=self.name, metadata=self.metadata)
+
+def matches_where(metadata: Dict[str, Any], where: Optional[Dict]) -> bool:
+    """Evaluate a ChromaDB-style metadata filter against a single metadata dict"""
+    if not where:
+        return True
+
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches_where(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_where(metadata, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = metadata.get(key)
+            for op, operand in condition.items():
+                if op == "$eq" and value != operand:
+                    return False
+                if op == "$ne" and value == operand:
+                    return False
+                if op == "$in" and value not in operand:
+                    return False
+                if op == "$nin" and value in operand:
+                    return False
+                if op == "$gt" and not (value is not None and value > operand):
+                    return False
+                if op == "$gte" and not (value is not None and value >= operand):
+                    return False
+                if op == "$lt" and not (value is not None and value < operand):
+                    return False
+                if op == "$lte" and not (value is not None and value <= operand):
+                    return False
+        elif metadata.get(key) != condition:
+            return False
+
+    return True
+
+class InMemoryVectorStore(VectorStore):
+    """Exact in-process vector search over a contiguous float32 matrix.
+
+    Meant for small per-document scopes where brute force beats an ANN index.
+    Uses a FAISS flat index when `use_faiss` is set and FAISS is installed,
+    otherwise NumPy. Contents live only as long as the process.
+    """
+    def __init__(self, space: str = "l2", use_faiss: bool = False):
+        if space not in SPACES:
+            raise ValueError(f"Unsupported distance space: {space}")
+        if use_faiss and faiss is None:
+            logger.warning("FAISS is not installed, falling back to NumPy vector search")
+        self.space = space
+        self.use_faiss = use_faiss and faiss is not None
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._ids: List[str] = []
+            self._id_index: Dict[str, int] = {}
+            self._vectors: List[np.ndarray] = []
+            self._documents: List[str] = []
+            self._metadatas: List[Dict] = []
+            self._matrix = np.zeros((0, 0), dtype=np.float32)
+            self._faiss_index = None
+            self._dirty = False
+
+    def add(self, ids, embeddings, documents, metadatas):
+        with self._lock:
+            for id_, embedding, document, metadata in zip(ids, embeddings, documents, metadatas):
+                if id_ in self._id_index:
+                    # Match ChromaDB, which ignores ids that already exist
+                    continue
+                self._id_index[id_] = len(self._ids)
+                self._ids.append(id_)
+                self._vectors.append(np.asarray(embedding, dtype=np.float32))
+                self._documents.append(document)
+                self._metadatas.append(metadata)
+            self._dirty = True
+
+    def _prepare(self, vectors: np.ndarray) -> np.ndarray:
+        if self.space == "cosine":
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            return vectors / np.maximum(norms, 1e-12)
+        return vectors
+
+    def _build(self):
+        """Rebuild the contiguous search matrix after additions"""
+        if not self._dirty:
+            return
+        self._matrix = np.ascontiguousarray(self._prepare(np.vstack(self._vectors))) if self._vectors \
+            else np.zeros((0, 0), dtype=np.float32)
+        self._faiss_index = None
+        if self.use_faiss and len(self._matrix):
+            dim = self._matrix.shape[1]
+            self._faiss_index = faiss.IndexFlatL2(dim) if self.space == "l2" else faiss.IndexFlatIP(dim)
+            self._faiss_index.add(self._matrix)
+        self._dirty = False
+
+    def _distances(self, queries: np.ndarray, rows: Optional[np.ndarray]) -> np.ndarray:
+        """Distances between each query and the selected rows, in ChromaDB's conventions"""
+        candidates = self._matrix if rows is None else self._matrix[rows]
+        if self.space == "l2":
+            # Squared L2, matching hnswlib
+            return (
+                (queries ** 2).sum(axis=1, keepdims=True)
+                - 2 * queries @ candidates.T
+                + (candidates ** 2).sum(axis=1)
+            )
+        return 1.0 - queries @ candidates.T
+
+    def _result(self, indices: List[int], include: List[str]) -> Dict[str, List]:
+        return {
+            "ids": [self._ids[i] for i in indices],
+            "documents": [self._documents[i] for i in indices] if "documents" in include else None,
+            "metadatas": [self._metadatas[i] for i in indices] if "metadatas" in include else None,
+            "embeddings": [self._vectors[i] for i in indices] if "embeddings" in include else None
+        }
+
+    def query(self, query_embeddings, n_results=10, where=None, include=None):
+        include = include or ["documents", "metadatas", "distances"]
+        with self._lock:
+            self._build()
+            queries = self._prepare(np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32)))
+
+            if where:
+                rows = np.array([i for i, meta in enumerate(self._metadatas) if matches_where(meta, where)],
+                                dtype=np.int64)
+            else:
+                rows = np.arange(len(self._ids), dtype=np.int64)
+            k = min(n_results, len(rows))
+
+            if k == 0:
+                top = np.zeros((len(queries), 0), dtype=np.int64)
+                top_distances = np.zeros((len(queries), 0), dtype=np.float32)
+            elif self._faiss_index is not None and not where:
+                scores, top = self._faiss_index.search(queries, k)
+                top_distances = scores if self.space == "l2" else 1.0 - scores
+            else:
+                distances = self._distances(queries, rows if where else None)
+                partition = np.argpartition(distances, k - 1, axis=1)[:, :k]
+                order = np.take_along_axis(distances, partition, axis=1).argsort(axis=1)
+                local = np.take_along_axis(partition, order, axis=1)
+                top = rows[local]
+                top_distances = np.take_along_axis(distances, local, axis=1)
+
+            results = {"ids": [], "documents": [], "metadatas": [], "distances": [], "embeddings": []}
+            for query_top, query_distances in zip(top, top_distances):
+                result = self._result(query_top.tolist(), include)
+                for key in ("ids", "documents", "metadatas", "embeddings"):
+                    results[key].append(result[key])
+                results["distances"].append(query_distances.tolist())
+
+        for key in ("documents", "metadatas", "distances", "embeddings"):
+            if key not in include:
+                results[key] = None
+        return results
+
+    def get(self, ids=None, where=None, limit=None, include=None):
+        include = include or ["documents", "metadatas"]
+        with self._lock:
+            if ids is not None:
+                indices = [self._id_index[id_] for id_ in ids if id_ in self._id_index]
+            else:
+                indices = range(len(self._ids))
+            indices = [i for i in indices if matches_where(self._metadatas[i], where)]
+            if limit is not None:
+                indices = indices[:limit]
+            return self._result(indices, include)
+
+    def count(self):
+        return len(self._ids)
+
+    @classmethod
+    def from_store(cls, store: VectorStore, where: Dict, space: str = "cosine") -> "InMemoryVectorStore":
+        """Load the chunks matching a filter from another store into an exact in-memory index"""
+        data = store.get(where=where, include=["embeddings", "documents", "metadatas"])
+        scope = cls(space=space)
+        scope.add(data["ids"], data["embeddings"], data["documents"], data["metadatas"])
+        with scope._lock:
+            scope._build()
+        return scope
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize each row of a float32 matrix"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+def quantize(vectors: np.ndarray, dtype: str) -> Dict[str, np.ndarray]:
+    """Quantize a float32 matrix to float16, or to int8 codes with a per-vector scale"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if dtype == "float16":
+        return {"codes": vectors.astype(np.float16)}
+    if dtype == "int8":
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales = np.maximum(scales, 1e-12).astype(np.float32)
+        codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+        return {"codes": codes, "scales": scales}
+    raise ValueError(f"Unsupported embedding storage type: {dtype}")
+
+def dequantize(codes: np.ndarray, scales: Optional[np.ndarray] = None) -> np.ndarray:
+    """Restore an approximate float32 matrix from quantized codes"""
+    vectors = codes.astype(np.float32)
+    if scales is not None:
+        vectors *= scales[:, None]
+    return vectors
+
+class CompactEmbeddingStore:
+    """Sidecar store keeping normalized chunk embeddings quantized, one file per document"""
+    def __init__(self, directory: str, dtype: str = "int8"):
+        if dtype not in ("float16", "int8"):
+            raise ValueError(f"Unsupported embedding storage type: {dtype}")
+        self.directory = directory
+        self.dtype = dtype
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, doc_hash: str) -> str:
+        return os.path.join(self.directory, f"{doc_hash}.{self.dtype}.npz")
+
+    def has(self, doc_hash: str) -> bool:
+        return os.path.exists(self._path(doc_hash))
+
+    def save(self, doc_hash: str, ids: List[str], embeddings: np.ndarray):
+        """Quantize and store the embeddings of a document"""
+        arrays = quantize(normalize_rows(embeddings), self.dtype)
+        tmp_path = self._path(doc_hash) + ".tmp.npz"
+        np.savez(tmp_path, ids=np.asarray(ids), **arrays)
+        os.replace(tmp_path, self._path(doc_hash))
+
+    def load(self, doc_hash: str) -> Optional[Dict[str, np.ndarray]]:
+        """Load the quantized embeddings of a document, if stored"""
+        if not self.has(doc_hash):
+            return None
+        with np.load(self._path(doc_hash)) as data:
+            return {key: data[key] for key in data.files}
+
+    def reset(self):
+        for path in glob.glob(os.path.join(self.directory, "*.npz")):
+            os.remove(path)
+
+class QuantizedScope(VectorStore):
+    """Read-only cosine search over one document's quantized embeddings.
+
+    Candidates are ranked on the compact codes first; the best `rerank_factor`
+    times `n_results` are then re-scored against their full-precision vectors
+    fetched by id from the source store (or the dequantized codes if the
+    source no longer has them).
+    """
+    def __init__(self, compact: Dict[str, np.ndarray], source: VectorStore, rerank_factor: int = 4):
+        self.ids = [str(id_) for id_ in compact["ids"]]
+        self.codes = np.ascontiguousarray(compact["codes"])
+        self.scales = compact.get("scales")
+        self.source = source
+        self.rerank_factor = rerank_factor
+
+        data = source.get(ids=self.ids, include=["documents", "metadatas"])
+        by_id = {id_: i for i, id_ in enumerate(data["ids"])}
+        self.documents = [data["documents"][by_id[id_]] if id_ in by_id else "" for id_ in self.ids]
+        self.metadatas = [data["metadatas"][by_id[id_]] if id_ in by_id else {} for id_ in self.ids]
+
+    def _coarse_scores(self, queries: np.ndarray) -> np.ndarray:
+        scores = queries @ self.codes.astype(np.float32).T
+        if self.scales is not None:
+            scores *= self.scales
+        return scores
+
+    def _full_scores(self, query: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        candidate_ids = [self.ids[i] for i in rows]
+        data = self.source.get(ids=candidate_ids, include=["embeddings"])
+        embeddings = data.get("embeddings")
+        if embeddings is None or len(data["ids"]) != len(candidate_ids):
+            vectors = dequantize(self.codes[rows], None if self.scales is None else self.scales[rows])
+        else:
+            by_id = dict(zip(data["ids"], embeddings))
+            vectors = normalize_rows(np.vstack([by_id[id_] for id_ in candidate_ids]))
+        return vectors @ query
+
+    def query(self, query_embeddings, n_results=10, where=None, include=None):
+        include = include or ["documents", "metadatas", "distances"]
+        queries = normalize_rows(np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32)))
+        allowed = np.array([i for i, meta in enumerate(self.metadatas) if matches_where(meta, where)],
+                           dtype=np.int64)
+        k = min(n_results, len(allowed))
+        shortlist = min(len(allowed), max(k, k * self.rerank_factor))
+
+        results = {"ids": [], "documents": [], "metadatas": [], "distances": [], "embeddings": []}
+        coarse = self._coarse_scores(queries)[:, allowed] if len(allowed) else None
+        for q, query in enumerate(queries):
+            if k == 0:
+                top, scores = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+            else:
+                candidates = allowed[np.argpartition(-coarse[q], shortlist - 1)[:shortlist]]
+                full = self._full_scores(query, candidates)
+                order = np.argsort(-full)[:k]
+                top, scores = candidates[order], full[order]
+            results["ids"].append([self.ids[i] for i in top])
+            results["documents"].append([self.documents[i] for i in top])
+            results["metadatas"].append([self.metadatas[i] for i in top])
+            results["distances"].append((1.0 - scores).tolist())
+            if "embeddings" in include:
+                results["embeddings"].append(
+                    dequantize(self.codes[top], None if self.scales is None else self.scales[top])
+                )
+
+        for key in ("documents", "metadatas", "distances", "embeddings"):
+            if key not in include:
+                results[key] = None
+        return results
+
+    def get(self, ids=None, where=None, limit=None, include=None):
+        return self.source.get(ids=ids if ids is not None else self.ids, where=where, limit=limit, include=include)
+
+    def count(self):
+        return len(self.ids)
+
+class ScopeCache:
+    """LRU cache of exact in-memory indexes over single documents.
+
+    Documents are keyed by content hash and never change once indexed, so a
+    cached scope stays valid until the underlying collections are reset.
+    When a compact sidecar copy exists the scope holds the quantized codes
+    instead of a float32 matrix.
+    """
+    def __init__(self, max_scopes: int = 8, rerank_factor: int = 4):
+        self.max_scopes = max_scopes
+        self.rerank_factor = rerank_factor
+        self._lock = threading.Lock()
+        self._scopes: "OrderedDict[tuple, VectorStore]" = OrderedDict()
+
+    def get(self, store: VectorStore, doc_hash: str,
+            compact_store: Optional[CompactEmbeddingStore] = None) -> VectorStore:
+        """Get the in-memory index for a document, loading it on first use"""
+        key = (id(store), doc_hash)
+        with self._lock:
+            if key in self._scopes:
+                self._scopes.move_to_end(key)
+                return self._scopes[key]
+
+        compact = compact_store.load(doc_hash) if compact_store else None
+        if compact is not None:
+            scope = QuantizedScope(compact, store, rerank_factor=self.rerank_factor)
+        else:
+            scope = InMemoryVectorStore.from_store(store, {"doc_hash": doc_hash})
+        with self._lock:
+            self._scopes[key] = scope
+            while len(self._scopes) > self.max_scopes:
+                self._scopes.popitem(last=False)
+        return scope
+
+    def clear(self):
+        with self._lock:
+            self._scopes.clear()
+
+def pinned_values(where: Optional[Dict], key: str) -> Optional[Set[str]]:
+    """Values a metadata filter restricts `key` to, or None if it allows any value"""
+    if not where:
+        return None
+    pinned = None
+    for field, condition in where.items():
+        values = None
+        if field == "$and":
+            for clause in condition:
+                clause_values = pinned_values(clause, key)
+                if clause_values is not None:
+                    values = clause_values if values is None else values & clause_values
+        elif field == "$or":
+            clause_values = [pinned_values(clause, key) for clause in condition]
+            if condition and all(v is not None for v in clause_values):
+                values = set().union(*clause_values)
+        elif field == key:
+            if isinstance(condition, dict):
+                if "$eq" in condition:
+                    values = {condition["$eq"]}
+                elif "$in" in condition:
+                    values = set(condition["$in"])
+            else:
+                values = {condition}
+        if values is not None:
+            pinned = values if pinned is None else pinned & values
+    return pinned
+
+class ShardedVectorStore(VectorStore):
+    """Documents partitioned across several stores by a metadata key.
+
+    Every chunk goes to the shard owning the hash range of its `shard_key`
+    value (the document hash by default, or e.g. a tenant id), so all chunks
+    of a document live together. Writes touch only the owning shards;
+    queries pinned to specific documents go straight to their shards, and
+    other queries fan out to all shards in parallel and merge the top k.
+    """
+    def __init__(self, shards: List[VectorStore], shard_key: str = "doc_hash"):
+        self.shards = shards
+        self.shard_key = shard_key
+        self._executor = None
+
+    def shard_for(self, value: Any) -> int:
+        """Shard owning a key value: the hash space is split into equal contiguous ranges"""
+        position = int.from_bytes(hashlib.blake2b(str(value).encode("utf-8"), digest_size=4).digest(), "big")
+        return position * len(self.shards) >> 32
+
+    def _targets(self, where: Optional[Dict]) -> List[int]:
+        values = pinned_values(where, self.shard_key)
+        if values is None:
+            return list(range(len(self.shards)))
+        return sorted({self.shard_for(value) for value in values})
+
+    def _map(self, targets: List[int], call) -> List:
+        """Run `call(shard)` on the target shards, in parallel when there are several"""
+        if len(targets) == 1:
+            return [call(self.shards[targets[0]])]
+        if self._executor is None:
+            # Created lazily so forked workers never inherit a pool with dead threads
+            self._executor = ThreadPoolExecutor(max_workers=len(self.shards), thread_name_prefix="shard")
+        return list(self._executor.map(lambda index: call(self.shards[index]), targets))
+
+    def add(self, ids, embeddings, documents, metadatas):
+        rows = defaultdict(list)
+        for i, metadata in enumerate(metadatas):
+            key = (metadata or {}).get(self.shard_key, ids[i])
+            rows[self.shard_for(key)].append(i)
+
+        batches = {id(self.shards[index]): selected for index, selected in rows.items()}
+        self._map(sorted(rows), lambda shard: shard.add(
+            ids=[ids[i] for i in batches[id(shard)]],
+            embeddings=[embeddings[i] for i in batches[id(shard)]],
+            documents=[documents[i] for i in batches[id(shard)]],
+            metadatas=[metadatas[i] for i in batches[id(shard)]]
+        ))
+
+    def query(self, query_embeddings, n_results=10, where=None, include=None):
+        include = include or ["documents", "metadatas", "distances"]
+        # Distances are needed to merge, even if the caller does not want them
+        shard_include = list(include) if "distances" in include else list(include) + ["distances"]
+        targets = self._targets(where)
+        partials = self._map(targets, lambda shard: shard.query(
+            query_embeddings=query_embeddings, n_results=n_results, where=where, include=shard_include
+        ))
+        if len(partials) == 1 and "distances" in include:
+            return partials[0]
+
+        fields = ("ids", "documents", "metadatas", "distances", "embeddings")
+        results = {field: [] for field in fields}
+        for q in range(len(partials[0]["ids"])):
+            candidates = [(distance, p, i) for p, partial in enumerate(partials)
+                          for i, distance in enumerate(partial["distances"][q])]
+            candidates.sort(key=lambda candidate: candidate[0])
+            top = candidates[:n_results]
+            for field in fields:
+                if field == "ids" or field in include:
+                    results[field].append([partials[p][field][q][i] for _, p, i in top])
+
+        for field in ("documents", "metadatas", "distances", "embeddings"):
+            if field not in include:
+                results[field] = None
+        return results
+
+    def get(self, ids=None, where=None, limit=None, include=None):
+        include = include or ["documents", "metadatas"]
+        partials = self._map(self._targets(where), lambda shard: shard.get(
+            ids=ids, where=where, limit=limit, include=include
+        ))
+        fields = ("ids", "documents", "metadatas", "embeddings")
+        results = {field: [] if field == "ids" or field in include else None for field in fields}
+        for partial in partials:
+            for field in fields:
+                if results[field] is not None and partial.get(field) is not None:
+                    results[field].extend(partial[field])
+        if limit is not None:
+            for field in fields:
+                if results[field] is not None:
+                    results[field] = results[field][:limit]
+        return results
+
+    def count(self):
+        return sum(self._map(list(range(len(self.shards))), lambda shard: shard.count()))
+
+    def reset(self):
+        for shard in self.shards:
+            shard.reset()
+
+    def reopen(self):
+        self._executor = None
+        for shard in self.shards:
+            shard.reopen()
+
+def check_shard_layout(path: str, shards: int, shard_key: str):
+    """Record the shard layout of a store directory and refuse to open it with a different one.
+
+    Changing the number of shards or the key moves documents to other
+    shards, so existing data would silently stop being found.
+    """
+    os.makedirs(path, exist_ok=True)
+    layout_path = os.path.join(path, "shards.json")
+    layout = {"shards": shards, "shard_key": shard_key}
+    if not os.path.exists(layout_path) and os.path.exists(os.path.join(path, "chroma.sqlite3")):
+        existing = {"shards": 1, "shard_key": shard_key}
+    elif os.path.exists(layout_path):
+        with open(layout_path) as f:
+            existing = json.load(f)
+    else:
+        existing = None
+    if existing is not None:
+        if existing["shards"] != shards or (shards > 1 and existing["shard_key"] != shard_key):
+            raise ValueError(
+                f"{path} holds {existing['shards']} shards keyed by {existing['shard_key']}, "
+                f"not {shards} keyed by {shard_key}; restore the settings or re-index into a new directory"
+            )
+        return
+    if shards > 1:
+        with open(layout_path, "w") as f:
+            json.dump(layout, f)
+
+def create_vector_store(backend: str, path: str, name: str, description: str, space: str = "l2",
+                        m: int = 16, ef_construction: int = 100, ef_search: int = 10,
+                        shards: int = 1, shard_key: str = "doc_hash") -> VectorStore:
+    """Create a vector store for the configured backend ("chroma", "numpy" or "faiss"),
+    split into `shards` partitions when more than one is requested"""
+    if shards > 1:
+        if backend == "chroma":
+            check_shard_layout(path, shards, shard_key)
+        return ShardedVectorStore([
+            create_vector_store(backend, os.path.join(path, f"shard-{index:02d}"), name, description,
+                                space=space, m=m, ef_construction=ef_construction, ef_search=ef_search)
+            for index in range(shards)
+        ], shard_key=shard_key)
+    if backend == "chroma":
+        check_shard_layout(path, 1, shard_key)
+        return ChromaVectorStore(path, name, description, space=space, m=m,
+                                 ef_construction=ef_construction, ef_search=ef_search)
+    if backend in ("numpy", "faiss"):
+        return InMemoryVectorStore(space=space, use_faiss=backend == "faiss")
+    raise ValueError(f"Unknown vector store backend: {backend}")